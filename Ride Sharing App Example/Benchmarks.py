@@ -0,0 +1,928 @@
+"""
+Benchmarks for the ride-sharing example.
+
+Run directly to print, on a random city:
+
+- matching throughput for the brute-force, indexed and NumPy matchers
+- position-update throughput for each spatial index
+- pickup distance of batch matching against greedy matching
+- memory and matching time of a FleetStore against Driver objects
+- fare computation per ride, per RideRecord and through batch pricing
+- memory held by notification history: eager strings vs records
+- region-sharded matching throughput by worker count
+- streaming ingestion throughput, batch latency and peak memory
+- request cancellation and driver log-off cost in a large Matcher
+- journal write throughput and replay time of a 10M-event journal
+- snapshot size, write time and warm-restart time of a 500k-driver Matcher
+- surge quote latency as the number of open requests grows
+- scheduled matching: round length and p99 time-to-match with and without a round cap
+- pooling 50k pending shared requests into groups and dispatching them
+- cost of hot-path instrumentation: off, sampled and timing every call
+- concurrent Matcher throughput under 32 producer threads
+- multi-process greedy matching over shared-memory coordinates, by worker count
+- repeat fare quotes through the quote cache against uncached calculate_cost
+- road-network build, startup and A*-with-landmarks query latency on a 1M-edge grid
+- ETA re-ranking of k-nearest candidates against straight-line greedy matching
+- a simulated day of traffic against real time
+
+    python3 Benchmarks.py
+
+The numbers are timings only; correctness checks live in tests/.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import io
+import json
+import math
+import os
+import random
+import tempfile
+import threading
+import time
+import tracemalloc
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from ConcurrentMatcher import ConcurrentMatcher
+from Fleet import FleetStore
+from Ingestion import IngestionPipeline
+from Journal import RideJournal, replay
+import Journal
+from Matcher import Matcher
+import Metrics
+from ParallelMatching import ParallelMatching
+from Quotes import QuoteService
+from Roads import RoadNetwork, build_road_network
+from Matching import (
+    BatchMatching, EtaCost, FleetMatching, GreedyMatching, MatchingStrategy, RerankedMatching, VectorizedMatching,
+)
+from People import Driver, NotificationLog, Rider
+from Pooling import PoolingEngine
+from Pricing import LuxCost, NormalCost, SharingCost, SurgeCost, price_columns, price_rides
+from Rides import Ride, RideRecord, RideStatus, SharingRide
+from Scheduler import MatchScheduler
+from ShardedMatcher import RegionGrid, ShardedMatcher
+from Simulation import Simulation, SimulationConfig
+from SpatialIndex import GridIndex, KDTreeIndex, SpatialIndex
+from Surge import SurgeEngine
+from SyntheticCity import CityConfig
+from Vehicles import Car
+
+CITY_SIZE = 100.0
+
+
+def make_drivers(count: int, rng: random.Random) -> list[Driver]:
+    return [
+        Driver(
+            name=f"driver-{i}",
+            phone=str(i),
+            rating=5,
+            location=(rng.uniform(0, CITY_SIZE), rng.uniform(0, CITY_SIZE)),
+            vehicle=Car(name="camry", number=f"car-{i}"),
+        )
+        for i in range(count)
+    ]
+
+
+def make_rides(count: int, rng: random.Random) -> list[Ride]:
+    rides = []
+    for i in range(count):
+        origin = (rng.uniform(0, CITY_SIZE), rng.uniform(0, CITY_SIZE))
+        destination = (rng.uniform(0, CITY_SIZE), rng.uniform(0, CITY_SIZE))
+        rider = Rider(name=f"rider-{i}", phone=str(i), rating=5, location=origin)
+        rides.append(
+            Ride(
+                from_place=origin,
+                to=destination,
+                ride_duration="10 mins",
+                request_time="10 pm",
+                rider=rider,
+            )
+        )
+    return rides
+
+
+def grid_cell_size(num_drivers: int, drivers_per_cell: int = 4) -> float:
+    return CITY_SIZE / max(1.0, math.sqrt(num_drivers / drivers_per_cell))
+
+
+def time_matching(matcher: Matcher, drivers: list[Driver], rides: list[Ride]) -> tuple[float, list]:
+    for driver in drivers:
+        driver.set_available(True)
+        matcher.add_driver(driver)
+    for ride in rides:
+        ride.driver = None
+        matcher.add_ride_request(ride)
+
+    # assign_driver notifies riders and drivers, which prints; keep that out of the output.
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        matches = matcher.make_matches()
+        elapsed = time.perf_counter() - start
+    return elapsed, [(id(ride), id(driver)) for ride, driver in matches]
+
+
+def bench_spatial_index(driver_counts=(1_000, 10_000, 100_000), num_rides: int = 500, seed: int = 7) -> None:
+    print(f"Nearest-driver matching, {num_rides} ride requests per round")
+    print(f"{'drivers':>10} {'brute rides/s':>15} {'grid rides/s':>15} {'kd-tree rides/s':>17}")
+    for num_drivers in driver_counts:
+        rng = random.Random(seed)
+        drivers = make_drivers(num_drivers, rng)
+        rides = make_rides(num_rides, rng)
+
+        brute_time, _ = time_matching(Matcher(), drivers, rides)
+        grid = GridIndex(cell_size=grid_cell_size(num_drivers))
+        grid_time, _ = time_matching(Matcher(index=grid), drivers, rides)
+        kd_time, _ = time_matching(Matcher(index=KDTreeIndex()), drivers, rides)
+
+        print(
+            f"{num_drivers:>10} {num_rides / brute_time:>15.0f} "
+            f"{num_rides / grid_time:>15.0f} {num_rides / kd_time:>17.0f}"
+        )
+
+
+def time_moves(index: SpatialIndex, drivers: list[Driver], num_moves: int, rng: random.Random) -> float:
+    for driver in drivers:
+        index.add(driver)
+    # Drivers drift a short way per update, like a GPS ping every few seconds.
+    moves = [
+        (rng.choice(drivers), rng.uniform(-0.5, 0.5), rng.uniform(-0.5, 0.5))
+        for _ in range(num_moves)
+    ]
+    start = time.perf_counter()
+    for driver, dx, dy in moves:
+        x, y = driver.location
+        index.move(driver, (x + dx, y + dy))
+    return time.perf_counter() - start
+
+
+def bench_position_updates(driver_counts=(1_000, 10_000, 100_000), num_moves: int = 100_000, seed: int = 7) -> None:
+    print(f"\nDriver position updates, {num_moves} moves")
+    print(f"{'drivers':>10} {'grid moves/s':>15} {'kd-tree moves/s':>17}")
+    for num_drivers in driver_counts:
+        rng = random.Random(seed)
+        drivers = make_drivers(num_drivers, rng)
+        grid_time = time_moves(GridIndex(cell_size=grid_cell_size(num_drivers)), drivers, num_moves, rng)
+        drivers = make_drivers(num_drivers, random.Random(seed))
+        kd_time = time_moves(KDTreeIndex(), drivers, num_moves, rng)
+        print(f"{num_drivers:>10} {num_moves / grid_time:>15.0f} {num_moves / kd_time:>17.0f}")
+
+
+def bench_vectorized_matching(driver_counts=(1_000, 10_000, 100_000), num_rides: int = 200, seed: int = 7) -> None:
+    print(f"\nNumPy-vectorized greedy matching, {num_rides} ride requests per round")
+    print(f"{'drivers':>10} {'brute rides/s':>15} {'numpy rides/s':>15}")
+    for num_drivers in driver_counts:
+        rng = random.Random(seed)
+        drivers = make_drivers(num_drivers, rng)
+        rides = make_rides(num_rides, rng)
+        brute_time, _ = time_matching(Matcher(), drivers, rides)
+        numpy_time, _ = time_matching(Matcher(strategy=VectorizedMatching()), drivers, rides)
+        print(f"{num_drivers:>10} {num_rides / brute_time:>15.0f} {num_rides / numpy_time:>15.0f}")
+
+
+def bench_batch_matching(window_sizes=(500, 1_000, 3_000), drivers_per_request: int = 2, seed: int = 7) -> None:
+    print("\nBatch assignment vs greedy matching (KD-tree index)")
+    print(f"{'requests':>10} {'drivers':>10} {'seconds':>9} {'batch mean':>11} {'greedy mean':>12}")
+    for num_rides in window_sizes:
+        rng = random.Random(seed)
+        num_drivers = num_rides * drivers_per_request
+        drivers = make_drivers(num_drivers, rng)
+        rides = make_rides(num_rides, rng)
+        strategy = BatchMatching(compare_greedy=True)
+        elapsed, _ = time_matching(Matcher(index=KDTreeIndex(), strategy=strategy), drivers, rides)
+        report = strategy.last_report
+        print(
+            f"{num_rides:>10} {num_drivers:>10} {elapsed:>9.2f} "
+            f"{report.mean_pickup:>11.3f} {report.greedy_mean_pickup:>12.3f}"
+        )
+
+
+def measure_retained(build) -> tuple[int, object]:
+    """Bytes still allocated once ``build()`` returns, and its result."""
+    tracemalloc.start()
+    try:
+        result = build()
+        retained, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return retained, result
+
+
+def build_fleet_store(drivers: list[Driver]) -> FleetStore:
+    store = FleetStore()
+    for driver in drivers:
+        store.add(driver.name, driver.phone, driver.rating, driver.location, driver.vehicle)
+    return store
+
+
+def bench_fleet_store(driver_counts=(10_000, 100_000, 500_000), num_rides: int = 200, seed: int = 7) -> None:
+    print(f"\nFleetStore vs Driver objects (retained memory; greedy matching of {num_rides} requests)")
+    print(f"{'drivers':>10} {'objects MB':>11} {'store MB':>9} {'objects s':>10} {'store s':>8}")
+    for num_drivers in driver_counts:
+        object_bytes, drivers = measure_retained(lambda: make_drivers(num_drivers, random.Random(seed)))
+        store_bytes, store = measure_retained(
+            lambda: build_fleet_store(make_drivers(num_drivers, random.Random(seed)))
+        )
+
+        rides = make_rides(num_rides, random.Random(seed + 1))
+        object_time, _ = time_matching(Matcher(strategy=VectorizedMatching()), drivers, rides)
+        store_time, _ = time_matching(Matcher(strategy=FleetMatching(store)), [], rides)
+        print(
+            f"{num_drivers:>10} {object_bytes / 2**20:>11.1f} {store_bytes / 2**20:>9.1f} "
+            f"{object_time:>10.3f} {store_time:>8.3f}"
+        )
+
+
+def make_string_rides(count: int, rng: random.Random) -> list[Ride]:
+    # Historical rides arrive with "x y" string endpoints, like main.py builds them.
+    rides = make_rides(count, rng)
+    for ride in rides:
+        ride.from_place = f"{ride.from_place[0]:.4f} {ride.from_place[1]:.4f}"
+        ride.to = f"{ride.to[0]:.4f} {ride.to[1]:.4f}"
+    return rides
+
+
+def bench_fare_computation(num_rides: int = 200_000, quotes_per_ride: int = 3, seed: int = 7) -> None:
+    print(f"\nFare computation, {num_rides} mixed-strategy rides")
+    rng = random.Random(seed)
+    strategies = [NormalCost(), SurgeCost(), SharingCost(num_share=2), LuxCost()]
+    rides = make_string_rides(num_rides, rng)
+    for ride in rides:
+        ride.pricing = rng.choice(strategies)
+
+    start = time.perf_counter()
+    for ride in rides:
+        for _ in range(quotes_per_ride):
+            ride.calculate_cost()
+    ride_time = (time.perf_counter() - start) / quotes_per_ride
+
+    records: list[RideRecord] = [ride.to_record() for ride in rides]
+    start = time.perf_counter()
+    for record in records:
+        record.calculate_cost()
+    record_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    price_rides(records)
+    batch_time = time.perf_counter() - start
+
+    codes = {id(strategy): code for code, strategy in enumerate(strategies)}
+    distances = [record.distance() for record in records]
+    rates = [record.rate for record in records]
+    strategy_codes = [codes[id(record.pricing)] for record in records]
+    if np is not None:
+        distances, rates, strategy_codes = np.array(distances), np.array(rates), np.array(strategy_codes)
+    start = time.perf_counter()
+    price_columns(distances, rates, strategy_codes, strategies)
+    column_time = time.perf_counter() - start
+
+    print(f"  Ride.calculate_cost (cached):  {num_rides / ride_time:>12.0f} rides/s")
+    print(f"  RideRecord.calculate_cost:     {num_rides / record_time:>12.0f} rides/s")
+    print(f"  price_rides(records):          {num_rides / batch_time:>12.0f} rides/s")
+    print(f"  price_columns:                 {num_rides / column_time:>12.0f} rides/s")
+
+
+def bench_notification_memory(num_drivers: int = 200, per_driver: int = 1_000, seed: int = 7) -> None:
+    print(f"\nNotification history, {num_drivers} drivers x {per_driver} notifications")
+    rides = make_string_rides(per_driver, random.Random(seed))
+    for ride in rides:
+        ride.driver = make_drivers(1, random.Random(seed))[0]
+
+    def eager_strings() -> list[list[str]]:
+        # The previous layout: one formatted f-string per event, kept forever.
+        return [
+            [
+                f"Driver driver-{i}: Ride {ride.from_place}->{ride.to} is {ride.status.value} "
+                f"(driver={ride.driver.name})"
+                for ride in rides
+            ]
+            for i in range(num_drivers)
+        ]
+
+    def records(capacity: int | None) -> list[Driver]:
+        drivers = make_drivers(num_drivers, random.Random(seed))
+        for driver in drivers:
+            driver.echo_notifications = False
+            driver.notification_log = NotificationLog(capacity)
+            for ride in rides:
+                driver.observe_ride(ride)
+        return drivers
+
+    # Driver objects themselves are the same in both layouts; subtract them out.
+    base, _ = measure_retained(lambda: make_drivers(num_drivers, random.Random(seed)))
+    eager, _ = measure_retained(eager_strings)
+    unbounded, _ = measure_retained(lambda: records(None))
+    bounded, _ = measure_retained(lambda: records(100))
+    print(f"  eager f-strings:          {eager / 2**20:>8.1f} MB")
+    print(f"  records, unbounded:       {(unbounded - base) / 2**20:>8.1f} MB")
+    print(f"  records, capacity=100:    {(bounded - base) / 2**20:>8.1f} MB")
+
+
+def bench_sharded_matching(
+    worker_counts=(0, 1, 2, 4), num_drivers: int = 100_000, num_rides: int = 20_000, seed: int = 7
+) -> None:
+    print(f"\nRegion-sharded matching, {num_drivers} drivers, {num_rides} requests, 4x4 regions")
+    print(f"{'workers':>10} {'rides/s':>12} {'matched':>9}")
+    regions = RegionGrid(0.0, 0.0, CITY_SIZE, CITY_SIZE, columns=4, rows=4)
+    for workers in worker_counts:
+        rng = random.Random(seed)
+        drivers = make_drivers(num_drivers, rng)
+        rides = make_rides(num_rides, rng)
+        with ShardedMatcher(regions, workers=workers, halo=2.0, index_factory=KDTreeIndex) as matcher:
+            for driver in drivers:
+                matcher.add_driver(driver)
+            for ride in rides:
+                matcher.add_ride_request(ride)
+            with contextlib.redirect_stdout(io.StringIO()):
+                start = time.perf_counter()
+                matches = matcher.make_matches()
+                elapsed = time.perf_counter() - start
+        label = "in-proc" if workers == 0 else str(workers)
+        print(f"{label:>10} {num_rides / elapsed:>12.0f} {len(matches):>9}")
+
+
+def make_event_stream(num_drivers: int, num_requests: int, ride_events: int, rng: random.Random):
+    def place() -> str:
+        return f"{rng.uniform(0, CITY_SIZE):.3f} {rng.uniform(0, CITY_SIZE):.3f}"
+
+    for i in range(num_drivers):
+        yield {"type": "driver", "id": f"d{i}", "location": place()}
+    now = 0.0
+    for i in range(num_requests):
+        now += rng.expovariate(10.0)
+        yield {"type": "request", "id": f"r{i}", "time": now, "from": place(), "to": place()}
+        yield {"type": "location", "id": f"d{rng.randrange(num_drivers)}", "location": place()}
+        # Rides finish a fixed number of requests later, keeping the open set bounded.
+        if i >= ride_events:
+            yield {"type": "complete", "id": f"r{i - ride_events}"}
+
+
+def bench_ingestion(
+    request_counts=(10_000, 100_000), batch_sizes=(100, 1_000), num_drivers: int = 2_000, seed: int = 7
+) -> None:
+    print(f"\nStreaming ingestion, {num_drivers} drivers")
+    print(f"{'requests':>10} {'batch':>6} {'req/s':>10} {'p50 ms':>8} {'max ms':>8} {'peak MB':>8}")
+    for num_requests in request_counts:
+        for batch_size in batch_sizes:
+            rng = random.Random(seed)
+            events = make_event_stream(num_drivers, num_requests, num_drivers // 2, rng)
+            pipeline = IngestionPipeline(
+                Matcher(index=KDTreeIndex()), batch_size=batch_size, max_pending=num_drivers
+            )
+            tracemalloc.start()
+            start = time.perf_counter()
+            latencies = sorted(report.latency for report in pipeline.run(events))
+            elapsed = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(
+                f"{num_requests:>10} {batch_size:>6} {num_requests / elapsed:>10.0f} "
+                f"{latencies[len(latencies) // 2] * 1000:>8.1f} {latencies[-1] * 1000:>8.1f} "
+                f"{peak / 1e6:>8.1f}"
+            )
+
+
+def bench_registry_ops(sizes=(10_000, 100_000, 300_000), num_ops: int = 10_000, seed: int = 7) -> None:
+    print(f"\nMatcher registry, {num_ops} cancellations and log-offs")
+    print(f"{'entries':>10} {'cancel us':>10} {'log-off us':>11} {'flip us':>8}")
+    for size in sizes:
+        rng = random.Random(seed)
+        drivers = make_drivers(size, rng)
+        rides = make_rides(size, rng)
+        matcher = Matcher()
+        for driver in drivers:
+            matcher.add_driver(driver)
+        for ride in rides:
+            matcher.add_ride_request(ride)
+
+        start = time.perf_counter()
+        for ride in rng.sample(rides, num_ops):
+            matcher.remove_ride_request(ride)
+        cancel = (time.perf_counter() - start) / num_ops
+
+        flipped = rng.sample(drivers, num_ops)
+        start = time.perf_counter()
+        for driver in flipped:
+            driver.set_available(False)
+            driver.set_available(True)
+        flip = (time.perf_counter() - start) / (2 * num_ops)
+
+        start = time.perf_counter()
+        for driver in flipped:
+            matcher.remove_driver(driver)
+        log_off = (time.perf_counter() - start) / num_ops
+        print(f"{size:>10} {cancel * 1e6:>10.2f} {log_off * 1e6:>11.2f} {flip * 1e6:>8.2f}")
+
+
+def write_synthetic_journal(directory: str, num_drivers: int, num_rides: int, seed: int) -> int:
+    """
+    Write a journal straight from arrays: drivers join, then every ride is
+    requested, assigned, started and completed except the last few percent.
+    """
+    rng = np.random.default_rng(seed)
+    driver_meta = json.dumps(
+        {"name": "driver", "phone": "0", "rating": 5, "vehicle": "Car", "vehicle_name": "camry",
+         "vehicle_number": "car"}, separators=(",", ":")
+    ).encode() + b"\n"
+    ride_meta = json.dumps(
+        {"ride": "Ride", "from": [1.0, 2.0], "to": [3.0, 4.0], "duration": "10 mins", "request_time": "10 pm",
+         "base_rate": 10.0, "pricing": "NormalCost", "pricing_args": {}, "rider": ["rider", "0", 5, [1.0, 2.0]]},
+        separators=(",", ":"),
+    ).encode() + b"\n"
+
+    live = max(1, num_rides // 50)
+    kinds = np.full((num_rides, 4), [Journal.RIDE_REQUESTED, Journal.RIDE_ASSIGNED, Journal.RIDE_STARTED,
+                                     Journal.RIDE_COMPLETED], dtype=np.uint8)
+    rides = np.zeros((num_rides, 4), dtype=Journal.RECORD_DTYPE)
+    rides["kind"] = kinds
+    rides["ride_id"] = np.arange(1, num_rides + 1)[:, None]
+    rides["driver_id"] = rng.integers(0, num_drivers, num_rides)[:, None]
+    rides["driver_id"][:, 0] = -1
+    rides["meta_off"][:, 0] = len(driver_meta)
+    rides["meta_len"][:, 0] = len(ride_meta)
+    coordinates = rng.uniform(0, CITY_SIZE, (num_rides, 4))
+    for column, name in enumerate(("x0", "y0", "x1", "y1")):
+        rides[name][:, 0] = coordinates[:, column]
+    rides = rides.reshape(-1)
+    # The newest rides are still pending: drop their later events.
+    keep = np.ones(len(rides), dtype=bool)
+    keep[(num_rides - live) * 4:] = rides["kind"][(num_rides - live) * 4:] == Journal.RIDE_REQUESTED
+
+    drivers = np.zeros(num_drivers, dtype=Journal.RECORD_DTYPE)
+    drivers["kind"] = Journal.DRIVER_ADDED
+    drivers["driver_id"] = np.arange(num_drivers)
+    drivers["ride_id"] = -1
+    drivers["meta_len"] = len(driver_meta)
+    drivers["x0"] = rng.uniform(0, CITY_SIZE, num_drivers)
+    drivers["y0"] = rng.uniform(0, CITY_SIZE, num_drivers)
+
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, "CURRENT"), "w") as handle:
+        handle.write("1\n")
+    with open(os.path.join(directory, Journal._meta_name(1)), "wb") as handle:
+        handle.write(driver_meta + ride_meta)
+    with open(os.path.join(directory, Journal._events_name(1)), "wb") as handle:
+        handle.write(drivers.tobytes())
+        handle.write(rides[keep].tobytes())
+    return num_drivers + int(keep.sum())
+
+
+def bench_journal(num_events: int = 10_000_000, num_drivers: int = 50_000, write_ops: int = 100_000, seed: int = 7) -> None:
+    print(f"\nRide journal")
+    with tempfile.TemporaryDirectory() as directory:
+        rng = random.Random(seed)
+        drivers = make_drivers(2_000, rng)
+        rides = make_rides(write_ops // 4, rng)
+        for person in [*drivers, *(ride.rider for ride in rides)]:
+            person.echo_notifications = False
+        journal = RideJournal(os.path.join(directory, "live"))
+        matcher = Matcher(index=KDTreeIndex(), journal=journal)
+        start = time.perf_counter()
+        for driver in drivers:
+            matcher.add_driver(driver)
+        for offset in range(0, len(rides), 500):
+            batch = rides[offset:offset + 500]
+            for ride in batch:
+                matcher.add_ride_request(ride)
+            for ride, _ in matcher.make_matches():
+                ride.start_ride()
+                ride.complete_ride()
+        journal.close()
+        elapsed = time.perf_counter() - start
+        print(f"  journaled Matcher:   {journal.event_count / elapsed:>12.0f} events/s ({journal.event_count} events)")
+
+        if np is None:
+            print("  replay of a 10M-event journal needs NumPy to generate; skipped")
+            return
+        path = os.path.join(directory, "big")
+        written = write_synthetic_journal(path, num_drivers, (num_events - num_drivers) // 4, seed)
+        start = time.perf_counter()
+        result = replay(path, Matcher(index=KDTreeIndex()))
+        elapsed = time.perf_counter() - start
+        print(
+            f"  replay:              {elapsed:>12.2f} s for {written} events "
+            f"({len(result.drivers)} drivers, {len(result.rides)} live rides)"
+        )
+        journal = RideJournal(path)
+        start = time.perf_counter()
+        journal.compact()
+        elapsed = time.perf_counter() - start
+        print(f"  compaction:          {elapsed:>12.2f} s, {journal.event_count} events kept")
+        journal.close()
+
+
+def bench_snapshot(num_drivers: int = 500_000, num_rides: int = 2_000, seed: int = 7) -> None:
+    print(f"\nMatcher snapshot ({num_drivers} drivers, {num_rides} pending rides)")
+    rng = random.Random(seed)
+    store = build_fleet_store(make_drivers(num_drivers, rng))
+    matcher = Matcher()
+    matcher.add_drivers(store)
+    for ride in make_rides(num_rides, rng):
+        matcher.add_ride_request(ride)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "matcher.snap")
+        start = time.perf_counter()
+        matcher.snapshot(path)
+        elapsed = time.perf_counter() - start
+        print(f"  write:               {elapsed:>12.2f} s, {os.path.getsize(path) / 2**20:.1f} MiB")
+        start = time.perf_counter()
+        job = matcher.snapshot(path, background=True)
+        paused = time.perf_counter() - start
+        job.wait()
+        print(f"  background pause:    {paused * 1000:>12.1f} ms")
+        start = time.perf_counter()
+        restored = Matcher()
+        restored.restore(path)
+        elapsed = time.perf_counter() - start
+        print(f"  restore:             {elapsed:>12.2f} s ({len(restored.drivers)} drivers)")
+
+
+def bench_surge_quotes(open_counts=(1_000, 10_000, 100_000), num_drivers: int = 20_000, num_quotes: int = 50_000, seed: int = 7) -> None:
+    print(f"\nSurge pricing ({num_drivers} drivers, {num_quotes} quotes)")
+    for open_count in open_counts:
+        rng = random.Random(seed)
+        surge = SurgeEngine(cell_size=grid_cell_size(num_drivers))
+        matcher = Matcher(surge=surge)
+        matcher.add_drivers(make_drivers(num_drivers, rng))
+        rides = make_rides(open_count, rng)
+        start = time.perf_counter()
+        for ride in rides:
+            matcher.add_ride_request(ride)
+        requested = time.perf_counter() - start
+        pricing = SurgeCost(engine=surge)
+        quotes = make_rides(num_quotes, rng)
+        for ride in quotes:
+            ride.pricing = pricing
+        start = time.perf_counter()
+        for ride in quotes:
+            ride.calculate_cost()
+        elapsed = time.perf_counter() - start
+        print(
+            f"  {open_count:>7} open: {elapsed / num_quotes * 1e6:>8.2f} us/quote, "
+            f"{requested / open_count * 1e6:>8.2f} us/request added"
+        )
+
+
+def bench_scheduler(num_drivers: int = 30_000, num_requests: int = 24_000, burst: int = 4_000, seed: int = 7) -> None:
+    print(f"\nScheduled matching ({num_drivers} drivers, {num_requests} requests in bursts of {burst})")
+    for label, budget in (("uncapped", math.inf), ("capped", 0.02)):
+        rng = random.Random(seed)
+        drivers = make_drivers(num_drivers, rng)
+        rides = make_rides(num_requests, rng)
+        for person in [*drivers, *(ride.rider for ride in rides)]:
+            person.echo_notifications = False
+        matcher = Matcher(index=KDTreeIndex())
+        matcher.add_drivers(drivers)
+        scheduler = MatchScheduler(matcher, batch_size=1, round_budget=budget)
+        for offset in range(0, num_requests, burst):
+            for ride in rides[offset:offset + burst]:
+                scheduler.submit(ride)
+            while len(scheduler):
+                scheduler.run_round()
+        rounds = list(scheduler.stats)
+        print(
+            f"  {label:<9} {len(rounds):>5} rounds, longest {max(r.duration for r in rounds) * 1000:>7.1f} ms, "
+            f"p99 time-to-match {rounds[-1].p99_time_to_match * 1000:>7.1f} ms"
+        )
+
+
+def bench_pooling(num_requests: int = 50_000, num_drivers: int = 30_000, seed: int = 7) -> None:
+    print(f"\nPooled rides ({num_requests} shared requests, {num_drivers} drivers)")
+    rng = random.Random(seed)
+    rides = []
+    for i in range(num_requests):
+        # Commuter-like demand: trips of 5-20 km, mostly heading one way.
+        origin = (rng.uniform(0, CITY_SIZE), rng.uniform(0, CITY_SIZE))
+        heading, length = rng.gauss(0.8, 0.6), rng.uniform(5, 20)
+        destination = (origin[0] + length * math.cos(heading), origin[1] + length * math.sin(heading))
+        rider = Rider(name=f"rider-{i}", phone=str(i), rating=5, location=origin)
+        rider.echo_notifications = False
+        rides.append(
+            SharingRide(
+                from_place=origin, to=destination, ride_duration="", request_time="", rider=rider,
+                pricing=SharingCost(num_share=1), shared_by=3,
+            )
+        )
+    engine = PoolingEngine()
+    start = time.perf_counter()
+    pools = engine.group(rides)
+    elapsed = time.perf_counter() - start
+    sizes = [len(pool.rides) for pool in pools]
+    print(
+        f"  grouping:            {elapsed:>12.2f} s, {len(pools)} pools "
+        f"({', '.join(f'{sizes.count(n)} of {n}' for n in sorted(set(sizes)))})"
+    )
+
+    drivers = make_drivers(num_drivers, rng)
+    for driver in drivers:
+        driver.echo_notifications = False
+    matcher = Matcher(index=KDTreeIndex())
+    matcher.add_drivers(drivers)
+    for ride in rides:
+        matcher.add_ride_request(ride)
+    start = time.perf_counter()
+    assigned = engine.dispatch(matcher)
+    elapsed = time.perf_counter() - start
+    riders = sum(len(pool.rides) for pool, _ in assigned)
+    print(f"  grouping + dispatch: {elapsed:>12.2f} s, {riders} riders on {len(assigned)} drivers")
+
+
+def bench_instrumentation(num_drivers: int = 20_000, num_rides: int = 10_000, repeats: int = 3, seed: int = 7) -> None:
+    print(f"\nInstrumentation overhead ({num_drivers} drivers, {num_rides} rides matched, priced and completed)")
+
+    def run() -> float:
+        rng = random.Random(seed)
+        drivers = make_drivers(num_drivers, rng)
+        rides = make_rides(num_rides, rng)
+        for person in [*drivers, *(ride.rider for ride in rides)]:
+            person.echo_notifications = False
+        matcher = Matcher(index=KDTreeIndex())
+        matcher.add_drivers(drivers)
+        start = time.perf_counter()
+        for offset in range(0, num_rides, 500):
+            batch = rides[offset:offset + 500]
+            for ride in batch:
+                matcher.add_ride_request(ride)
+            for ride, _ in matcher.make_matches():
+                ride.calculate_cost()
+                ride.complete_ride()
+        return time.perf_counter() - start
+
+    # Best of a few runs: the differences are smaller than run-to-run noise.
+    baseline = min(run() for _ in range(repeats))
+    print(f"  off:                 {baseline:>12.3f} s")
+    for label, rate in (("sampled 1/10", 0.1), ("every call", 1.0)):
+        Metrics.enable(Metrics.MetricsRegistry(), sample_rate=rate)
+        try:
+            elapsed = min(run() for _ in range(repeats))
+        finally:
+            Metrics.disable()
+        print(f"  {label + ':':<20} {elapsed:>12.3f} s ({(elapsed / baseline - 1) * 100:+.1f}%)")
+
+
+def bench_concurrent_matcher(
+    producers: int = 32, ops_per_producer: int = 3_000, num_drivers: int = 5_000, matchers: int = 2, seed: int = 7
+) -> None:
+    print(f"\nConcurrent Matcher ({producers} producers x {ops_per_producer} ops, {matchers} matching threads)")
+    rng = random.Random(seed)
+    drivers = make_drivers(num_drivers, rng)
+    for driver in drivers:
+        driver.echo_notifications = False
+    matcher = ConcurrentMatcher(index=GridIndex(cell_size=grid_cell_size(num_drivers)))
+    matcher.add_drivers(drivers)
+    done = threading.Event()
+    submitted: list[list[Ride]] = [[] for _ in range(producers)]
+    matched: list[list[tuple[Ride, Driver]]] = [[] for _ in range(matchers)]
+
+    def produce(worker: int) -> None:
+        local = random.Random(seed + worker)
+        own = submitted[worker]
+        extra = []
+        for i in range(ops_per_producer):
+            roll = local.random()
+            if roll < 0.70 or not own:
+                (ride,) = make_rides(1, local)
+                ride.rider.echo_notifications = False
+                own.append(ride)
+                matcher.add_ride_request(ride)
+            elif roll < 0.75:
+                matcher.remove_ride_request(local.choice(own))
+            elif roll < 0.80:
+                driver = Driver(
+                    name=f"late-{worker}-{i}", phone="", rating=5,
+                    location=(local.uniform(0, CITY_SIZE), local.uniform(0, CITY_SIZE)),
+                    vehicle=Car(name="camry", number=f"late-{worker}-{i}"),
+                )
+                driver.echo_notifications = False
+                extra.append(driver)
+                matcher.add_driver(driver)
+            elif roll < 0.85:
+                matcher.move_driver(local.choice(drivers), (local.uniform(0, CITY_SIZE), local.uniform(0, CITY_SIZE)))
+            elif roll < 0.87 and extra:
+                matcher.remove_driver(extra.pop())
+            else:
+                ride = local.choice(own)
+                if ride.driver is not None and ride.status == RideStatus.PENDING:
+                    matcher.complete_ride(ride)
+
+    def match(worker: int) -> None:
+        while not done.is_set():
+            matched[worker].extend(matcher.make_matches())
+        matched[worker].extend(matcher.make_matches())
+
+    threads = [threading.Thread(target=match, args=(i,)) for i in range(matchers)]
+    threads += [threading.Thread(target=produce, args=(i,)) for i in range(producers)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads[matchers:]:
+        thread.join()
+    done.set()
+    for thread in threads[:matchers]:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    matches = sum(len(worker) for worker in matched)
+    print(f"  {producers * ops_per_producer / elapsed:>10.0f} producer ops/s, {matches} matches in {elapsed:.2f} s")
+
+
+def bench_parallel_matching(
+    worker_counts=(0, 1, 2, 4), num_drivers: int = 40_000, num_rides: int = 10_000, seed: int = 7
+) -> None:
+    print(f"\nShared-memory parallel matching, {num_drivers} drivers, {num_rides} requests")
+    print(f"{'strategy':>10} {'rides/s':>12} {'matched':>9}")
+    rng = random.Random(seed)
+    drivers = make_drivers(num_drivers, rng)
+    rides = make_rides(num_rides, rng)
+    elapsed, matches = time_matching(Matcher(strategy=VectorizedMatching()), drivers, rides)
+    print(f"{'numpy':>10} {num_rides / elapsed:>12.0f} {len(matches):>9}")
+    for workers in worker_counts:
+        with ParallelMatching(workers=workers) as strategy:
+            elapsed, matches = time_matching(Matcher(strategy=strategy), drivers, rides)
+        label = "in-proc" if workers == 0 else f"{workers} proc"
+        print(f"{label:>10} {num_rides / elapsed:>12.0f} {len(matches):>9}")
+
+
+def bench_quote_cache(num_trips: int = 10_000, quotes_per_trip: int = 5, num_drivers: int = 20_000, seed: int = 7) -> None:
+    print(f"\nQuote cache, {num_trips} trips quoted {quotes_per_trip} times each, surge-priced")
+    rng = random.Random(seed)
+    surge = SurgeEngine(cell_size=grid_cell_size(num_drivers))
+    matcher = Matcher(surge=surge)
+    matcher.add_drivers(make_drivers(num_drivers, rng))
+    for ride in make_rides(num_trips, rng):
+        matcher.add_ride_request(ride)
+    pricing = SurgeCost(engine=surge)
+    rider = Rider(name="rider", phone="0", rating=5, location=(0.0, 0.0))
+    places = [
+        (f"{rng.uniform(0, CITY_SIZE):.3f} {rng.uniform(0, CITY_SIZE):.3f}",
+         f"{rng.uniform(0, CITY_SIZE):.3f} {rng.uniform(0, CITY_SIZE):.3f}")
+        for _ in range(num_trips)
+    ]
+    # Each quote is a fresh Ride, as when a rider asks again.
+    quotes = [
+        Ride(from_place=origin, to=destination, ride_duration="10 mins", request_time="10 pm", rider=rider, pricing=pricing)
+        for origin, destination in places
+        for _ in range(quotes_per_trip)
+    ]
+    start = time.perf_counter()
+    expected = [ride.calculate_cost() for ride in quotes]
+    uncached = time.perf_counter() - start
+    service = QuoteService(surge=surge)
+    for ride in quotes:
+        ride._distance = ride._base_cost = None
+    start = time.perf_counter()
+    quoted = service.quote_many(quotes)
+    cached = time.perf_counter() - start
+    stats = service.fares.stats
+    hit_rate = stats.hits / (stats.hits + stats.misses)
+    start = time.perf_counter()
+    service.quote_many(quotes)
+    warm = time.perf_counter() - start
+    error = max(abs(a - b) for a, b in zip(quoted, expected))
+    print(f"  calculate_cost:   {uncached / len(quotes) * 1e6:>6.2f} us/quote")
+    print(
+        f"  quote cache:      {cached / len(quotes) * 1e6:>6.2f} us/quote, "
+        f"fare hit rate {hit_rate:.0%}, max error {error:.4f}"
+    )
+    print(f"  every quote a hit: {warm / len(quotes) * 1e6:>5.2f} us/quote")
+
+
+def write_grid_edge_list(path: str, side: int, rng: random.Random, bridge_every: int = 50) -> int:
+    """
+    A ``side`` x ``side`` street grid over the city, cut down the middle by a
+    river with a bridge every ``bridge_every`` streets. Streets are 1 to 1.5
+    times their straight length, for traffic. Returns the number of streets.
+    """
+    spacing = CITY_SIZE / (side - 1)
+    river = side // 2
+    streets = 0
+    with open(path, "w") as handle:
+        for row in range(side):
+            handle.writelines(f"n {row * side + column} {column * spacing:.6f} {row * spacing:.6f}\n" for column in range(side))
+        for row in range(side):
+            for column in range(side):
+                node = row * side + column
+                if column + 1 < side and (column != river or row % bridge_every == 0):
+                    handle.write(f"e {node} {node + 1} {spacing * rng.uniform(1.0, 1.5):.6f}\n")
+                    streets += 1
+                if row + 1 < side:
+                    handle.write(f"e {node} {node + side} {spacing * rng.uniform(1.0, 1.5):.6f}\n")
+                    streets += 1
+    return streets
+
+
+def bench_road_network(side: int = 708, num_queries: int = 200, num_plain: int = 10, seed: int = 7) -> None:
+    rng = random.Random(seed)
+    with tempfile.TemporaryDirectory() as directory:
+        edge_list, path = os.path.join(directory, "streets.txt"), os.path.join(directory, "streets.road")
+        streets = write_grid_edge_list(edge_list, side, rng)
+        print(f"\nRoad network, {side}x{side} grid, {streets} streets, 8 landmarks")
+        start = time.perf_counter()
+        build_road_network(edge_list, path, landmarks=8)
+        elapsed = time.perf_counter() - start
+        print(f"  offline build:   {elapsed:>9.2f} s, {os.path.getsize(path) / 2**20:.1f} MiB")
+        start = time.perf_counter()
+        network = RoadNetwork(path)
+        print(f"  startup (mmap):  {(time.perf_counter() - start) * 1000:>9.2f} ms")
+
+        points = [(rng.uniform(0, CITY_SIZE), rng.uniform(0, CITY_SIZE)) for _ in range(2 * num_queries)]
+        start = time.perf_counter()
+        nodes = [network.nearest_node(point) for point in points]
+        print(f"  snap to node:    {(time.perf_counter() - start) / len(points) * 1e6:>9.2f} us")
+        latencies = []
+        for source, target in zip(nodes[::2], nodes[1::2]):
+            start = time.perf_counter()
+            network.node_distance(source, target)
+            latencies.append(time.perf_counter() - start)
+        latencies.sort()
+        print(
+            f"  A* + landmarks:  {latencies[len(latencies) // 2] * 1000:>9.2f} ms p50, "
+            f"{latencies[int(len(latencies) * 0.99)] * 1000:.2f} ms p99"
+        )
+        plain = []
+        for source, target in zip(nodes[:2 * num_plain:2], nodes[1:2 * num_plain:2]):
+            start = time.perf_counter()
+            network._search_many(source, {target})
+            plain.append(time.perf_counter() - start)
+        plain.sort()
+        print(f"  plain Dijkstra:  {plain[len(plain) // 2] * 1000:>9.2f} ms p50")
+        network.close()
+
+
+def bench_reranked_matching(
+    side: int = 300, num_drivers: int = 5_000, num_rides: int = 2_000, budgets=(None, 0.5), seed: int = 7
+) -> None:
+    rng = random.Random(seed)
+    drivers = make_drivers(num_drivers, rng)
+    rides = make_rides(num_rides, rng)
+    print(f"\nETA re-ranking, {num_drivers} drivers, {num_rides} requests, {side}x{side} streets with a river")
+    print(f"{'strategy':>22} {'ms/request':>11} {'mean road pickup':>17} {'changed':>8} {'over budget':>12}")
+    with tempfile.TemporaryDirectory() as directory:
+        edge_list, path = os.path.join(directory, "streets.txt"), os.path.join(directory, "streets.road")
+        write_grid_edge_list(edge_list, side, rng)
+        build_road_network(edge_list, path)
+        with RoadNetwork(path) as network:
+
+            def run(label: str, strategy: MatchingStrategy) -> None:
+                elapsed, matches = time_matching(Matcher(index=KDTreeIndex(), strategy=strategy), drivers, rides)
+                rider_at = {id(ride): ride.rider.location for ride in rides}
+                driver_at = {id(driver): driver.location for driver in drivers}
+                road = [network.distance(rider_at[ride], driver_at[driver]) for ride, driver in matches]
+                report = getattr(strategy, "last_report", None)
+                changed = f"{report.change_rate:.0%}" if report is not None else "-"
+                over_budget = str(report.over_budget) if report is not None else "-"
+                print(
+                    f"{label:>22} {elapsed / num_rides * 1000:>11.3f} {sum(road) / len(road):>17.3f} "
+                    f"{changed:>8} {over_budget:>12}"
+                )
+
+            run("straight-line greedy", GreedyMatching())
+            for budget in budgets:
+                label = "re-ranked, k=8" if budget is None else f"re-ranked, {budget}s cap"
+                run(label, RerankedMatching(EtaCost(network), candidates=8, round_budget=budget))
+
+
+def bench_simulation(num_drivers: int = 1_500, num_riders: int = 20_000, hours: float = 24.0, seed: int = 7) -> None:
+    config = SimulationConfig(
+        city=CityConfig(num_drivers=num_drivers, num_riders=num_riders, distribution="clustered", seed=seed),
+        duration=hours * 3600.0,
+        seed=seed,
+    )
+    print(f"\nSimulated day, {num_drivers} drivers, {num_riders} riders, {hours:g} h")
+    start = time.perf_counter()
+    report = Simulation(config).run()
+    elapsed = time.perf_counter() - start
+    print(
+        f"  {elapsed:.2f} s, {config.duration / elapsed:.0f}x real time; {report.events} events, "
+        f"{report.completed} rides completed, utilization {report.utilization:.1%}"
+    )
+
+
+if __name__ == "__main__":
+    bench_spatial_index()
+    bench_position_updates()
+    bench_vectorized_matching()
+    bench_batch_matching()
+    bench_fleet_store()
+    bench_fare_computation()
+    bench_notification_memory()
+    bench_sharded_matching()
+    bench_ingestion()
+    bench_registry_ops()
+    bench_journal()
+    bench_snapshot()
+    bench_surge_quotes()
+    bench_scheduler()
+    bench_pooling()
+    bench_instrumentation()
+    bench_concurrent_matcher()
+    bench_parallel_matching()
+    bench_quote_cache()
+    bench_road_network()
+    bench_reranked_matching()
+    bench_simulation()
@@ -0,0 +1,154 @@
+"""
+A Matcher that many threads can use at once.
+
+Requests and drivers are guarded by striped locks: each entity hashes to one
+of ``stripes`` locks, so threads working on different entities rarely wait
+for each other, while every change to one entity is serialized. Adding,
+removing or moving a driver touches the spatial index, which is not
+thread-safe, so those updates go through a queue. Whoever holds the index
+lock drains the queue: a producer that finds the lock free applies it
+directly, and a matching round applies it before searching. Producers never
+wait for a round to finish, and a round never sees the index half-updated.
+
+A round proposes pairs from a snapshot of the pending requests and free
+drivers, then claims each driver under its stripe lock. A claim only
+succeeds if the driver is still registered and free and the request is
+still pending, so concurrent rounds, completions and cancellations can never
+give one driver two rides. A request whose claim fails stays pending for the
+next round.
+
+Rides assigned here should be completed with ``complete_ride``, which waits
+for the driver's claim to finish. Observers are notified while the claim's
+locks are held, so they should be quick. Journals and surge engines are not
+thread-safe and are not supported.
+"""
+
+from __future__ import annotations
+
+import threading
+from collections import deque
+from typing import TYPE_CHECKING, Iterable
+
+from Matcher import Matcher
+
+if TYPE_CHECKING:
+    from Matching import MatchingStrategy
+    from People import Driver
+    from RideNotifier import AsyncNotificationDispatcher
+    from Rides import Ride
+    from SpatialIndex import SpatialIndex
+
+
+class ConcurrentMatcher(Matcher):
+
+    def __init__(
+        self,
+        index: SpatialIndex | None = None,
+        strategy: MatchingStrategy | None = None,
+        dispatcher: AsyncNotificationDispatcher | None = None,
+        stripes: int = 64,
+    ):
+        super().__init__(index, strategy, dispatcher)
+        if stripes < 1:
+            raise ValueError("stripes must be at least 1")
+        self._request_locks = [threading.Lock() for _ in range(stripes)]
+        # Reentrant: a claim holds the driver's lock while assign_driver
+        # calls back into driver_availability_changed.
+        self._driver_locks = [threading.RLock() for _ in range(stripes)]
+        self._index_lock = threading.Lock()
+        self._index_updates: deque[tuple] = deque()
+
+    def _request_lock(self, ride_request: Ride) -> threading.Lock:
+        # Object addresses are 16-byte aligned; drop the always-zero bits.
+        return self._request_locks[(id(ride_request) >> 4) % len(self._request_locks)]
+
+    def _driver_lock(self, driver: Driver) -> threading.RLock:
+        return self._driver_locks[hash(driver) % len(self._driver_locks)]
+
+    def add_ride_request(self, ride_request: Ride):
+        with self._request_lock(ride_request):
+            super().add_ride_request(ride_request)
+
+    def remove_ride_request(self, ride_request: Ride):
+        with self._request_lock(ride_request):
+            super().remove_ride_request(ride_request)
+
+    def add_driver(self, driver: Driver):
+        with self._driver_lock(driver):
+            if driver in self._drivers:
+                return
+            self._drivers[driver] = None
+            if driver.is_available:
+                self._available_drivers[driver] = None
+            driver.add_availability_listener(self)
+            if self.index is not None:
+                self._index_updates.append((self.index.add, driver))
+        self._try_update_index()
+
+    def add_drivers(self, drivers: Iterable[Driver]):
+        for driver in drivers:
+            self.add_driver(driver)
+
+    def remove_driver(self, driver: Driver):
+        with self._driver_lock(driver):
+            if driver not in self._drivers:
+                return
+            del self._drivers[driver]
+            self._available_drivers.pop(driver, None)
+            driver.remove_availability_listener(self)
+            if self.index is not None:
+                self._index_updates.append((self.index.remove, driver))
+        self._try_update_index()
+
+    def move_driver(self, driver: Driver, new_location: tuple[float, float] | str):
+        location = driver._to_coords(new_location)
+        with self._driver_lock(driver):
+            if self.index is None:
+                driver.location = location
+                return
+            self._index_updates.append((self.index.move, driver, location))
+        self._try_update_index()
+
+    def driver_availability_changed(self, driver: Driver):
+        with self._driver_lock(driver):
+            super().driver_availability_changed(driver)
+
+    def make_matches(self, ride_requests: list[Ride] | None = None):
+        with self._index_lock:
+            self._apply_index_updates()
+            proposed = self.propose_matches(ride_requests)
+        return [(ride_request, driver) for ride_request, driver in proposed if self.assign(ride_request, driver)]
+
+    def assign(self, ride_request: Ride, driver: Driver) -> bool:
+        """Claim ``driver`` for ``ride_request``; False if either was taken or withdrawn first."""
+        with self._driver_lock(driver):
+            if not driver.is_available or driver not in self._drivers:
+                return False
+            with self._request_lock(ride_request):
+                if self._ride_requests.pop(id(ride_request), None) is None:
+                    return False
+                ride_request.assign_driver(driver)
+        return True
+
+    def complete_ride(self, ride: Ride):
+        """Ride.complete_ride, ordered after the claim that assigned the driver."""
+        driver = ride.driver
+        if driver is None:
+            ride.complete_ride()
+            return
+        with self._driver_lock(driver):
+            ride.complete_ride()
+
+    def _try_update_index(self) -> None:
+        # If a round holds the lock, it applies the queue before it searches.
+        if self._index_lock.acquire(blocking=False):
+            try:
+                self._apply_index_updates()
+            finally:
+                self._index_lock.release()
+
+    def _apply_index_updates(self) -> None:
+        updates = self._index_updates
+        while updates:
+            update, *args = updates.popleft()
+            update(*args)
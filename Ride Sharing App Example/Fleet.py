@@ -0,0 +1,243 @@
+"""
+Columnar driver storage.
+
+FleetStore keeps one typed array per driver attribute instead of one Python
+object per driver, so a large fleet costs a few dozen bytes per driver plus
+its strings. A driver's slot number is its id. DriverView objects are created
+on demand and read and write straight through to the arrays, so they can be
+handed to Ride, Matcher and the observers like any other Driver.
+"""
+
+from __future__ import annotations
+
+from array import array
+from typing import TYPE_CHECKING, Iterator
+
+from People import DEFAULT_NOTIFICATION_CAPACITY, Driver, NotificationLog
+
+if TYPE_CHECKING:
+    from Vehicles import Vehicle
+
+
+class FleetStore:
+
+    def __init__(self, notification_capacity: int | None = DEFAULT_NOTIFICATION_CAPACITY):
+        self.notification_capacity = notification_capacity
+        self.xs = array("d")
+        self.ys = array("d")
+        self.available = array("b")
+        self.active = array("b")
+        self.ratings = array("B")
+        self.vehicle_types = array("B")
+        self.names: list[str] = []
+        self.phones: list[str] = []
+        self.vehicle_names: list[str] = []
+        self.vehicle_numbers: list[str] = []
+        self.vehicle_classes: list[type[Vehicle]] = []
+        self._vehicle_codes: dict[type[Vehicle], int] = {}
+        # Only drivers that actually received notifications get a log.
+        self._notification_logs: dict[int, NotificationLog] = {}
+        # Shared by every driver in the store. A driver that dropped some of
+        # them has an entry in _muted_listeners, so the common case of every
+        # driver hearing the same listeners needs no per-slot bookkeeping.
+        self.availability_listeners: tuple = ()
+        self._muted_listeners: dict[int, tuple] = {}
+
+    def __len__(self) -> int:
+        return len(self.xs)
+
+    def __iter__(self) -> Iterator[DriverView]:
+        for slot in range(len(self.xs)):
+            if self.active[slot]:
+                yield DriverView(self, slot)
+
+    def add(
+        self,
+        name: str,
+        phone: str,
+        rating: int,
+        location: tuple[float, float] | str,
+        vehicle: Vehicle,
+    ) -> DriverView:
+        x, y = Driver._to_coords(location)
+        slot = len(self.xs)
+        self.xs.append(x)
+        self.ys.append(y)
+        self.available.append(1)
+        self.active.append(1)
+        self.ratings.append(rating)
+        self.vehicle_types.append(self.vehicle_code(type(vehicle)))
+        self.names.append(name)
+        self.phones.append(phone)
+        self.vehicle_names.append(vehicle.name)
+        self.vehicle_numbers.append(vehicle.number)
+        return DriverView(self, slot)
+
+    def remove(self, slot: int) -> None:
+        was_available = self.available[slot]
+        self.active[slot] = 0
+        self.available[slot] = 0
+        self._notification_logs.pop(slot, None)
+        if was_available:
+            # As set_available would, so a Matcher stops offering the driver.
+            view = DriverView(self, slot)
+            for listener in view.availability_listeners:
+                listener.driver_availability_changed(view)
+        self._muted_listeners.pop(slot, None)
+
+    def load_columns(
+        self,
+        xs: array,
+        ys: array,
+        available: array,
+        ratings: array,
+        vehicle_types: array,
+        vehicle_classes: list[type[Vehicle]],
+        names: list[str],
+        phones: list[str],
+        vehicle_names: list[str],
+        vehicle_numbers: list[str],
+    ) -> range:
+        """Append many drivers from whole columns; returns their slots."""
+        start = len(self.xs)
+        codes = bytes(self.vehicle_code(cls) for cls in vehicle_classes)
+        if codes != bytes(range(len(codes))):
+            # Renumber into this store's vehicle codes in one C-level pass.
+            vehicle_types = array("B", vehicle_types.tobytes().translate(codes.ljust(256, b"\0")))
+        self.xs.extend(xs)
+        self.ys.extend(ys)
+        self.available.extend(available)
+        self.active.extend(array("b", b"\x01") * len(xs))
+        self.ratings.extend(ratings)
+        self.vehicle_types.extend(vehicle_types)
+        self.names.extend(names)
+        self.phones.extend(phones)
+        self.vehicle_names.extend(vehicle_names)
+        self.vehicle_numbers.extend(vehicle_numbers)
+        return range(start, len(self.xs))
+
+    def add_availability_listener(self, listener) -> None:
+        if listener not in self.availability_listeners:
+            self.availability_listeners = (*self.availability_listeners, listener)
+
+    def remove_availability_listener(self, listener) -> None:
+        self.availability_listeners = tuple(
+            existing for existing in self.availability_listeners if existing is not listener
+        )
+
+    def view(self, slot: int) -> DriverView:
+        return DriverView(self, slot)
+
+    def vehicle_code(self, vehicle_class: type[Vehicle]) -> int:
+        code = self._vehicle_codes.get(vehicle_class)
+        if code is None:
+            code = len(self.vehicle_classes)
+            self.vehicle_classes.append(vehicle_class)
+            self._vehicle_codes[vehicle_class] = code
+        return code
+
+    def fare_per_km(self, slot: int) -> float:
+        vehicle_class = self.vehicle_classes[self.vehicle_types[slot]]
+        return float(getattr(vehicle_class, "base_fare_per_km", 10.0))
+
+    def fares_by_code(self) -> list[float]:
+        return [float(getattr(cls, "base_fare_per_km", 10.0)) for cls in self.vehicle_classes]
+
+    def available_slots(self) -> list[int]:
+        return [
+            slot for slot, (flag, active) in enumerate(zip(self.available, self.active))
+            if flag and active
+        ]
+
+
+class DriverView(Driver):
+    """A Driver whose state lives in a FleetStore slot."""
+
+    def __init__(self, store: FleetStore, slot: int):
+        # Deliberately skips Driver.__init__: every field is a property below.
+        self.store = store
+        self.slot = slot
+
+    def __eq__(self, other: object) -> bool:
+        return (
+            isinstance(other, DriverView) and other.store is self.store and other.slot == self.slot
+        )
+
+    def __hash__(self) -> int:
+        return hash((id(self.store), self.slot))
+
+    def __repr__(self) -> str:
+        return f"DriverView(slot={self.slot}, name={self.name!r})"
+
+    @property
+    def name(self) -> str:
+        return self.store.names[self.slot]
+
+    @property
+    def phone(self) -> str:
+        return self.store.phones[self.slot]
+
+    @property
+    def rating(self) -> int:
+        return self.store.ratings[self.slot]
+
+    @rating.setter
+    def rating(self, value: int) -> None:
+        self.store.ratings[self.slot] = value
+
+    @property
+    def location(self) -> tuple[float, float]:
+        return self.store.xs[self.slot], self.store.ys[self.slot]
+
+    @location.setter
+    def location(self, value: tuple[float, float]) -> None:
+        self.store.xs[self.slot], self.store.ys[self.slot] = value
+
+    @property
+    def is_available(self) -> bool:
+        return bool(self.store.available[self.slot])
+
+    @is_available.setter
+    def is_available(self, value: bool) -> None:
+        self.store.available[self.slot] = 1 if value else 0
+
+    @property
+    def availability_listeners(self) -> tuple:
+        listeners = self.store.availability_listeners
+        muted = self.store._muted_listeners.get(self.slot)
+        if muted is None:
+            return listeners
+        return tuple(listener for listener in listeners if listener not in muted)
+
+    def add_availability_listener(self, listener) -> None:
+        store = self.store
+        store.add_availability_listener(listener)
+        muted = store._muted_listeners.get(self.slot)
+        if muted is not None and listener in muted:
+            muted = tuple(existing for existing in muted if existing is not listener)
+            if muted:
+                store._muted_listeners[self.slot] = muted
+            else:
+                del store._muted_listeners[self.slot]
+
+    def remove_availability_listener(self, listener) -> None:
+        # Other drivers in the store keep the listener.
+        store = self.store
+        if listener in store.availability_listeners:
+            muted = store._muted_listeners.get(self.slot, ())
+            if listener not in muted:
+                store._muted_listeners[self.slot] = (*muted, listener)
+
+    @property
+    def vehicle(self) -> Vehicle:
+        store = self.store
+        vehicle_class = store.vehicle_classes[store.vehicle_types[self.slot]]
+        return vehicle_class(name=store.vehicle_names[self.slot], number=store.vehicle_numbers[self.slot])
+
+    @property
+    def notification_log(self) -> NotificationLog:
+        logs = self.store._notification_logs
+        log = logs.get(self.slot)
+        if log is None:
+            log = logs[self.slot] = NotificationLog(self.store.notification_capacity)
+        return log
@@ -0,0 +1,302 @@
+"""
+Streaming ingestion of ride requests and driver updates.
+
+Events are read lazily from JSONL or CSV, turned into Driver/Ride objects one
+at a time, and applied to a Matcher. Matching runs in micro-batches: after a
+fixed number of ride requests, or when event time moves past the end of the
+current window, whichever comes first. Nothing holds on to the input, so
+memory depends on how many rides are open at once, not on the file size;
+``max_pending`` (``MAX_PENDING`` by default) also caps the unmatched backlog
+when supply runs short, dropping the oldest requests. Passing None lifts the
+cap, and with it the bound on memory.
+
+Every event is a flat record with a ``type`` field:
+
+    driver    id, name, phone, rating, location, vehicle, plate
+    location  id, location
+    request   id, time, name, phone, from, to, pricing, share
+    complete  id
+
+For example, one JSONL line per event:
+
+    {"type": "request", "id": "r1", "time": 36000, "name": "ann", "from": "1 3", "to": "12 7"}
+
+Replay a whole file with:
+
+    python3 Ingestion.py day.jsonl --batch-size 500 --window 60
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import time
+from dataclasses import dataclass
+from typing import IO, TYPE_CHECKING, Iterable, Iterator
+
+from Matcher import Matcher
+from People import Driver, Rider
+from Pricing import LuxCost, NormalCost, SharingCost, SurgeCost
+from Rides import Ride, SharingRide
+from Vehicles import Bike, Car, LargeCar, LuxCar, SmallCar, Vehicle
+
+if TYPE_CHECKING:
+    from Pricing import Cost
+
+VEHICLE_TYPES: dict[str, type[Vehicle]] = {
+    cls.__name__.lower(): cls for cls in (Vehicle, Bike, Car, SmallCar, LargeCar, LuxCar)
+}
+
+# Unmatched requests kept after a round before the oldest are dropped.
+MAX_PENDING = 100_000
+
+
+def read_jsonl(source: str | IO[str] | Iterable[str]) -> Iterator[dict]:
+    for line in _lines(source):
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def read_csv(source: str | IO[str] | Iterable[str]) -> Iterator[dict]:
+    for row in csv.DictReader(_lines(source)):
+        # Blank cells stand for "not set" so one header can serve every event type.
+        yield {key: value for key, value in row.items() if value not in ("", None)}
+
+
+def read_events(path: str) -> Iterator[dict]:
+    return read_csv(path) if path.endswith(".csv") else read_jsonl(path)
+
+
+def _lines(source: str | IO[str] | Iterable[str]) -> Iterator[str]:
+    if isinstance(source, str):
+        with open(source, newline="") as handle:
+            yield from handle
+    else:
+        yield from source
+
+
+@dataclass
+class BatchReport:
+    batch: int
+    requests: int
+    location_updates: int
+    drivers_added: int
+    completions: int
+    matched: int
+    pending: int
+    dropped: int
+    first_event_time: float | None
+    last_event_time: float | None
+    latency: float
+
+
+class IngestionPipeline:
+    """
+    Feeds an event stream into a Matcher in micro-batches.
+
+    ``run`` is a generator yielding one BatchReport per matching round. Its
+    ``latency`` is wall time from reading the batch's first event until the
+    batch's matches are assigned.
+
+    A sharing request's ``share`` is the most riders it will share with, from
+    1 to ``max_share``; requests outside that range are rejected.
+    """
+
+    def __init__(
+        self,
+        matcher: Matcher,
+        batch_size: int = 500,
+        window: float | None = None,
+        max_pending: int | None = MAX_PENDING,
+        echo_notifications: bool = False,
+        max_share: int = 4,
+    ):
+        if batch_size < 1 or max_share < 1:
+            raise ValueError("batch_size and max_share must be at least 1")
+        self.matcher = matcher
+        self.batch_size = batch_size
+        self.window = window
+        self.max_pending = max_pending
+        self.echo_notifications = echo_notifications
+        self.max_share = max_share
+        # Strategies are stateless, so every ride priced the same way shares one.
+        self._pricing: dict[str, Cost] = {"normal": NormalCost(), "surge": SurgeCost(), "lux": LuxCost()}
+        self._sharing_pricing = [SharingCost(num_share=share) for share in range(1, max_share + 1)]
+        self._drivers: dict[str, Driver] = {}
+        # Matched rides that have not completed yet, by request id.
+        self._open_rides: dict[str, Ride] = {}
+        self._pending_ids: dict[int, str] = {}
+
+    def run(self, events: Iterable[dict]) -> Iterator[BatchReport]:
+        batch = 0
+        counts = self._empty_counts()
+        started = None
+        first_time = last_time = None
+        window_end = None
+
+        for event in events:
+            if started is None:
+                started = time.perf_counter()
+            kind = event["type"]
+            event_time = float(event["time"]) if "time" in event else None
+
+            if event_time is not None and window_end is not None and event_time >= window_end:
+                # This event opens a new window: match what the old one collected first.
+                yield self._match(batch, counts, first_time, last_time, started)
+                batch += 1
+                counts = self._empty_counts()
+                started = time.perf_counter()
+                first_time = None
+            if event_time is not None:
+                if first_time is None:
+                    first_time = event_time
+                    if self.window is not None:
+                        window_end = event_time + self.window
+                last_time = event_time
+
+            self._apply(kind, event, counts)
+
+            if counts["requests"] >= self.batch_size:
+                yield self._match(batch, counts, first_time, last_time, started)
+                batch += 1
+                counts = self._empty_counts()
+                started = None
+                first_time = last_time = window_end = None
+
+        if started is not None:
+            yield self._match(batch, counts, first_time, last_time, started)
+
+    def _apply(self, kind: str, event: dict, counts: dict[str, int]) -> None:
+        if kind == "request":
+            ride = self._parse_ride(event)
+            self._pending_ids[id(ride)] = str(event["id"])
+            self.matcher.add_ride_request(ride)
+            counts["requests"] += 1
+        elif kind == "location":
+            driver = self._drivers.get(str(event["id"]))
+            if driver is not None:
+                self.matcher.move_driver(driver, event["location"])
+                counts["location_updates"] += 1
+        elif kind == "driver":
+            driver = self._parse_driver(event)
+            self._drivers[str(event["id"])] = driver
+            self.matcher.add_driver(driver)
+            counts["drivers_added"] += 1
+        elif kind == "complete":
+            ride = self._open_rides.pop(str(event["id"]), None)
+            if ride is not None:
+                ride.complete_ride()
+                counts["completions"] += 1
+        else:
+            raise ValueError(f"unknown event type {kind!r}")
+
+    def _match(
+        self,
+        batch: int,
+        counts: dict[str, int],
+        first_time: float | None,
+        last_time: float | None,
+        started: float,
+    ) -> BatchReport:
+        matches = self.matcher.make_matches()
+        for ride, _ in matches:
+            # Someone else may have put requests on the same Matcher.
+            request_id = self._pending_ids.pop(id(ride), None)
+            if request_id is not None:
+                self._open_rides[request_id] = ride
+        dropped = self._drop_oldest_pending()
+        return BatchReport(
+            batch=batch,
+            matched=len(matches),
+            pending=self.matcher.num_ride_requests,
+            dropped=dropped,
+            first_event_time=first_time,
+            last_event_time=last_time,
+            latency=time.perf_counter() - started,
+            **counts,
+        )
+
+    def _drop_oldest_pending(self) -> int:
+        matcher = self.matcher
+        if self.max_pending is None or matcher.num_ride_requests <= self.max_pending:
+            return 0
+        excess = matcher.num_ride_requests - self.max_pending
+        for ride in matcher.ride_requests[:excess]:
+            self._pending_ids.pop(id(ride), None)
+            matcher.remove_ride_request(ride)
+        return excess
+
+    @staticmethod
+    def _empty_counts() -> dict[str, int]:
+        return {"requests": 0, "location_updates": 0, "drivers_added": 0, "completions": 0}
+
+    def _parse_driver(self, event: dict) -> Driver:
+        vehicle_class = VEHICLE_TYPES[str(event.get("vehicle", "car")).lower()]
+        driver = Driver(
+            name=str(event.get("name", event["id"])),
+            phone=str(event.get("phone", "")),
+            rating=int(event.get("rating", 5)),
+            location=event["location"],
+            vehicle=vehicle_class(name=str(event.get("vehicle", "car")), number=str(event.get("plate", ""))),
+        )
+        if not self.echo_notifications:
+            driver.echo_notifications = False
+        return driver
+
+    def _parse_ride(self, event: dict) -> Ride:
+        rider = Rider(
+            name=str(event.get("name", event["id"])),
+            phone=str(event.get("phone", "")),
+            rating=int(event.get("rating", 5)),
+            location=event["from"],
+        )
+        if not self.echo_notifications:
+            rider.echo_notifications = False
+        pricing_name = str(event.get("pricing", "normal")).lower()
+        common = dict(
+            from_place=event["from"],
+            to=event["to"],
+            ride_duration=str(event.get("duration", "")),
+            request_time=str(event.get("time", "")),
+            rider=rider,
+        )
+        if pricing_name == "sharing":
+            share = int(event.get("share", 2))
+            if not 1 <= share <= self.max_share:
+                raise ValueError(f"share must be between 1 and {self.max_share}, got {share}")
+            return SharingRide(pricing=self._sharing_pricing[share - 1], shared_by=share, **common)
+        return Ride(pricing=self._pricing[pricing_name], **common)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Replay a JSONL or CSV event file through a Matcher.")
+    parser.add_argument("path")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--window", type=float, default=None, help="event-time seconds per batch")
+    parser.add_argument("--max-pending", type=int, default=MAX_PENDING)
+    args = parser.parse_args(argv)
+
+    from SpatialIndex import KDTreeIndex
+
+    pipeline = IngestionPipeline(Matcher(index=KDTreeIndex()), args.batch_size, args.window, args.max_pending)
+    totals = {"batches": 0, "requests": 0, "matched": 0}
+    worst = 0.0
+    for report in pipeline.run(read_events(args.path)):
+        totals["batches"] += 1
+        totals["requests"] += report.requests
+        totals["matched"] += report.matched
+        worst = max(worst, report.latency)
+        print(
+            f"batch {report.batch}: {report.requests} requests, {report.matched} matched, "
+            f"{report.pending} pending, latency {report.latency * 1000:.1f} ms"
+        )
+    print(
+        f"{totals['batches']} batches, {totals['requests']} requests, "
+        f"{totals['matched']} matched, worst batch latency {worst * 1000:.1f} ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,626 @@
+"""
+Append-only journal of driver and ride lifecycle events.
+
+A RideJournal attached to a Matcher records every driver joining, moving and
+leaving, and every ride being requested, assigned, started, completed or
+cancelled. Events are fixed-size 64-byte binary records, so replay can map
+the file and scan it as one array. The strings needed to rebuild a driver or
+ride (names, vehicle, pricing, times) go to a JSON-lines side file, and the
+record holds their offset.
+
+Writes are buffered and committed as a group: one write (and, with
+``sync=True``, one fsync) once ``group_size`` events are buffered or the
+oldest of them is ``max_delay`` seconds old. The journal has no thread of
+its own, so that age is only checked when an event is appended or ``poll``
+is called: after a burst, the last few events stay buffered until the next
+event, ``poll``, ``commit`` or ``close``. A crash loses at most the
+uncommitted group, fewer than ``group_size`` events; call ``poll`` from the
+event loop to also keep them no older than ``max_delay`` plus the polling
+interval.
+
+``replay`` rebuilds a Matcher with its drivers, pending requests and
+in-progress rides. Only the last event of each driver and ride matters, so
+with NumPy the scan is a handful of array operations and only entities that
+are still live become Python objects. ``compact`` rewrites the journal down
+to those live entities; the files are generation-numbered and switched with
+an atomic rename of ``CURRENT``.
+"""
+
+from __future__ import annotations
+
+import json
+import mmap
+import os
+import struct
+import time
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+import Pricing
+import Rides
+import Vehicles
+from People import Driver, Rider
+from RideNotifier import RideObserver
+from Rides import RideStatus, reserve_ride_ids
+
+if TYPE_CHECKING:
+    from Matcher import Matcher
+    from Rides import Ride
+
+DRIVER_ADDED = 1
+DRIVER_MOVED = 2
+DRIVER_REMOVED = 3
+RIDE_REQUESTED = 4
+RIDE_ASSIGNED = 5
+RIDE_STARTED = 6
+RIDE_COMPLETED = 7
+RIDE_CANCELLED = 8
+
+_LIVE_RIDE_KINDS = (RIDE_REQUESTED, RIDE_ASSIGNED, RIDE_STARTED)
+
+# kind, meta length, ride id, driver id, meta offset, four coordinates.
+RECORD = struct.Struct("<B3xIqqqdddd")
+RECORD_SIZE = RECORD.size
+
+if np is not None:
+    RECORD_DTYPE = np.dtype(
+        [
+            ("kind", "u1"), ("pad", "V3"), ("meta_len", "<u4"), ("ride_id", "<i8"),
+            ("driver_id", "<i8"), ("meta_off", "<i8"),
+            ("x0", "<f8"), ("y0", "<f8"), ("x1", "<f8"), ("y1", "<f8"),
+        ]
+    )
+    assert RECORD_DTYPE.itemsize == RECORD_SIZE
+
+
+def _events_name(generation: int) -> str:
+    return f"events-{generation:06d}.bin"
+
+
+def _meta_name(generation: int) -> str:
+    return f"meta-{generation:06d}.jsonl"
+
+
+def _current_generation(directory: str) -> int:
+    try:
+        with open(os.path.join(directory, "CURRENT")) as handle:
+            return int(handle.read().strip())
+    except FileNotFoundError:
+        return 0
+
+
+def _coords(point: str | tuple[float, float]) -> tuple[float, float]:
+    return Rides.Ride._to_coords(point)
+
+
+class RideJournal(RideObserver):
+    """
+    Writes lifecycle events for the drivers and rides of one Matcher.
+
+    Pass it as ``Matcher(journal=...)``; the Matcher records registry
+    changes, and the journal observes each ride for status changes.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        group_size: int = 1024,
+        max_delay: float = 0.05,
+        sync: bool = False,
+        compact_every: int | None = None,
+    ):
+        self.directory = directory
+        self.group_size = group_size
+        self.max_delay = max_delay
+        self.sync = sync
+        self.compact_every = compact_every
+        os.makedirs(directory, exist_ok=True)
+
+        self.generation = _current_generation(directory)
+        if self.generation == 0:
+            self.generation = 1
+            self._write_current()
+        self._open_files()
+
+        self._driver_ids: dict[Driver, int] = {}
+        self._records: list[bytes] = []
+        self._meta: list[bytes] = []
+        self._buffered_meta_size = 0
+        # Ids already in the file must not be handed out again.
+        max_driver_id, max_ride_id = _max_ids(self._events_path())
+        self._next_driver_id = max_driver_id + 1
+        reserve_ride_ids(max_ride_id)
+        self._oldest_pending: float | None = None
+        self.events_since_compaction = self.event_count
+
+    @property
+    def event_count(self) -> int:
+        return self._events_size // RECORD_SIZE + len(self._records)
+
+    def __enter__(self) -> RideJournal:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    # Matcher hooks.
+
+    def driver_added(self, driver: Driver) -> None:
+        driver_id = self._driver_ids.get(driver)
+        if driver_id is None:
+            driver_id = self._driver_ids[driver] = self._next_driver_id
+            self._next_driver_id += 1
+        x, y = driver.location
+        vehicle = driver.vehicle
+        meta = {
+            "name": driver.name,
+            "phone": driver.phone,
+            "rating": driver.rating,
+            "vehicle": type(vehicle).__name__,
+            "vehicle_name": vehicle.name,
+            "vehicle_number": vehicle.number,
+        }
+        self._append(DRIVER_ADDED, -1, driver_id, x, y, 0.0, 0.0, meta)
+
+    def driver_moved(self, driver: Driver) -> None:
+        driver_id = self._driver_ids.get(driver)
+        if driver_id is not None:
+            x, y = driver.location
+            self._append(DRIVER_MOVED, -1, driver_id, x, y, 0.0, 0.0)
+
+    def driver_removed(self, driver: Driver) -> None:
+        driver_id = self._driver_ids.pop(driver, None)
+        if driver_id is not None:
+            self._append(DRIVER_REMOVED, -1, driver_id, 0.0, 0.0, 0.0, 0.0)
+
+    def ride_requested(self, ride: Ride) -> None:
+        ride.add_observer(self)
+        from_x, from_y = _coords(ride.from_place)
+        to_x, to_y = _coords(ride.to)
+        self._append(RIDE_REQUESTED, ride.ride_id, -1, from_x, from_y, to_x, to_y, ride_info(ride))
+
+    def ride_cancelled(self, ride: Ride) -> None:
+        ride.remove_observer(self)
+        self._append(RIDE_CANCELLED, ride.ride_id, -1, 0.0, 0.0, 0.0, 0.0)
+
+    def observe_ride(self, ride: Ride) -> None:
+        driver_id = self._driver_ids.get(ride.driver, -1) if ride.driver is not None else -1
+        if ride.status is RideStatus.COMPLETED:
+            self._append(RIDE_COMPLETED, ride.ride_id, driver_id, 0.0, 0.0, 0.0, 0.0)
+        elif ride.status is RideStatus.ONGOING:
+            self._append(RIDE_STARTED, ride.ride_id, driver_id, 0.0, 0.0, 0.0, 0.0)
+        elif ride.driver is not None:
+            meta = {"accept_time": ride.accept_time} if ride.accept_time is not None else None
+            self._append(RIDE_ASSIGNED, ride.ride_id, driver_id, 0.0, 0.0, 0.0, 0.0, meta)
+
+    # Writing.
+
+    def _append(
+        self,
+        kind: int,
+        ride_id: int,
+        driver_id: int,
+        x0: float,
+        y0: float,
+        x1: float,
+        y1: float,
+        meta: dict | None = None,
+    ) -> None:
+        meta_off = meta_len = 0
+        if meta is not None:
+            blob = json.dumps(meta, separators=(",", ":")).encode() + b"\n"
+            meta_off = self._meta_size + self._buffered_meta_size
+            meta_len = len(blob)
+            self._meta.append(blob)
+            self._buffered_meta_size += meta_len
+        self._records.append(RECORD.pack(kind, meta_len, ride_id, driver_id, meta_off, x0, y0, x1, y1))
+
+        now = time.monotonic()
+        if self._oldest_pending is None:
+            self._oldest_pending = now
+        if len(self._records) >= self.group_size or now - self._oldest_pending >= self.max_delay:
+            self.commit()
+
+    def poll(self) -> None:
+        """Commit the buffered events if the oldest has waited ``max_delay``."""
+        if self._oldest_pending is not None and time.monotonic() - self._oldest_pending >= self.max_delay:
+            self.commit()
+
+    def commit(self) -> None:
+        """Write every buffered event as one group."""
+        if not self._records:
+            return
+        # Meta first: a record must never point past the end of the meta file.
+        if self._meta:
+            blob = b"".join(self._meta)
+            self._meta_file.write(blob)
+            self._meta_file.flush()
+            self._meta_size += len(blob)
+            self._meta = []
+            self._buffered_meta_size = 0
+        blob = b"".join(self._records)
+        self._events_file.write(blob)
+        self._events_file.flush()
+        if self.sync:
+            os.fsync(self._meta_file.fileno())
+            os.fsync(self._events_file.fileno())
+        self._events_size += len(blob)
+        self.events_since_compaction += len(self._records)
+        self._records = []
+        self._oldest_pending = None
+        if self.compact_every is not None and self.events_since_compaction >= self.compact_every:
+            self.compact()
+
+    def close(self) -> None:
+        self.commit()
+        self._events_file.close()
+        self._meta_file.close()
+
+    # Replay and compaction.
+
+    def replay(self, matcher: Matcher) -> ReplayResult:
+        """Rebuild ``matcher`` from the journal, then keep journaling its changes."""
+        self.commit()
+        result = replay(self.directory, matcher)
+        self._driver_ids = {driver: driver_id for driver_id, driver in result.drivers.items()}
+        self._next_driver_id = result.next_driver_id
+        for ride in result.rides.values():
+            ride.add_observer(self)
+        matcher.journal = self
+        return result
+
+    def compact(self) -> None:
+        """Rewrite the journal keeping only live drivers and rides."""
+        self.commit()
+        state = _scan(self._events_path(), self._meta_path())
+        new_generation = self.generation + 1
+        events_path = os.path.join(self.directory, _events_name(new_generation))
+        meta_path = os.path.join(self.directory, _meta_name(new_generation))
+        with open(events_path, "wb") as events, open(meta_path, "wb") as meta:
+            meta_size = 0
+            for row in state.rows_to_keep():
+                kind, _, ride_id, driver_id, _, x0, y0, x1, y1 = row.record
+                meta_off = meta_len = 0
+                if row.meta:
+                    meta_off, meta_len = meta_size, len(row.meta)
+                    meta.write(row.meta)
+                    meta_size += meta_len
+                events.write(RECORD.pack(kind, meta_len, ride_id, driver_id, meta_off, x0, y0, x1, y1))
+            for handle in (events, meta):
+                handle.flush()
+                os.fsync(handle.fileno())
+        state.close()
+
+        self._events_file.close()
+        self._meta_file.close()
+        old_generation = self.generation
+        self.generation = new_generation
+        self._write_current()
+        for name in (_events_name(old_generation), _meta_name(old_generation)):
+            os.remove(os.path.join(self.directory, name))
+        self._open_files()
+        self.events_since_compaction = 0
+
+    def _events_path(self) -> str:
+        return os.path.join(self.directory, _events_name(self.generation))
+
+    def _meta_path(self) -> str:
+        return os.path.join(self.directory, _meta_name(self.generation))
+
+    def _open_files(self) -> None:
+        self._events_file = open(self._events_path(), "ab")
+        self._meta_file = open(self._meta_path(), "ab")
+        # A crash mid-write can leave a torn record at the end; drop it.
+        size = self._events_file.tell()
+        if size % RECORD_SIZE:
+            self._events_file.truncate(size - size % RECORD_SIZE)
+            self._events_file.seek(0, os.SEEK_END)
+        self._events_size = self._events_file.tell()
+        self._meta_size = self._meta_file.tell()
+
+    def _write_current(self) -> None:
+        temporary = os.path.join(self.directory, "CURRENT.tmp")
+        with open(temporary, "w") as handle:
+            handle.write(f"{self.generation}\n")
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(temporary, os.path.join(self.directory, "CURRENT"))
+
+
+def ride_info(ride: Ride) -> dict:
+    """Everything needed to rebuild a pending ride, as JSON-friendly values."""
+    rider = ride.rider
+    pricing = ride.pricing
+    info = {
+        "ride": type(ride).__name__,
+        "from": ride.from_place,
+        "to": ride.to,
+        "duration": ride.ride_duration,
+        "request_time": ride.request_time,
+        "base_rate": ride.base_rate,
+        "pricing": type(pricing).__name__,
+        "pricing_args": _plain_vars(pricing),
+        "rider": [rider.name, rider.phone, rider.rating, rider.location],
+    }
+    if hasattr(ride, "shared_by"):
+        info["shared_by"] = ride.shared_by
+    return info
+
+
+def _plain_vars(obj) -> dict:
+    """The attributes of ``obj`` that survive a JSON round trip."""
+    return {
+        name: value for name, value in vars(obj).items()
+        if isinstance(value, (int, float, str, bool)) and not name.startswith("_")
+    }
+
+
+@dataclass
+class ReplayResult:
+    matcher: Matcher
+    drivers: dict[int, Driver] = field(default_factory=dict)
+    # Rides that were pending or in progress, by ride id.
+    rides: dict[int, Ride] = field(default_factory=dict)
+    events: int = 0
+    next_driver_id: int = 0
+
+
+@dataclass
+class _Row:
+    record: tuple
+    meta: bytes
+
+
+class _LiveState:
+    """The rows of a journal file that still describe live entities."""
+
+    def __init__(self, events: mmap.mmap | bytes, meta: mmap.mmap | bytes, count: int):
+        self.events = events
+        self.meta = meta
+        self.count = count
+        # driver id -> (ADDED row, row holding its current location), in id order
+        self.drivers: list[tuple[int, int, int]] = []
+        # (ride id, REQUESTED row, last ASSIGNED row or -1, last row), in request order
+        self.rides: list[tuple[int, int, int, int]] = []
+        self.max_ride_id = 0
+        self.max_driver_id = -1
+
+    def record(self, row: int) -> tuple:
+        return RECORD.unpack_from(self.events, row * RECORD_SIZE)
+
+    def meta_of(self, row: int) -> bytes:
+        record = self.record(row)
+        return bytes(self.meta[record[4]:record[4] + record[1]])
+
+    def rows_to_keep(self):
+        for driver_id, added_row, location_row in self.drivers:
+            added = list(self.record(added_row))
+            located = self.record(location_row)
+            added[5], added[6] = located[5], located[6]
+            yield _Row(tuple(added), self.meta_of(added_row))
+        for _, requested_row, assigned_row, last_row in self.rides:
+            yield _Row(self.record(requested_row), self.meta_of(requested_row))
+            if assigned_row >= 0:
+                yield _Row(self.record(assigned_row), self.meta_of(assigned_row))
+            if self.record(last_row)[0] == RIDE_STARTED:
+                yield _Row(self.record(last_row), b"")
+
+    def close(self) -> None:
+        for buffer in (self.events, self.meta):
+            if isinstance(buffer, mmap.mmap):
+                buffer.close()
+
+
+def _map(path: str) -> mmap.mmap | bytes:
+    with open(path, "rb") as handle:
+        size = os.fstat(handle.fileno()).st_size
+        if size == 0:
+            return b""
+        return mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _scan(events_path: str, meta_path: str) -> _LiveState:
+    events = _map(events_path)
+    meta = _map(meta_path)
+    count = len(events) // RECORD_SIZE
+    state = _LiveState(events, meta, count)
+    if np is not None:
+        _scan_arrays(state)
+    else:
+        _scan_records(state)
+    return state
+
+
+def _max_ids(events_path: str) -> tuple[int, int]:
+    """Largest driver id and ride id recorded in a journal file."""
+    events = _map(events_path)
+    count = len(events) // RECORD_SIZE
+    if not count:
+        return -1, 0
+    try:
+        if np is not None:
+            records = np.frombuffer(events, dtype=RECORD_DTYPE, count=count)
+            result = int(records["driver_id"].max()), max(0, int(records["ride_id"].max()))
+            del records
+            return result
+        max_driver_id, max_ride_id = -1, 0
+        with memoryview(events) as view:
+            for _, _, ride_id, driver_id, *_rest in RECORD.iter_unpack(view[:count * RECORD_SIZE]):
+                max_driver_id = max(max_driver_id, driver_id)
+                max_ride_id = max(max_ride_id, ride_id)
+        return max_driver_id, max_ride_id
+    finally:
+        if isinstance(events, mmap.mmap):
+            events.close()
+
+
+def _last_rows(ids, rows) -> tuple:
+    """Unique ids and, for each, the row of its last occurrence."""
+    unique, first_from_end = np.unique(ids[::-1], return_index=True)
+    return unique, rows[len(rows) - 1 - first_from_end]
+
+
+def _scan_arrays(state: _LiveState) -> None:
+    if not state.count:
+        return
+    records = np.frombuffer(state.events, dtype=RECORD_DTYPE, count=state.count)
+    kinds = records["kind"]
+
+    driver_rows = np.flatnonzero(kinds <= DRIVER_REMOVED)
+    if len(driver_rows):
+        driver_ids, last = _last_rows(records["driver_id"][driver_rows], driver_rows)
+        state.max_driver_id = int(driver_ids[-1])
+        alive = kinds[last] != DRIVER_REMOVED
+        added_rows = np.flatnonzero(kinds == DRIVER_ADDED)
+        added_ids, last_added = _last_rows(records["driver_id"][added_rows], added_rows)
+        alive_ids = driver_ids[alive]
+        added_for_alive = last_added[np.searchsorted(added_ids, alive_ids)]
+        state.drivers = list(zip(alive_ids.tolist(), added_for_alive.tolist(), last[alive].tolist()))
+
+    ride_rows = np.flatnonzero(kinds >= RIDE_REQUESTED)
+    if len(ride_rows):
+        ride_ids, last = _last_rows(records["ride_id"][ride_rows], ride_rows)
+        state.max_ride_id = int(ride_ids[-1])
+        live = np.isin(kinds[last], _LIVE_RIDE_KINDS)
+        live_ids = ride_ids[live]
+        requested_rows = np.flatnonzero(kinds == RIDE_REQUESTED)
+        requested_ids, last_requested = _last_rows(records["ride_id"][requested_rows], requested_rows)
+        requested_for_live = last_requested[np.searchsorted(requested_ids, live_ids)]
+        assigned_for_live = np.full(len(live_ids), -1, dtype=np.int64)
+        assigned_rows = np.flatnonzero(kinds == RIDE_ASSIGNED)
+        if len(assigned_rows):
+            assigned_ids, last_assigned = _last_rows(records["ride_id"][assigned_rows], assigned_rows)
+            positions = np.minimum(np.searchsorted(assigned_ids, live_ids), len(assigned_ids) - 1)
+            found = assigned_ids[positions] == live_ids
+            assigned_for_live[found] = last_assigned[positions[found]]
+        order = np.argsort(requested_for_live, kind="stable")
+        state.rides = list(
+            zip(
+                live_ids[order].tolist(),
+                requested_for_live[order].tolist(),
+                assigned_for_live[order].tolist(),
+                last[live][order].tolist(),
+            )
+        )
+
+
+def _scan_records(state: _LiveState) -> None:
+    drivers: dict[int, list[int]] = {}
+    rides: dict[int, list[int]] = {}
+    max_driver_id = -1
+    max_ride_id = 0
+    with memoryview(state.events) as view:
+        unpacked = list(RECORD.iter_unpack(view[:state.count * RECORD_SIZE]))
+    for row, (kind, _, ride_id, driver_id, *_rest) in enumerate(unpacked):
+        if kind <= DRIVER_REMOVED:
+            max_driver_id = max(max_driver_id, driver_id)
+            if kind == DRIVER_ADDED:
+                drivers[driver_id] = [row, row]
+            elif kind == DRIVER_MOVED:
+                if driver_id in drivers:
+                    drivers[driver_id][1] = row
+            else:
+                drivers.pop(driver_id, None)
+        else:
+            max_ride_id = max(max_ride_id, ride_id)
+            if kind == RIDE_REQUESTED:
+                rides[ride_id] = [row, -1, row]
+            elif kind in (RIDE_COMPLETED, RIDE_CANCELLED):
+                rides.pop(ride_id, None)
+            elif ride_id in rides:
+                entry = rides[ride_id]
+                if kind == RIDE_ASSIGNED:
+                    entry[1] = row
+                entry[2] = row
+    state.drivers = [(driver_id, rows[0], rows[1]) for driver_id, rows in sorted(drivers.items())]
+    state.rides = sorted(
+        ((ride_id, *rows) for ride_id, rows in rides.items()), key=lambda entry: entry[1]
+    )
+    state.max_driver_id = max_driver_id
+    state.max_ride_id = max_ride_id
+
+
+def replay(directory: str, matcher: Matcher) -> ReplayResult:
+    """Load the drivers and live rides recorded in ``directory`` into ``matcher``."""
+    generation = _current_generation(directory)
+    result = ReplayResult(matcher)
+    if generation == 0:
+        return result
+    state = _scan(
+        os.path.join(directory, _events_name(generation)),
+        os.path.join(directory, _meta_name(generation)),
+    )
+    result.events = state.count
+    result.next_driver_id = state.max_driver_id + 1
+    reserve_ride_ids(state.max_ride_id)
+
+    # Replay must not journal itself; the caller attaches a journal afterwards.
+    journal, matcher.journal = matcher.journal, None
+    try:
+        drivers = []
+        for driver_id, added_row, location_row in state.drivers:
+            info = json.loads(state.meta_of(added_row))
+            location = state.record(location_row)[5:7]
+            vehicle_class = getattr(Vehicles, info["vehicle"])
+            driver = Driver(
+                name=info["name"],
+                phone=info["phone"],
+                rating=info["rating"],
+                location=location,
+                vehicle=vehicle_class(name=info["vehicle_name"], number=info["vehicle_number"]),
+            )
+            result.drivers[driver_id] = driver
+            drivers.append(driver)
+        matcher.add_drivers(drivers)
+
+        for ride_id, requested_row, assigned_row, last_row in state.rides:
+            ride = rebuild_ride(json.loads(state.meta_of(requested_row)))
+            ride.ride_id = ride_id
+            last_kind, driver_id = state.record(last_row)[0], state.record(last_row)[3]
+            result.rides[ride_id] = ride
+            if last_kind == RIDE_REQUESTED:
+                matcher.add_ride_request(ride)
+                continue
+            # Restored quietly: observers already heard about these changes.
+            driver = result.drivers.get(driver_id)
+            ride.driver = driver
+            if driver is not None:
+                driver.set_available(False)
+                ride.add_observer(driver)
+            if assigned_row >= 0:
+                accept = state.meta_of(assigned_row)
+                ride.accept_time = json.loads(accept)["accept_time"] if accept else None
+            if last_kind == RIDE_STARTED:
+                ride.status = RideStatus.ONGOING
+    finally:
+        matcher.journal = journal
+        state.close()
+    return result
+
+
+def rebuild_ride(info: dict) -> Ride:
+    name, phone, rating, location = info["rider"]
+    rider = Rider(name=name, phone=phone, rating=rating, location=tuple(location))
+    pricing = getattr(Pricing, info["pricing"])(**info["pricing_args"])
+    ride_class = getattr(Rides, info["ride"])
+    extra = {"shared_by": info["shared_by"]} if "shared_by" in info else {}
+    return ride_class(
+        from_place=_json_point(info["from"]),
+        to=_json_point(info["to"]),
+        ride_duration=info["duration"],
+        request_time=info["request_time"],
+        rider=rider,
+        base_rate=info["base_rate"],
+        pricing=pricing,
+        **extra,
+    )
+
+
+def _json_point(point: str | list[float]) -> str | tuple[float, float]:
+    # JSON turns tuples into lists.
+    return tuple(point) if isinstance(point, list) else point
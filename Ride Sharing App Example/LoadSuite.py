@@ -0,0 +1,226 @@
+"""
+Load test suite over synthetic cities.
+
+Each scenario builds a SyntheticCity and pushes every rider through the same
+three paths main.py exercises, one batch at a time:
+
+- match:  Matcher.make_matches over the batch (KD-tree indexed greedy)
+- fare:   price_rides over the rides that were matched
+- notify: complete_ride on the matched rides, which notifies riders and
+          drivers and frees the drivers for later batches
+
+Per phase it records throughput and p50/p99 batch latency. Each scenario
+runs in a fresh process so its peak RSS is its own (where the platform
+reports it). Results go to JSON;
+pass an earlier file as --baseline to flag throughput regressions.
+
+    python3 LoadSuite.py --scales 1000 10000 100000 1000000 --out results.json
+    python3 LoadSuite.py --scales 1000 10000 --baseline results.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing
+import platform
+import sys
+import time
+import tracemalloc
+from dataclasses import asdict
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from Matcher import Matcher
+from Pricing import price_rides
+from SpatialIndex import KDTreeIndex
+from Stats import percentile
+from SyntheticCity import CityConfig, SyntheticCity
+
+PHASES = ("match", "fare", "notify")
+
+
+def max_rss_mb() -> float | None:
+    """Peak resident set size of this process, or None where ``resource`` is missing (Windows)."""
+    if resource is None:
+        return None
+    # ru_maxrss is in KiB on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def summarize(items: int, latencies: list[float]) -> dict:
+    latencies = sorted(latencies)
+    total = sum(latencies)
+    return {
+        "items": items,
+        "seconds": total,
+        "throughput": items / total if total else 0.0,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+    }
+
+
+def scenario_config(scale: int, distribution: str, driver_share: float, driver_store: str, seed: int) -> CityConfig:
+    num_drivers = max(1, round(scale * driver_share))
+    return CityConfig(
+        num_drivers=num_drivers,
+        num_riders=max(1, scale - num_drivers),
+        distribution=distribution,
+        driver_store=driver_store,
+        seed=seed,
+    )
+
+
+def run_scenario(config: CityConfig, batch_size: int, trace_memory: bool = False) -> dict:
+    if trace_memory:
+        tracemalloc.start()
+    baseline_rss = max_rss_mb()
+    city = SyntheticCity(config)
+
+    start = time.perf_counter()
+    drivers = city.build_drivers()
+    matcher = Matcher(index=KDTreeIndex())
+    for driver in drivers:
+        matcher.add_driver(driver)
+    build_seconds = time.perf_counter() - start
+
+    latencies: dict[str, list[float]] = {phase: [] for phase in PHASES}
+    items = dict.fromkeys(PHASES, 0)
+    matched_total = 0
+    for batch in city.ride_batches(batch_size):
+        for ride in batch:
+            matcher.add_ride_request(ride)
+        start = time.perf_counter()
+        matches = matcher.make_matches()
+        latencies["match"].append(time.perf_counter() - start)
+        items["match"] += len(batch)
+        matched_total += len(matches)
+        # Requests nobody could serve this round are turned away, not queued.
+        for ride in matcher.ride_requests:
+            matcher.remove_ride_request(ride)
+
+        matched_rides = [ride for ride, _ in matches]
+        start = time.perf_counter()
+        price_rides(matched_rides)
+        latencies["fare"].append(time.perf_counter() - start)
+        items["fare"] += len(matched_rides)
+
+        start = time.perf_counter()
+        for ride, _ in matches:
+            ride.complete_ride()
+        latencies["notify"].append(time.perf_counter() - start)
+        items["notify"] += len(matches)
+
+    result = {
+        "config": asdict(config),
+        "batch_size": batch_size,
+        "build_seconds": build_seconds,
+        "matched": matched_total,
+        "phases": {phase: summarize(items[phase], latencies[phase]) for phase in PHASES},
+        "baseline_rss_mb": baseline_rss,
+        "peak_rss_mb": max_rss_mb(),
+    }
+    if trace_memory:
+        result["peak_traced_mb"] = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+    return result
+
+
+def _scenario_child(connection, config: CityConfig, batch_size: int, trace_memory: bool) -> None:
+    connection.send(run_scenario(config, batch_size, trace_memory))
+    connection.close()
+
+
+def run_isolated(config: CityConfig, batch_size: int, trace_memory: bool = False) -> dict:
+    """run_scenario in a fresh interpreter, so peak RSS is not inherited."""
+    context = multiprocessing.get_context("spawn")
+    parent, child = context.Pipe(duplex=False)
+    process = context.Process(target=_scenario_child, args=(child, config, batch_size, trace_memory))
+    process.start()
+    child.close()
+    try:
+        result = parent.recv()
+    except EOFError:
+        raise RuntimeError(f"scenario process exited with code {process.exitcode}") from None
+    finally:
+        process.join()
+    return result
+
+
+def scenario_name(config: CityConfig) -> str:
+    return f"{config.distribution}-{config.num_drivers + config.num_riders}-{config.driver_store}"
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Lines describing phases whose throughput dropped by more than ``tolerance``."""
+    previous = {scenario["name"]: scenario for scenario in baseline.get("scenarios", [])}
+    regressions = []
+    for scenario in results["scenarios"]:
+        old = previous.get(scenario["name"])
+        if old is None:
+            continue
+        for phase in PHASES:
+            before = old["phases"][phase]["throughput"]
+            after = scenario["phases"][phase]["throughput"]
+            if before and after < before * (1 - tolerance):
+                regressions.append(
+                    f"{scenario['name']} {phase}: {before:.0f} -> {after:.0f} items/s "
+                    f"({(after / before - 1) * 100:+.1f}%)"
+                )
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Run the synthetic city load suite.")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1_000, 10_000, 100_000, 1_000_000])
+    parser.add_argument("--distributions", nargs="+", choices=("uniform", "clustered"), default=["uniform", "clustered"])
+    parser.add_argument("--driver-share", type=float, default=0.2, help="fraction of entities that are drivers")
+    parser.add_argument("--driver-store", choices=("objects", "fleet"), default="objects")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--trace-memory", action="store_true", help="also record tracemalloc peak (slower)")
+    parser.add_argument("--out", default="load_results.json")
+    parser.add_argument("--baseline", help="earlier results file to compare throughput against")
+    parser.add_argument("--tolerance", type=float, default=0.10)
+    args = parser.parse_args(argv)
+
+    results = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "started": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "scenarios": [],
+    }
+    print(f"{'scenario':<28} {'phase':<7} {'items/s':>10} {'p50 ms':>8} {'p99 ms':>8} {'peak MB':>8}")
+    for scale in args.scales:
+        for distribution in args.distributions:
+            config = scenario_config(scale, distribution, args.driver_share, args.driver_store, args.seed)
+            scenario = run_isolated(config, args.batch_size, args.trace_memory)
+            scenario["name"] = scenario_name(config)
+            results["scenarios"].append(scenario)
+            peak = scenario["peak_rss_mb"]
+            peak = "-" if peak is None else f"{peak:.0f}"
+            for phase in PHASES:
+                stats = scenario["phases"][phase]
+                print(
+                    f"{scenario['name']:<28} {phase:<7} {stats['throughput']:>10.0f} "
+                    f"{stats['p50_ms']:>8.2f} {stats['p99_ms']:>8.2f} {peak:>8}"
+                )
+
+    with open(args.out, "w") as handle:
+        json.dump(results, handle, indent=2)
+    print(f"wrote {args.out}")
+
+    if args.baseline:
+        with open(args.baseline) as handle:
+            regressions = compare(results, json.load(handle), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
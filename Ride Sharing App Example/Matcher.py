@@ -1,51 +1,222 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING
+import math
+from typing import TYPE_CHECKING, Iterable
+
+from Matching import GreedyMatching
 
 if TYPE_CHECKING:
+    from Fleet import FleetStore
+    from Journal import RideJournal
+    from Matching import MatchingStrategy
     from People import Driver
+    from RideNotifier import AsyncNotificationDispatcher
     from Rides import Ride
+    from Roads import DistanceProvider
+    from Snapshot import SnapshotJob
+    from SpatialIndex import SpatialIndex
+    from Surge import SurgeEngine
 
 
 class Matcher:
+    """
+    Keeps the pending ride requests and known drivers, and runs a strategy.
+
+    Requests and drivers live in insertion-ordered dicts, so adding and
+    removing either is constant time. The Matcher listens to each driver's
+    availability, keeping the set of free drivers up to date as rides are
+    assigned and completed instead of rescanning every driver each round;
+    changes must go through Driver.set_available to be seen. A registered
+    driver holds a reference to the Matcher until removed.
+
+    With a ``journal``, every registry change and ride status change is also
+    written to it, so the Matcher can be rebuilt with ``journal.replay``.
+    ``snapshot`` and ``restore`` save and reload the drivers and pending
+    requests in one compact file instead (see Snapshot). A ``surge`` engine
+    is told about request and driver changes to keep its per-cell demand and
+    supply counts current. A ``distance`` provider (see Roads) is handed to
+    every request that has none, so fares follow the streets, and measures
+    ``pickup_distance``. It is handed to a strategy with a ``distance`` of
+    None as well, so GreedyMatching and BatchMatching pick drivers by road
+    pickup distance. Request listeners (``add_request_listener``) hear
+    about every pending request that is cancelled.
+    """
+
+    def __init__(
+        self,
+        index: SpatialIndex | None = None,
+        strategy: MatchingStrategy | None = None,
+        dispatcher: AsyncNotificationDispatcher | None = None,
+        journal: RideJournal | None = None,
+        surge: SurgeEngine | None = None,
+        distance: DistanceProvider | None = None,
+    ):
+        # Rides compare by value, so they are keyed by identity.
+        self._ride_requests: dict[int, Ride] = {}
+        self._drivers: dict[Driver, None] = {}
+        self._available_drivers: dict[Driver, None] = {}
+        self.index = index
+        self.strategy = strategy if strategy is not None else GreedyMatching()
+        self.dispatcher = dispatcher
+        self.journal = journal
+        self.surge = surge
+        self.distance = distance
+        # Told through ride_request_cancelled(ride) when a pending request is removed.
+        self.request_listeners: tuple = ()
+
+    # Snapshots as tuples: changes go through add_* and remove_*, so writing
+    # to one of these fails instead of silently changing a throwaway copy.
+    @property
+    def ride_requests(self) -> tuple[Ride, ...]:
+        return tuple(self._ride_requests.values())
+
+    @property
+    def drivers(self) -> tuple[Driver, ...]:
+        return tuple(self._drivers)
 
-    def __init__(self):
-        self.ride_requests = []
-        self.drivers = []
+    @property
+    def available_drivers(self) -> tuple[Driver, ...]:
+        return tuple(self._available_drivers)
+
+    @property
+    def num_ride_requests(self) -> int:
+        return len(self._ride_requests)
 
     def add_ride_request(self, ride_request: Ride):
-        self.ride_requests.append(ride_request)
+        if self.dispatcher is not None and ride_request.dispatcher is None:
+            ride_request.dispatcher = self.dispatcher
+        if self.distance is not None and ride_request.distance_provider is None:
+            ride_request.distance_provider = self.distance
+        self._ride_requests[id(ride_request)] = ride_request
+        if self.journal is not None:
+            self.journal.ride_requested(ride_request)
+        if self.surge is not None:
+            self.surge.request_opened(ride_request)
+
+    def has_ride_request(self, ride_request: Ride) -> bool:
+        return id(ride_request) in self._ride_requests
 
     def remove_ride_request(self, ride_request: Ride):
-        if ride_request in self.ride_requests:
-            self.ride_requests.remove(ride_request)
+        removed = self._ride_requests.pop(id(ride_request), None)
+        if removed is None:
+            return
+        if self.journal is not None:
+            self.journal.ride_cancelled(removed)
+        if self.surge is not None:
+            self.surge.request_closed(removed)
+        for listener in self.request_listeners:
+            listener.ride_request_cancelled(removed)
+
+    def add_request_listener(self, listener) -> None:
+        if listener not in self.request_listeners:
+            self.request_listeners = (*self.request_listeners, listener)
+
+    def remove_request_listener(self, listener) -> None:
+        self.request_listeners = tuple(existing for existing in self.request_listeners if existing is not listener)
 
     def add_driver(self, driver: Driver):
-        self.drivers.append(driver)
+        if driver in self._drivers:
+            return
+        self._drivers[driver] = None
+        if driver.is_available:
+            self._available_drivers[driver] = None
+            if self.surge is not None:
+                self.surge.driver_available(driver)
+        driver.add_availability_listener(self)
+        if self.index is not None:
+            self.index.add(driver)
+        if self.journal is not None:
+            self.journal.driver_added(driver)
+
+    def add_drivers(self, drivers: Iterable[Driver]):
+        """Register many drivers at once; a fresh KD-tree is built in one pass."""
+        new_drivers = [driver for driver in dict.fromkeys(drivers) if driver not in self._drivers]
+        for driver in new_drivers:
+            self._drivers[driver] = None
+            if driver.is_available:
+                self._available_drivers[driver] = None
+                if self.surge is not None:
+                    self.surge.driver_available(driver)
+            driver.add_availability_listener(self)
+            if self.journal is not None:
+                self.journal.driver_added(driver)
+        if self.index is not None:
+            self.index.add_many(new_drivers)
 
     def remove_driver(self, driver: Driver):
-        if driver in self.drivers:
-            self.drivers.remove(driver)
-
-    def make_matches(self):
-        matches = []
-        unmatched_ride_requests = []
-        available_drivers = [driver for driver in self.drivers if driver.is_available]
-
-        for ride_request in self.ride_requests:
-            if not available_drivers:
-                unmatched_ride_requests.append(ride_request)
-                continue
-
-            rider_x, rider_y = ride_request.rider.location
-            closest_driver = min(
-                available_drivers,
-                key=lambda driver: (driver.location[0] - rider_x) ** 2
-                + (driver.location[1] - rider_y) ** 2,
-            )
-            ride_request.assign_driver(closest_driver)
-            available_drivers.remove(closest_driver)
-            matches.append((ride_request, closest_driver))
-
-        self.ride_requests = unmatched_ride_requests
+        if driver in self._drivers:
+            del self._drivers[driver]
+            self._available_drivers.pop(driver, None)
+            driver.remove_availability_listener(self)
+            if self.surge is not None:
+                self.surge.driver_unavailable(driver)
+            if self.index is not None:
+                self.index.remove(driver)
+            if self.journal is not None:
+                self.journal.driver_removed(driver)
+
+    def driver_availability_changed(self, driver: Driver):
+        if driver not in self._drivers:
+            return
+        if driver.is_available:
+            self._available_drivers[driver] = None
+            if self.surge is not None:
+                self.surge.driver_available(driver)
+        else:
+            self._available_drivers.pop(driver, None)
+            if self.surge is not None:
+                self.surge.driver_unavailable(driver)
+
+    def move_driver(self, driver: Driver, new_location: tuple[float, float] | str):
+        location = driver._to_coords(new_location)
+        if self.index is not None:
+            self.index.move(driver, location)
+        else:
+            driver.location = location
+        if self.journal is not None:
+            self.journal.driver_moved(driver)
+        if self.surge is not None:
+            self.surge.driver_moved(driver)
+
+    def snapshot(self, path: str, background: bool = False) -> SnapshotJob:
+        from Snapshot import snapshot
+
+        return snapshot(self, path, background)
+
+    def restore(self, path: str, store: FleetStore | None = None) -> FleetStore:
+        """Add a snapshot's drivers (as views into ``store``) and pending requests."""
+        from Snapshot import restore
+
+        return restore(self, path, store)
+
+    def set_strategy(self, strategy: MatchingStrategy):
+        self.strategy = strategy
+
+    def pickup_distance(self, ride_request: Ride, driver: Driver) -> float:
+        if self.distance is None:
+            return math.dist(ride_request.rider.location, driver.location)
+        return self.distance.distance(ride_request.rider.location, driver.location)
+
+    def propose_matches(self, ride_requests: list[Ride] | None = None):
+        # The strategy's pairs, without assigning anything. ``ride_requests``
+        # limits the round to some of the pending requests.
+        if ride_requests is None:
+            ride_requests = self.ride_requests
+        strategy = self.strategy
+        if self.distance is not None and getattr(strategy, "distance", self.distance) is None:
+            strategy.distance = self.distance
+        return strategy.match(ride_requests, self.available_drivers, self.index)
+
+    def make_matches(self, ride_requests: list[Ride] | None = None):
+        matches = self.propose_matches(ride_requests)
+
+        for ride_request, driver in matches:
+            self.assign(ride_request, driver)
         return matches
+
+    def assign(self, ride_request: Ride, driver: Driver):
+        """Give a pending request to ``driver``, who may already be busy with a pooled ride."""
+        ride_request.assign_driver(driver)
+        del self._ride_requests[id(ride_request)]
+        if self.surge is not None:
+            self.surge.request_closed(ride_request)
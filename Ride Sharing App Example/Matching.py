@@ -0,0 +1,535 @@
+"""
+Matching strategies used by the Matcher.
+
+A strategy looks at the pending ride requests and the Matcher's free drivers
+(or its spatial index) and proposes (ride, driver) pairs. The Matcher applies them, so
+strategies never mutate rides or drivers themselves.
+"""
+
+from __future__ import annotations
+
+import heapq
+import math
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Callable, Sequence
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+if TYPE_CHECKING:
+    from Fleet import FleetStore
+    from People import Driver
+    from Rides import Ride
+    from Roads import DistanceProvider
+    from SpatialIndex import SpatialIndex
+
+
+def pickup_distance(ride: Ride, driver: Driver, distance: DistanceProvider | None = None) -> float:
+    if distance is None:
+        return math.dist(ride.rider.location, driver.location)
+    return distance.distance(ride.rider.location, driver.location)
+
+
+class MatchingStrategy(ABC):
+    @abstractmethod
+    def match(
+        self, ride_requests: Sequence[Ride], drivers: Sequence[Driver], index: SpatialIndex | None
+    ) -> list[tuple[Ride, Driver]]: ...
+
+
+class GreedyMatching(MatchingStrategy):
+    """
+    Serve requests in arrival order, each taking the nearest free driver.
+
+    Nearness is the straight line unless ``distance`` is set (a Matcher
+    with a provider of its own hands it over). Then each request measures
+    every free driver in one ``distances_from`` call, and the spatial index,
+    which only knows straight lines, is not used.
+    """
+
+    def __init__(self, distance: DistanceProvider | None = None):
+        self.distance = distance
+
+    def match(
+        self, ride_requests: Sequence[Ride], drivers: Sequence[Driver], index: SpatialIndex | None
+    ) -> list[tuple[Ride, Driver]]:
+        return greedy_matches(ride_requests, drivers, index, distance=self.distance)
+
+
+def greedy_matches(
+    ride_requests: Sequence[Ride],
+    drivers: Sequence[Driver],
+    index: SpatialIndex | None,
+    taken: set[Driver] | None = None,
+    distance: DistanceProvider | None = None,
+) -> list[tuple[Ride, Driver]]:
+    taken = set() if taken is None else set(taken)
+    matches = []
+
+    if distance is not None:
+        free_drivers = [driver for driver in drivers if driver.is_available and driver not in taken]
+        for ride_request in ride_requests:
+            if not free_drivers:
+                break
+            pickups = distance.distances_from(
+                ride_request.rider.location, [driver.location for driver in free_drivers]
+            )
+            closest = min(range(len(free_drivers)), key=pickups.__getitem__)
+            matches.append((ride_request, free_drivers.pop(closest)))
+        return matches
+
+    if index is not None:
+        # Unavailable drivers stay in the index and are filtered out here.
+        is_free = lambda driver: driver.is_available and driver not in taken
+        for ride_request in ride_requests:
+            closest_driver = index.nearest(ride_request.rider.location, is_free)
+            if closest_driver is None:
+                break
+            taken.add(closest_driver)
+            matches.append((ride_request, closest_driver))
+        return matches
+
+    available_drivers = [
+        driver for driver in drivers if driver.is_available and driver not in taken
+    ]
+    for ride_request in ride_requests:
+        if not available_drivers:
+            break
+
+        rider_x, rider_y = ride_request.rider.location
+        closest_driver = min(
+            available_drivers,
+            key=lambda driver: (driver.location[0] - rider_x) ** 2
+            + (driver.location[1] - rider_y) ** 2,
+        )
+        available_drivers.remove(closest_driver)
+        matches.append((ride_request, closest_driver))
+    return matches
+
+
+class VectorizedMatching(MatchingStrategy):
+    """
+    Greedy matching with NumPy distance matrices.
+
+    Free drivers' coordinates are packed into contiguous float arrays and the
+    squared distances for a chunk of requests are computed in one shot.
+    Drivers taken earlier in the round are masked out with ``inf`` instead of
+    being removed from a list. Picks are identical to GreedyMatching, which is
+    used instead when NumPy is not installed.
+    """
+
+    def __init__(self, chunk_size: int = 256):
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1")
+        self.chunk_size = chunk_size
+
+    def match(
+        self, ride_requests: Sequence[Ride], drivers: Sequence[Driver], index: SpatialIndex | None
+    ) -> list[tuple[Ride, Driver]]:
+        if np is None:
+            return greedy_matches(ride_requests, drivers, index)
+
+        available_drivers = [driver for driver in drivers if driver.is_available]
+        count = len(available_drivers)
+        driver_x = np.fromiter((driver.location[0] for driver in available_drivers), float, count)
+        driver_y = np.fromiter((driver.location[1] for driver in available_drivers), float, count)
+        return [
+            (ride_requests[row], available_drivers[column])
+            for row, column in _vectorized_greedy(ride_requests, driver_x, driver_y, self.chunk_size)
+        ]
+
+
+class FleetMatching(MatchingStrategy):
+    """
+    Greedy matching that reads driver columns straight out of a FleetStore.
+
+    The Matcher's own driver list and index are ignored; matched drivers are
+    returned as DriverViews. Uses NumPy when available, a plain loop otherwise.
+    """
+
+    def __init__(self, store: FleetStore, chunk_size: int = 256):
+        self.store = store
+        self.chunk_size = chunk_size
+
+    def match(
+        self, ride_requests: Sequence[Ride], drivers: Sequence[Driver], index: SpatialIndex | None
+    ) -> list[tuple[Ride, Driver]]:
+        store = self.store
+        if np is not None:
+            free = np.frombuffer(store.available, dtype=np.int8) & np.frombuffer(store.active, dtype=np.int8)
+            slots = np.flatnonzero(free)
+            driver_x = np.frombuffer(store.xs, dtype=float)[slots]
+            driver_y = np.frombuffer(store.ys, dtype=float)[slots]
+            return [
+                (ride_requests[row], store.view(int(slots[column])))
+                for row, column in _vectorized_greedy(ride_requests, driver_x, driver_y, self.chunk_size)
+            ]
+
+        matches = []
+        free_slots = store.available_slots()
+        xs, ys = store.xs, store.ys
+        for ride_request in ride_requests:
+            if not free_slots:
+                break
+            rider_x, rider_y = ride_request.rider.location
+            closest = min(free_slots, key=lambda slot: (xs[slot] - rider_x) ** 2 + (ys[slot] - rider_y) ** 2)
+            free_slots.remove(closest)
+            matches.append((ride_request, store.view(closest)))
+        return matches
+
+
+def _vectorized_greedy(ride_requests: list[Ride], driver_x, driver_y, chunk_size: int) -> list[tuple[int, int]]:
+    """Greedy picks as (request position, driver column) pairs."""
+    count = len(driver_x)
+    taken = np.zeros(count, dtype=bool)
+    picks = []
+
+    for chunk_start in range(0, len(ride_requests), chunk_size):
+        if len(picks) == count:
+            break
+        chunk = ride_requests[chunk_start:chunk_start + chunk_size]
+        rider_x = np.fromiter((ride.rider.location[0] for ride in chunk), float, len(chunk))
+        rider_y = np.fromiter((ride.rider.location[1] for ride in chunk), float, len(chunk))
+        distances = (driver_x - rider_x[:, None]) ** 2 + (driver_y - rider_y[:, None]) ** 2
+        distances[:, taken] = np.inf
+
+        for row in range(len(chunk)):
+            if len(picks) == count:
+                break
+            # argmin returns the first minimum, the same tie-break as min().
+            closest = int(np.argmin(distances[row]))
+            taken[closest] = True
+            distances[row + 1:, closest] = np.inf
+            picks.append((chunk_start + row, closest))
+    return picks
+
+
+@dataclass
+class MatchReport:
+    requests: int
+    matched: int
+    total_pickup: float
+    greedy_matched: int | None = None
+    greedy_total_pickup: float | None = None
+
+    @property
+    def mean_pickup(self) -> float:
+        return self.total_pickup / self.matched if self.matched else 0.0
+
+    @property
+    def greedy_mean_pickup(self) -> float | None:
+        if self.greedy_total_pickup is None:
+            return None
+        return self.greedy_total_pickup / self.greedy_matched if self.greedy_matched else 0.0
+
+
+class BatchMatching(MatchingStrategy):
+    """
+    Assign the whole matching window at once to minimise total pickup distance.
+
+    Each request only considers its ``candidates`` nearest free drivers, and the
+    resulting sparse assignment problem is solved exactly with the Hungarian
+    method. Requests whose candidates all went to someone else fall back to
+    the nearest driver still free, so the window matches as many riders as
+    greedy matching would. When there are more requests than free drivers,
+    the riders served are the ones that keep total pickup lowest rather than
+    the earliest ones. With ``compare_greedy`` set, the greedy result for
+    the same window is computed too and stored in ``last_report``.
+
+    With a ``distance`` provider, candidates are still the nearest by
+    straight line, but pickups are costed, and leftovers placed, by the
+    provider.
+    """
+
+    def __init__(
+        self, candidates: int = 8, compare_greedy: bool = False, distance: DistanceProvider | None = None
+    ):
+        if candidates < 1:
+            raise ValueError("candidates must be at least 1")
+        self.candidates = candidates
+        self.compare_greedy = compare_greedy
+        self.distance = distance
+        self.last_report: MatchReport | None = None
+
+    def match(
+        self, ride_requests: Sequence[Ride], drivers: Sequence[Driver], index: SpatialIndex | None
+    ) -> list[tuple[Ride, Driver]]:
+        distance = self.distance
+        greedy = greedy_matches(ride_requests, drivers, index, distance=distance) if self.compare_greedy else None
+
+        free_drivers = [driver for driver in drivers if driver.is_available] if index is None else None
+        candidate_lists = [
+            self._candidates(ride_request, free_drivers, index) for ride_request in ride_requests
+        ]
+        if distance is None:
+            costs = [
+                [pickup_distance(ride_request, driver) for driver in candidate_list]
+                for ride_request, candidate_list in zip(ride_requests, candidate_lists)
+            ]
+        else:
+            costs = [
+                distance.distances_from(ride_request.rider.location, [driver.location for driver in candidate_list])
+                for ride_request, candidate_list in zip(ride_requests, candidate_lists)
+            ]
+        owner = _min_cost_assignment(candidate_lists, costs)
+
+        assigned: dict[int, Driver] = {i: driver for driver, i in owner.items()}
+        self._fill_leftovers(ride_requests, assigned, drivers, index)
+
+        matches = [(ride_requests[i], assigned[i]) for i in sorted(assigned)]
+        self.last_report = MatchReport(
+            requests=len(ride_requests),
+            matched=len(matches),
+            total_pickup=sum(pickup_distance(ride, driver, distance) for ride, driver in matches),
+        )
+        if greedy is not None:
+            self.last_report.greedy_matched = len(greedy)
+            self.last_report.greedy_total_pickup = sum(
+                pickup_distance(ride, driver, distance) for ride, driver in greedy
+            )
+        return matches
+
+    def _candidates(
+        self, ride_request: Ride, free_drivers: list[Driver] | None, index: SpatialIndex | None
+    ) -> list[Driver]:
+        location = ride_request.rider.location
+        if index is not None:
+            return index.k_nearest(location, self.candidates, lambda driver: driver.is_available)
+        return heapq.nsmallest(
+            self.candidates, free_drivers, key=lambda driver: math.dist(location, driver.location)
+        )
+
+    def _fill_leftovers(
+        self,
+        ride_requests: list[Ride],
+        assigned: dict[int, Driver],
+        drivers: Sequence[Driver],
+        index: SpatialIndex | None,
+    ) -> None:
+        leftovers = [i for i in range(len(ride_requests)) if i not in assigned]
+        if not leftovers:
+            return
+        position = {id(ride_requests[i]): i for i in leftovers}
+        for ride_request, driver in greedy_matches(
+            [ride_requests[i] for i in leftovers], drivers, index, set(assigned.values()), self.distance
+        ):
+            assigned[position[id(ride_request)]] = driver
+
+
+def _min_cost_assignment(
+    candidate_lists: list[list[Driver]], costs: list[list[float]]
+) -> dict[Driver, int]:
+    """
+    Sparse Hungarian method via successive shortest augmenting paths.
+
+    Riders are added one at a time; each runs Dijkstra over reduced costs
+    (kept non-negative by rider/driver potentials) until it reaches a free
+    driver, then flips the alternating path. Every rider also has a private
+    "stay unmatched" option costing more than any candidate, so a search
+    always ends and is cut off once paths get longer than that. Returns the
+    rider index assigned to each real driver.
+    """
+    max_cost = max((max(row) for row in costs if row), default=0.0)
+    unmatched_cost = 2 * max_cost + 1.0
+    unmatched = [object() for _ in costs]
+    candidate_lists = [row + [unmatched[i]] for i, row in enumerate(candidate_lists)]
+    costs = [row + [unmatched_cost] for row in costs]
+
+    owner: dict[Driver, int] = {}
+    match: list[Driver | None] = [None] * len(costs)
+    match_cost = [0.0] * len(costs)
+    rider_potential = [0.0] * len(costs)
+    driver_potential: dict[Driver, float] = {}
+
+    for start in range(len(costs)):
+        dist: dict[Driver, float] = {}
+        via: dict[Driver, int] = {}
+        done: dict[Driver, float] = {}
+        heap: list[tuple[float, int, Driver]] = []
+        tiebreak = 0
+
+        def relax(i: int, base: float) -> None:
+            nonlocal tiebreak
+            for driver, cost in zip(candidate_lists[i], costs[i]):
+                if driver in done:
+                    continue
+                reduced = base + cost - rider_potential[i] - driver_potential.get(driver, 0.0)
+                if driver not in dist or reduced < dist[driver]:
+                    dist[driver] = reduced
+                    via[driver] = i
+                    tiebreak += 1
+                    heapq.heappush(heap, (reduced, tiebreak, driver))
+
+        relax(start, 0.0)
+        free_driver = None
+        while heap:
+            d, _, driver = heapq.heappop(heap)
+            if driver in done or d > dist[driver]:
+                continue
+            done[driver] = d
+            if driver not in owner:
+                free_driver = driver
+                break
+            relax(owner[driver], d)
+
+        shortest = done[free_driver]
+        for driver, d in done.items():
+            driver_potential[driver] = driver_potential.get(driver, 0.0) + d - shortest
+            if driver in owner:
+                # Keep every matched edge tight under the new potentials.
+                i = owner[driver]
+                rider_potential[i] = match_cost[i] - driver_potential[driver]
+
+        driver = free_driver
+        while True:
+            i = via[driver]
+            previous = match[i]
+            owner[driver] = i
+            match[i] = driver
+            match_cost[i] = costs[i][candidate_lists[i].index(driver)]
+            rider_potential[i] = match_cost[i] - driver_potential[driver]
+            if i == start:
+                break
+            driver = previous
+    return {driver: i for i, driver in enumerate(match) if driver is not unmatched[i]}
+
+
+class EtaCost:
+    """
+    Batched cost of sending each candidate driver to a ride: seconds to the
+    pickup, plus ``rating_penalty`` seconds per rating point below 5 and a
+    per-vehicle-class penalty (e.g. keeping bikes for short trips). Pickup
+    distance is measured with ``distance`` (see Roads), one search per ride
+    for all its candidates, or in a straight line without one.
+    """
+
+    def __init__(
+        self,
+        distance: DistanceProvider | None = None,
+        speed: float = 30.0,
+        rating_penalty: float = 0.0,
+        vehicle_penalties: dict[type, float] | None = None,
+    ):
+        if speed <= 0:
+            raise ValueError("speed must be positive")
+        self.distance = distance
+        # Distance units per hour.
+        self.speed = speed
+        self.rating_penalty = rating_penalty
+        self.vehicle_penalties = vehicle_penalties or {}
+
+    def __call__(self, ride_request: Ride, drivers: list[Driver]) -> list[float]:
+        origin = ride_request.rider.location
+        locations = [driver.location for driver in drivers]
+        if self.distance is None:
+            distances = [math.dist(origin, location) for location in locations]
+        else:
+            distances = self.distance.distances_from(origin, locations)
+        seconds_per_unit = 3600.0 / self.speed
+        return [
+            distance * seconds_per_unit
+            + self.rating_penalty * (5 - driver.rating)
+            + self._vehicle_penalty(driver)
+            for distance, driver in zip(distances, drivers)
+        ]
+
+    def _vehicle_penalty(self, driver: Driver) -> float:
+        if not self.vehicle_penalties:
+            return 0.0
+        for vehicle_class in type(driver.vehicle).__mro__:
+            penalty = self.vehicle_penalties.get(vehicle_class)
+            if penalty is not None:
+                return penalty
+        return 0.0
+
+
+@dataclass
+class RerankReport:
+    requests: int = 0
+    matched: int = 0
+    # Requests whose candidates went through the cost function.
+    reranked: int = 0
+    # Reranked requests that got someone other than the nearest candidate.
+    changed: int = 0
+    # Requests that took the nearest candidate because the budget ran out.
+    over_budget: int = 0
+    cost_seconds: float = 0.0
+
+    @property
+    def change_rate(self) -> float:
+        return self.changed / self.reranked if self.reranked else 0.0
+
+
+class RerankedMatching(MatchingStrategy):
+    """
+    Two-stage greedy matching for costs too expensive to compute for every
+    pair, such as road ETAs.
+
+    Requests are served in order. Each first takes its ``candidates`` nearest
+    free drivers from the spatial index (or by a scan without one), then
+    ``cost(ride, candidates)`` scores them all in one call and the cheapest
+    gets the ride; ties go to the nearer driver. Once the round has spent
+    ``round_budget`` seconds, remaining requests skip the cost function and
+    take their nearest driver, as GreedyMatching would. Counts for the last
+    round, including how often the cost changed the pick, are in
+    ``last_report``.
+    """
+
+    def __init__(
+        self,
+        cost: Callable[[Ride, list[Driver]], list[float]],
+        candidates: int = 8,
+        round_budget: float | None = None,
+        clock: Callable[[], float] = time.perf_counter,
+    ):
+        if candidates < 1:
+            raise ValueError("candidates must be at least 1")
+        self.cost = cost
+        self.candidates = candidates
+        self.round_budget = round_budget
+        self.clock = clock
+        self.last_report: RerankReport | None = None
+
+    def match(
+        self, ride_requests: Sequence[Ride], drivers: Sequence[Driver], index: SpatialIndex | None
+    ) -> list[tuple[Ride, Driver]]:
+        report = RerankReport(requests=len(ride_requests))
+        self.last_report = report
+        started = self.clock()
+        deadline = math.inf if self.round_budget is None else started + self.round_budget
+        taken: set[Driver] = set()
+        is_free = lambda driver: driver.is_available and driver not in taken
+        free_drivers = [driver for driver in drivers if driver.is_available] if index is None else None
+        matches = []
+        for ride_request in ride_requests:
+            location = ride_request.rider.location
+            if index is not None:
+                candidates = index.k_nearest(location, self.candidates, is_free)
+            else:
+                candidates = heapq.nsmallest(
+                    self.candidates,
+                    (driver for driver in free_drivers if driver not in taken),
+                    key=lambda driver: math.dist(location, driver.location),
+                )
+            if not candidates:
+                break
+            chosen = candidates[0]
+            if len(candidates) > 1:
+                now = self.clock()
+                if now < deadline:
+                    costs = self.cost(ride_request, candidates)
+                    report.cost_seconds += self.clock() - now
+                    report.reranked += 1
+                    chosen = candidates[min(range(len(candidates)), key=costs.__getitem__)]
+                    if chosen is not candidates[0]:
+                        report.changed += 1
+                else:
+                    report.over_budget += 1
+            taken.add(chosen)
+            matches.append((ride_request, chosen))
+        report.matched = len(matches)
+        return matches
@@ -0,0 +1,376 @@
+"""
+Counters and histograms for the ride pipeline's hot paths.
+
+Instrumentation is off by default and costs nothing while off: ``enable``
+wraps a handful of methods in place and ``disable`` puts the originals back,
+so uninstrumented code runs exactly as written. While on, it records:
+
+- Matcher.make_matches, split into candidate search (propose_matches),
+  assignment (Matcher.assign, less the notifications it sends) and
+  notification (the Ride._notify_observers calls made while assigning).
+  Subclasses of Matcher loaded when ``enable`` is called that override
+  make_matches or assign, such as ConcurrentMatcher, are wrapped the same
+  way; an assign that returns False made no assignment and is not counted
+- Ride._notify_observers, Ride.calculate_cost and Person.observe_ride
+
+ShardedMatcher is not a Matcher and its rounds are not recorded. Counters
+and histograms may be updated from many threads at once.
+
+Every call is counted. With ``sample_rate`` below 1 only every n-th call is
+timed, which keeps clock reads off most calls. Results export as JSON or
+Prometheus text, to a file with ``write`` or over HTTP with ``serve``:
+
+    registry = Metrics.enable(sample_rate=0.1)
+    ...
+    registry.write("metrics.prom")
+    Metrics.disable()
+"""
+
+from __future__ import annotations
+
+import functools
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable
+
+from Matcher import Matcher
+from People import Person
+from Rides import Ride
+
+# Seconds, from one microsecond to ten seconds.
+DEFAULT_BUCKETS = tuple(m * 10.0 ** e for e in range(-6, 1) for m in (1, 2.5, 5)) + (10.0,)
+
+Labels = tuple[tuple[str, str], ...]
+
+
+class Counter:
+    """
+    A count kept in one cell per thread.
+
+    A thread only ever adds to its own cell, so no two threads write the
+    same number and increments need no lock; ``value`` sums the cells.
+    Cells outlive their threads, so nothing counted is lost.
+    """
+
+    def __init__(self):
+        self._cells: list[list[int]] = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def inc(self, amount: int = 1) -> int:
+        """Add ``amount``; returns this thread's running total, which the wrappers sample by."""
+        try:
+            cell = self._local.cell
+        except AttributeError:
+            cell = self._new_cell()
+        cell[0] += amount
+        return cell[0]
+
+    @property
+    def value(self) -> int:
+        return sum(cell[0] for cell in self._cells)
+
+    def _new_cell(self) -> list[int]:
+        cell = self._local.cell = [0]
+        with self._lock:
+            self._cells = [*self._cells, cell]
+        return cell
+
+
+class Histogram:
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        # One count per bucket plus one for +Inf; cumulated on export.
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        bucket = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[bucket] += 1
+            self.sum += value
+            self.count += 1
+
+    def cumulative(self) -> list[int]:
+        total, out = 0, []
+        for count in self.counts:
+            total += count
+            out.append(total)
+        return out
+
+
+class MetricsRegistry:
+
+    def __init__(self):
+        self._counters: dict[tuple[str, Labels], Counter] = {}
+        self._histograms: dict[tuple[str, Labels], Histogram] = {}
+        self._help: dict[str, str] = {}
+
+    def counter(self, name: str, help: str = "", **labels: str) -> Counter:
+        key = (name, tuple(sorted(labels.items())))
+        counter = self._counters.get(key)
+        if counter is None:
+            counter = self._counters[key] = Counter()
+            self._help.setdefault(name, help)
+        return counter
+
+    def histogram(self, name: str, help: str = "", buckets: tuple[float, ...] = DEFAULT_BUCKETS, **labels: str) -> Histogram:
+        key = (name, tuple(sorted(labels.items())))
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            histogram = self._histograms[key] = Histogram(buckets)
+            self._help.setdefault(name, help)
+        return histogram
+
+    def to_json(self) -> dict:
+        return {
+            "counters": [
+                {"name": name, "labels": dict(labels), "value": counter.value}
+                for (name, labels), counter in self._counters.items()
+            ],
+            "histograms": [
+                {
+                    "name": name,
+                    "labels": dict(labels),
+                    "buckets": list(histogram.buckets),
+                    "cumulative_counts": histogram.cumulative(),
+                    "sum": histogram.sum,
+                    "count": histogram.count,
+                }
+                for (name, labels), histogram in self._histograms.items()
+            ],
+        }
+
+    def to_prometheus(self) -> str:
+        lines = []
+        described = set()
+
+        def describe(name: str, kind: str) -> None:
+            if name not in described:
+                described.add(name)
+                if self._help.get(name):
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), counter in sorted(self._counters.items()):
+            describe(name, "counter")
+            lines.append(f"{name}{_labels(labels)} {counter.value}")
+        for (name, labels), histogram in sorted(self._histograms.items()):
+            describe(name, "histogram")
+            bounds = [*map(repr, histogram.buckets), "+Inf"]
+            for bound, count in zip(bounds, histogram.cumulative()):
+                lines.append(f"{name}_bucket{_labels(labels + (('le', bound),))} {count}")
+            lines.append(f"{name}_sum{_labels(labels)} {histogram.sum!r}")
+            lines.append(f"{name}_count{_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str, format: str | None = None) -> None:
+        """Write to ``path``: JSON for a .json file or ``format="json"``, Prometheus text otherwise."""
+        if format is None:
+            format = "json" if path.endswith(".json") else "prometheus"
+        text = json.dumps(self.to_json(), indent=2) if format == "json" else self.to_prometheus()
+        temporary = path + ".tmp"
+        with open(temporary, "w") as handle:
+            handle.write(text)
+        # Scrapers reading the file never see it half-written.
+        os.replace(temporary, path)
+
+    def serve(self, port: int = 9108, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+        """Serve /metrics (Prometheus) and /metrics.json on a daemon thread; call shutdown() to stop."""
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path == "/metrics":
+                    body, kind = registry.to_prometheus().encode(), "text/plain; version=0.0.4"
+                elif self.path == "/metrics.json":
+                    body, kind = json.dumps(registry.to_json()).encode(), "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", kind)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args) -> None:
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        return server
+
+
+def _labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+def _escape(value: str) -> str:
+    """A label value as the Prometheus text format quotes it."""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class _AssignTiming(threading.local):
+    # Notification seconds so far inside the assignment this thread is
+    # timing; None when it is not timing one.
+    inside_assign: float | None = None
+    # Set while a wrapped assign runs, so an override calling the Matcher's
+    # assign is recorded once.
+    assigning: bool = False
+
+
+REGISTRY = MetricsRegistry()
+
+# (owner, attribute, original) for every method currently wrapped.
+_patched: list[tuple[type, str, Callable]] = []
+
+
+def enabled() -> bool:
+    return bool(_patched)
+
+
+def enable(registry: MetricsRegistry = REGISTRY, sample_rate: float = 1.0) -> MetricsRegistry:
+    """Start instrumenting the hot paths; returns the registry being filled."""
+    if not 0 < sample_rate <= 1:
+        raise ValueError("sample_rate must be in (0, 1]")
+    disable()
+    every = max(1, round(1 / sample_rate))
+
+    def wrap(owner: type, name: str, calls: Counter, seconds: Histogram) -> None:
+        original = getattr(owner, name)
+        local = calls._local
+
+        @functools.wraps(original)
+        def timed(*args, **kwargs):
+            # Counter.inc inlined; the method call would cost more than the count.
+            try:
+                cell = local.cell
+            except AttributeError:
+                cell = calls._new_cell()
+            cell[0] += 1
+            # The call counter doubles as the sampling stride.
+            if cell[0] % every:
+                return original(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                seconds.observe(time.perf_counter() - start)
+
+        _patch(owner, name, timed)
+
+    def phase(name: str) -> Histogram:
+        return registry.histogram("matcher_phase_seconds", "Time per make_matches phase", phase=name)
+
+    rounds = registry.counter("matcher_rounds_total", "make_matches calls")
+    round_seconds = registry.histogram("matcher_round_seconds", "make_matches wall time")
+    # Overrides such as ConcurrentMatcher's do not call the Matcher's methods.
+    matchers = _with_subclasses(Matcher)
+    for owner in matchers:
+        if "make_matches" in owner.__dict__:
+            wrap(owner, "make_matches", rounds, round_seconds)
+    wrap(
+        Matcher, "propose_matches",
+        registry.counter("matcher_proposals_total", "propose_matches calls"),
+        phase("candidate_search"),
+    )
+    wrap(
+        Ride, "calculate_cost",
+        registry.counter("ride_fares_total", "Ride.calculate_cost calls"),
+        registry.histogram("ride_fare_seconds", "Ride.calculate_cost time"),
+    )
+    wrap(
+        Person, "observe_ride",
+        registry.counter("person_observations_total", "Notifications received by riders and drivers"),
+        registry.histogram("person_observe_seconds", "Person.observe_ride time"),
+    )
+
+    # Assignment notifies the ride's observers. A timed assignment always
+    # times the notifications it sends, so the two phases can be reported
+    # separately; other notifications follow the sample rate.
+    notify = Ride._notify_observers
+    assignments = registry.counter("matcher_assignments_total", "Requests assigned to a driver")
+    notifications = registry.counter("ride_notifications_total", "Ride status changes sent to observers")
+    assignment_seconds, notification_seconds = phase("assignment"), phase("notification")
+    notify_seconds = registry.histogram("ride_notify_seconds", "Ride._notify_observers time")
+    timing = _AssignTiming()
+    # Every assign call, claimed or not, for the sampling stride.
+    attempts = Counter().inc
+    assigned, notified = assignments.inc, notifications.inc
+
+    def timed(assign: Callable) -> Callable:
+        @functools.wraps(assign)
+        def timed_assign(self, ride_request, driver):
+            if timing.assigning:
+                return assign(self, ride_request, driver)
+            timing.assigning = True
+            try:
+                if attempts() % every:
+                    claimed = assign(self, ride_request, driver)
+                else:
+                    timing.inside_assign = 0.0
+                    start = time.perf_counter()
+                    try:
+                        claimed = assign(self, ride_request, driver)
+                    finally:
+                        elapsed = time.perf_counter() - start
+                        notified, timing.inside_assign = timing.inside_assign, None
+                        assignment_seconds.observe(elapsed - notified)
+                        notification_seconds.observe(notified)
+            finally:
+                timing.assigning = False
+            # ConcurrentMatcher.assign returns False when its claim fails.
+            if claimed is not False:
+                assigned()
+            return claimed
+
+        return timed_assign
+
+    @functools.wraps(notify)
+    def timed_notify(self):
+        seen = notified()
+        inside_assign = timing.inside_assign
+        if inside_assign is None and seen % every:
+            return notify(self)
+        start = time.perf_counter()
+        try:
+            return notify(self)
+        finally:
+            elapsed = time.perf_counter() - start
+            notify_seconds.observe(elapsed)
+            if inside_assign is not None:
+                timing.inside_assign += elapsed
+
+    for owner in matchers:
+        if "assign" in owner.__dict__:
+            _patch(owner, "assign", timed(owner.__dict__["assign"]))
+    _patch(Ride, "_notify_observers", timed_notify)
+    return registry
+
+
+def _with_subclasses(cls: type) -> list[type]:
+    classes = [cls]
+    for subclass in cls.__subclasses__():
+        classes += [c for c in _with_subclasses(subclass) if c not in classes]
+    return classes
+
+
+def _patch(owner: type, name: str, replacement: Callable) -> None:
+    _patched.append((owner, name, owner.__dict__[name]))
+    setattr(owner, name, replacement)
+
+
+def disable() -> None:
+    while _patched:
+        owner, name, original = _patched.pop()
+        setattr(owner, name, original)
@@ -0,0 +1,251 @@
+"""
+Greedy matching with the distance work spread over worker processes.
+
+ParallelMatching is a MatchingStrategy. Each round it copies the free
+drivers' and the riders' coordinates into ``multiprocessing.shared_memory``
+blocks, and every worker attaches to them by name. Workers take a slice of
+requests each and write, for every request, its ``candidates`` nearest
+drivers into a shared output array. Only block names and row ranges cross
+the process boundary; Ride and Driver objects are never pickled.
+
+The parent then walks the requests in order and gives each one its first
+candidate nobody has taken yet. Candidates are ordered by distance and then
+by position in the driver list, which is exactly the order GreedyMatching
+and VectorizedMatching break ties in, so that driver is the one greedy
+matching would pick and the result is the same for the same input. When
+every candidate of a request is already taken, the remaining requests get
+fresh candidate lists over the drivers that are still free, with twice as
+many candidates, and the walk carries on.
+
+NumPy is required for the parallel path; without it GreedyMatching runs
+instead.
+"""
+
+from __future__ import annotations
+
+import multiprocessing
+from multiprocessing import resource_tracker, shared_memory
+from typing import TYPE_CHECKING, Sequence
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from Matching import MatchingStrategy, greedy_matches
+
+if TYPE_CHECKING:
+    from People import Driver
+    from Rides import Ride
+    from SpatialIndex import SpatialIndex
+
+
+class ParallelMatching(MatchingStrategy):
+
+    def __init__(self, workers: int = 4, candidates: int = 8, rows_per_task: int = 256):
+        if candidates < 1 or rows_per_task < 1:
+            raise ValueError("candidates and rows_per_task must be at least 1")
+        self.candidates = candidates
+        self.rows_per_task = rows_per_task
+        self._connections = []
+        self._processes = []
+        # workers=0 computes candidates in this process, through the same shared blocks.
+        if workers and np is not None:
+            # Started first, so workers report their attachments to the
+            # parent's tracker rather than to trackers of their own.
+            resource_tracker.ensure_running()
+        for _ in range(workers if np is not None else 0):
+            parent, child = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=_worker_main, args=(child,), daemon=True)
+            process.start()
+            child.close()
+            self._connections.append(parent)
+            self._processes.append(process)
+
+    def __enter__(self) -> ParallelMatching:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        for connection in self._connections:
+            connection.send(("stop",))
+            connection.close()
+        for process in self._processes:
+            process.join()
+        self._connections = []
+        self._processes = []
+
+    def match(
+        self, ride_requests: Sequence[Ride], drivers: Sequence[Driver], index: SpatialIndex | None
+    ) -> list[tuple[Ride, Driver]]:
+        if np is None:
+            return greedy_matches(ride_requests, drivers, index)
+        available_drivers = [driver for driver in drivers if driver.is_available]
+        if not ride_requests or not available_drivers:
+            return []
+        blocks = _SharedBlocks()
+        try:
+            picks = self._resolve(blocks, available_drivers, ride_requests)
+        finally:
+            blocks.release()
+        return [(ride_requests[row], available_drivers[column]) for row, column in picks]
+
+    def _resolve(self, blocks: _SharedBlocks, drivers: list[Driver], ride_requests: list[Ride]) -> list[tuple[int, int]]:
+        num_drivers, num_requests = len(drivers), len(ride_requests)
+        driver_xy = blocks.array("drivers", (num_drivers, 2), np.float64)
+        driver_xy[:] = [driver.location for driver in drivers]
+        rider_xy = blocks.array("riders", (num_requests, 2), np.float64)
+        rider_xy[:] = [ride.rider.location for ride in ride_requests]
+        taken_shared = blocks.array("taken", (num_drivers,), np.bool_)
+        taken = bytearray(num_drivers)
+
+        picks = []
+        start = 0
+        k = min(self.candidates, num_drivers)
+        while start < num_requests and len(picks) < num_drivers:
+            taken_shared[:] = np.frombuffer(taken, dtype=np.bool_)
+            blocks.array("candidates", (num_requests - start, k), np.int64)
+            rows = self._candidates(blocks, num_drivers, num_requests, start, k).tolist()
+            for offset, row in enumerate(rows):
+                if len(picks) == num_drivers:
+                    break
+                for column in row:
+                    if column >= 0 and not taken[column]:
+                        taken[column] = 1
+                        picks.append((start + offset, column))
+                        break
+                else:
+                    # Every candidate went to an earlier request: redo the
+                    # lists from here, over the drivers still free.
+                    start += offset
+                    k = min(2 * k, num_drivers)
+                    break
+            else:
+                start = num_requests
+        return picks
+
+    def _candidates(self, blocks: _SharedBlocks, num_drivers: int, num_requests: int, start: int, k: int):
+        job = (*blocks.names(), num_drivers, num_requests, start, k)
+        num_rows = num_requests - start
+        tasks = [(low, min(low + self.rows_per_task, num_rows)) for low in range(0, num_rows, self.rows_per_task)]
+        if not self._connections:
+            for low, high in tasks:
+                _write_candidates(*job, low, high)
+        else:
+            # Tasks go out round-robin; a worker answers once per task.
+            pending = [0] * len(self._connections)
+            for number, (low, high) in enumerate(tasks):
+                worker = number % len(self._connections)
+                self._connections[worker].send(("candidates", job, low, high))
+                pending[worker] += 1
+            failures = []
+            for worker, replies in enumerate(pending):
+                for _ in range(replies):
+                    reply = self._connections[worker].recv()
+                    if reply[0] == "error":
+                        failures.append(reply[1])
+            if failures:
+                raise RuntimeError(f"candidate worker failed: {failures[0]}")
+        return blocks.arrays["candidates"]
+
+
+class _SharedBlocks:
+    """The shared-memory blocks of one match call, by role."""
+
+    def __init__(self):
+        self.blocks: dict[str, shared_memory.SharedMemory] = {}
+        self.arrays: dict[str, np.ndarray] = {}
+
+    def array(self, role: str, shape: tuple[int, ...], dtype) -> np.ndarray:
+        self._free(role)
+        size = max(1, int(np.prod(shape)) * np.dtype(dtype).itemsize)
+        block = self.blocks[role] = shared_memory.SharedMemory(create=True, size=size)
+        array = self.arrays[role] = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+        return array
+
+    def names(self) -> tuple[str, str, str, str]:
+        return tuple(self.blocks[role].name for role in ("drivers", "riders", "taken", "candidates"))
+
+    def release(self) -> None:
+        for role in list(self.blocks):
+            self._free(role)
+
+    def _free(self, role: str) -> None:
+        self.arrays.pop(role, None)
+        block = self.blocks.pop(role, None)
+        if block is None:
+            return
+        block.unlink()
+        try:
+            block.close()
+        except BufferError:
+            # A caller still holds a view; the mapping goes when it does.
+            pass
+
+
+def _write_candidates(
+    driver_name: str, rider_name: str, taken_name: str, candidate_name: str,
+    num_drivers: int, num_requests: int, start: int, k: int, low: int, high: int,
+) -> None:
+    """Fill rows ``low:high`` of the candidate block; row 0 is request ``start``."""
+    opened = [shared_memory.SharedMemory(name=name) for name in (driver_name, rider_name, taken_name, candidate_name)]
+    try:
+        driver_xy = np.ndarray((num_drivers, 2), dtype=np.float64, buffer=opened[0].buf)
+        rider_xy = np.ndarray((num_requests, 2), dtype=np.float64, buffer=opened[1].buf)
+        taken = np.ndarray((num_drivers,), dtype=np.bool_, buffer=opened[2].buf)
+        candidates = np.ndarray((num_requests - start, k), dtype=np.int64, buffer=opened[3].buf)
+        free = np.flatnonzero(~taken)
+        free_x, free_y = driver_xy[free, 0], driver_xy[free, 1]
+        riders = rider_xy[start + low:start + high]
+        distances = (free_x - riders[:, :1]) ** 2 + (free_y - riders[:, 1:]) ** 2
+        nearest = _nearest(distances, k)
+        found = nearest >= 0
+        nearest[found] = free[nearest[found]]
+        candidates[low:high] = nearest
+        # Views must go before the blocks can close.
+        del driver_xy, rider_xy, taken, candidates
+    finally:
+        for block in opened:
+            block.close()
+
+
+def _nearest(distances, k: int):
+    """Per row, the columns of the ``k`` smallest values, ties to the lower column; -1 pads."""
+    num_rows, num_columns = distances.shape
+    out = np.full((num_rows, k), -1, dtype=np.int64)
+    if num_columns == 0:
+        return out
+    k_here = min(k, num_columns)
+    if k_here < num_columns:
+        part = np.argpartition(distances, k_here - 1, axis=1)[:, :k_here]
+    else:
+        part = np.broadcast_to(np.arange(num_columns), (num_rows, num_columns)).copy()
+    values = np.take_along_axis(distances, part, axis=1)
+    # Sort each row by (distance, column); lexsort's last key is the primary one.
+    order = np.lexsort((part, values), axis=1)
+    out[:, :k_here] = np.take_along_axis(part, order, axis=1)
+    if k_here < num_columns:
+        # argpartition picks arbitrarily among values equal to the k-th; such
+        # rows are redone so the lowest columns win, as in greedy matching.
+        kth = np.take_along_axis(values, order[:, -1:], axis=1)
+        for row in np.flatnonzero((distances <= kth).sum(axis=1) > k_here):
+            columns = np.flatnonzero(distances[row] <= kth[row, 0])
+            out[row, :k_here] = columns[np.argsort(distances[row, columns], kind="stable")][:k_here]
+    return out
+
+
+def _worker_main(connection) -> None:
+    while True:
+        message = connection.recv()
+        if message[0] == "stop":
+            connection.close()
+            return
+        _, job, low, high = message
+        try:
+            _write_candidates(*job, low, high)
+        except Exception as error:
+            connection.send(("error", repr(error)))
+        else:
+            connection.send(("done",))
@@ -1,39 +1,155 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING
+import time
+from array import array
+from typing import TYPE_CHECKING, Iterator, NamedTuple
 
 from RideNotifier import RideObserver
+from Rides import RideStatus
 
 if TYPE_CHECKING:
     from Rides import Ride
     from Vehicles import Vehicle
 
+DEFAULT_NOTIFICATION_CAPACITY = 100
+_STATUSES = list(RideStatus)
+_STATUS_CODES = {status: code for code, status in enumerate(_STATUSES)}
+
+
+class NotificationRecord(NamedTuple):
+    ride_id: int
+    status: RideStatus
+    driver: str | None
+    timestamp: float
+    from_place: str | tuple[float, float]
+    to: str | tuple[float, float]
+
+
+class NotificationLog:
+    """
+    Ring buffer of notifications stored column-wise.
+
+    Ride id, status code and timestamp go into typed arrays; driver name and
+    endpoints are references to objects the ride already owns, so appending
+    allocates nothing per event beyond the array slots. With ``capacity=None``
+    every notification is kept.
+    """
+
+    __slots__ = ("capacity", "_ride_ids", "_statuses", "_timestamps", "_drivers", "_from", "_to", "_head")
+
+    def __init__(self, capacity: int | None = DEFAULT_NOTIFICATION_CAPACITY):
+        if capacity is not None and capacity < 1:
+            raise ValueError("capacity must be at least 1 or None")
+        self.capacity = capacity
+        self._ride_ids = array("q")
+        self._statuses = array("b")
+        self._timestamps = array("d")
+        self._drivers: list[str | None] = []
+        self._from: list[str | tuple[float, float]] = []
+        self._to: list[str | tuple[float, float]] = []
+        # Index of the oldest entry once the buffer has wrapped around.
+        self._head = 0
+
+    def __len__(self) -> int:
+        return len(self._ride_ids)
+
+    def __iter__(self) -> Iterator[NotificationRecord]:
+        size = len(self._ride_ids)
+        for offset in range(size):
+            i = (self._head + offset) % size
+            yield NotificationRecord(
+                self._ride_ids[i],
+                _STATUSES[self._statuses[i]],
+                self._drivers[i],
+                self._timestamps[i],
+                self._from[i],
+                self._to[i],
+            )
+
+    def append(self, ride: Ride) -> None:
+        driver = ride.driver.name if ride.driver is not None else None
+        status = _STATUS_CODES[ride.status]
+        now = time.time()
+        if self.capacity is None or len(self._ride_ids) < self.capacity:
+            self._ride_ids.append(ride.ride_id)
+            self._statuses.append(status)
+            self._timestamps.append(now)
+            self._drivers.append(driver)
+            self._from.append(ride.from_place)
+            self._to.append(ride.to)
+            return
+        i = self._head
+        self._ride_ids[i] = ride.ride_id
+        self._statuses[i] = status
+        self._timestamps[i] = now
+        self._drivers[i] = driver
+        self._from[i] = ride.from_place
+        self._to[i] = ride.to
+        self._head = (i + 1) % self.capacity
+
+    def last(self) -> NotificationRecord:
+        if not self._ride_ids:
+            raise IndexError("notification log is empty")
+        i = (self._head - 1) % len(self._ride_ids)
+        return NotificationRecord(
+            self._ride_ids[i],
+            _STATUSES[self._statuses[i]],
+            self._drivers[i],
+            self._timestamps[i],
+            self._from[i],
+            self._to[i],
+        )
+
+
 class Person(RideObserver):
-    def __init__(self, name: str, phone: str, rating: int, location: tuple[float, float] | str):
+    # Print each notification as it arrives, as before. Turning this off means
+    # nothing is formatted until print_notifications or export_notifications.
+    echo_notifications = True
+
+    def __init__(
+        self,
+        name: str,
+        phone: str,
+        rating: int,
+        location: tuple[float, float] | str,
+        notification_capacity: int | None = DEFAULT_NOTIFICATION_CAPACITY,
+    ):
         self.name = name
         self.phone = phone
         self.rating = rating
         self.location = self._to_coords(location)
-        self.notifications: list[str] = []
-    
+        # None keeps every notification, like the old unbounded list.
+        self.notification_log = NotificationLog(notification_capacity)
+
+    @property
+    def notifications(self) -> list[str]:
+        return self.export_notifications()
+
     def observe_ride(self, ride: Ride) -> None:
-        driver_name = ride.driver.name if ride.driver is not None else "unassigned"
-        message = (
-            f"{self.__class__.__name__} {self.name}: "
-            f"Ride {ride.from_place}->{ride.to} is {ride.status.value} "
-            f"(driver={driver_name})"
-        )
-        self.notifications.append(message)
-        print(message)
+        log = self.notification_log
+        log.append(ride)
+        if self.echo_notifications:
+            print(self._format_notification(log.last()))
+
+    def export_notifications(self) -> list[str]:
+        return [self._format_notification(record) for record in self.notification_log]
 
     def print_notifications(self) -> None:
         print(f"Notifications for {self.__class__.__name__} {self.name}:")
-        if not self.notifications:
+        if not self.notification_log:
             print("  No notifications yet.")
             return
-        for notification in self.notifications:
+        for notification in self.export_notifications():
             print(f"  {notification}")
 
+    def _format_notification(self, record: NotificationRecord) -> str:
+        driver_name = record.driver if record.driver is not None else "unassigned"
+        return (
+            f"{self.__class__.__name__} {self.name}: "
+            f"Ride {record.from_place}->{record.to} is {record.status.value} "
+            f"(driver={driver_name})"
+        )
+
     @staticmethod
     def _to_coords(location: tuple[float, float] | str) -> tuple[float, float]:
         if isinstance(location, tuple):
@@ -47,7 +163,36 @@ class Rider(Person):
 
 
 class Driver(Person):
-    def __init__(self, name: str, phone: str, rating: int, location: str, vehicle: Vehicle):
-        super().__init__(name, phone, rating, location)
+    # Objects with a driver_availability_changed(driver) method, told by
+    # set_available. A tuple so drivers nobody listens to carry nothing.
+    availability_listeners: tuple = ()
+
+    def __init__(
+        self,
+        name: str,
+        phone: str,
+        rating: int,
+        location: str,
+        vehicle: Vehicle,
+        notification_capacity: int | None = DEFAULT_NOTIFICATION_CAPACITY,
+    ):
+        super().__init__(name, phone, rating, location, notification_capacity)
         self.vehicle = vehicle
         self.is_available = True
+
+    def set_available(self, value: bool) -> None:
+        # Plain attribute reads keep matching fast; writes that should reach
+        # listeners go through here rather than assigning is_available.
+        if value != self.is_available:
+            self.is_available = value
+            for listener in self.availability_listeners:
+                listener.driver_availability_changed(self)
+
+    def add_availability_listener(self, listener) -> None:
+        if listener not in self.availability_listeners:
+            self.availability_listeners = (*self.availability_listeners, listener)
+
+    def remove_availability_listener(self, listener) -> None:
+        self.availability_listeners = tuple(
+            existing for existing in self.availability_listeners if existing is not listener
+        )
@@ -0,0 +1,233 @@
+"""
+Pooled rides: grouping compatible sharing requests onto one driver.
+
+Two riders can share when their pickups are close, they head the same way
+and neither is taken more than ``max_detour`` (a fraction of their direct
+trip) out of their way. PoolingEngine buckets requests by pickup grid cell
+and heading sector, so each request is only compared with the handful of
+requests in its own and neighbouring buckets, never with every pending
+request. Grouping is greedy in request order: the oldest ungrouped request
+starts a pool and takes the first compatible neighbours until the pool is
+full. A pool is never larger than the smallest ``shared_by`` among its
+riders, since that is the most riders each of them agreed to share with.
+
+``dispatch`` pools a Matcher's pending SharingRides, matches each pool's
+first rider through the Matcher's strategy and gives the driver to every
+rider in the pool. Each rider pays their own trip's fare through a
+SharingCost split by the pool size. The driver stays busy until the last
+rider in the pool is dropped off.
+"""
+
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass, field
+from itertools import islice, permutations
+from typing import TYPE_CHECKING
+
+from Pricing import SharingCost
+from Rides import SharingRide
+
+if TYPE_CHECKING:
+    from Matcher import Matcher
+    from People import Driver
+    from Rides import Ride
+
+
+@dataclass
+class Pool:
+    rides: list[Ride]
+    # Pickups in order, then drop-offs, as (x, y) points.
+    route: list[tuple[float, float]]
+    distance: float
+    # Ids of the riders not yet dropped off.
+    _riding: set[int] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        self._riding = {id(ride) for ride in self.rides}
+
+    def fares(self) -> list[float]:
+        return [ride.calculate_cost() for ride in self.rides]
+
+    def drop_off(self, ride: Ride) -> bool:
+        """Mark ``ride`` done; True once every rider in the pool has been dropped off."""
+        self._riding.discard(id(ride))
+        return not self._riding
+
+
+class PoolingEngine:
+
+    def __init__(
+        self,
+        cell_size: float = 2.0,
+        heading_sectors: int = 8,
+        max_detour: float = 0.3,
+        max_group: int = 3,
+        max_candidates: int = 16,
+    ):
+        if heading_sectors < 1 or max_group < 1:
+            raise ValueError("heading_sectors and max_group must be at least 1")
+        self.cell_size = cell_size
+        self.heading_sectors = heading_sectors
+        self.max_detour = max_detour
+        self.max_group = max_group
+        # Compatibility checks per bucket for each pool being filled.
+        self.max_candidates = max_candidates
+        self._pricing: dict[int, SharingCost] = {}
+
+    def group(self, rides: list[Ride]) -> list[Pool]:
+        """Every ride ends up in exactly one pool; rides that cannot share ride alone."""
+        trips = [_trip(ride) for ride in rides]
+        buckets: dict[tuple[int, int, int], dict[int, None]] = {}
+        keys = []
+        for position, (ox, oy, dx, dy, _) in enumerate(trips):
+            key = self._bucket(ox, oy, dx - ox, dy - oy)
+            keys.append(key)
+            bucket = buckets.get(key)
+            if bucket is None:
+                bucket = buckets[key] = {}
+            bucket[position] = None
+
+        sizes = [self._group_size(ride) for ride in rides]
+        pools = []
+        for position, ride in enumerate(rides):
+            bucket = buckets[keys[position]]
+            if position not in bucket:
+                continue
+            del bucket[position]
+            members = [position]
+            # The smallest group size any member agreed to.
+            cap = sizes[position]
+            if cap > 1:
+                for neighbour in self._neighbours(keys[position]):
+                    candidates = buckets.get(neighbour)
+                    if not candidates:
+                        continue
+                    for candidate in list(islice(candidates, self.max_candidates)):
+                        if len(members) >= min(cap, sizes[candidate]):
+                            continue
+                        if self._route([trips[m] for m in members] + [trips[candidate]]) is not None:
+                            members.append(candidate)
+                            del candidates[candidate]
+                            cap = min(cap, sizes[candidate])
+                            if len(members) == cap:
+                                break
+                    if len(members) == cap:
+                        break
+            route, distance = self._route([trips[m] for m in members])
+            pools.append(Pool([rides[m] for m in members], route, distance))
+        return pools
+
+    def dispatch(self, matcher: Matcher, rides: list[Ride] | None = None) -> list[tuple[Pool, Driver]]:
+        """Pool ``rides`` (by default every pending SharingRide) and assign a driver per pool."""
+        if rides is None:
+            rides = [ride for ride in matcher.ride_requests if isinstance(ride, SharingRide)]
+        pools = {id(pool.rides[0]): pool for pool in self.group(rides)}
+        assigned = []
+        for lead, driver in matcher.propose_matches([pool.rides[0] for pool in pools.values()]):
+            pool = pools[id(lead)]
+            pricing = self.pricing(len(pool.rides))
+            for ride in pool.rides:
+                ride.pricing = pricing
+                # Completing the ride frees the driver only once the pool is empty.
+                ride.pool = pool
+                matcher.assign(ride, driver)
+            assigned.append((pool, driver))
+        return assigned
+
+    def pricing(self, riders: int) -> SharingCost:
+        # One strategy per pool size, shared by every pool of that size.
+        pricing = self._pricing.get(riders)
+        if pricing is None:
+            pricing = self._pricing[riders] = SharingCost(num_share=riders)
+        return pricing
+
+    def _group_size(self, ride: Ride) -> int:
+        # A SharingRide's shared_by is the most riders it agreed to share with.
+        if not isinstance(ride, SharingRide):
+            return 1
+        return max(1, min(self.max_group, ride.shared_by))
+
+    def _bucket(self, x: float, y: float, heading_x: float, heading_y: float) -> tuple[int, int, int]:
+        angle = math.atan2(heading_y, heading_x)
+        sector = int((angle + math.pi) / (2 * math.pi) * self.heading_sectors) % self.heading_sectors
+        return int(x // self.cell_size), int(y // self.cell_size), sector
+
+    def _neighbours(self, key: tuple[int, int, int]):
+        cx, cy, sector = key
+        sectors = self.heading_sectors
+        # Own bucket first, then neighbouring cells and headings.
+        yield key
+        for offset in (0, 1, -1) if sectors > 2 else (0,):
+            heading = (sector + offset) % sectors
+            for x in (cx, cx - 1, cx + 1):
+                for y in (cy, cy - 1, cy + 1):
+                    if (x, y, heading) != key:
+                        yield x, y, heading
+
+    def _route(self, trips: list[tuple]) -> tuple[list[tuple[float, float]], float] | None:
+        """Shortest drop-off order keeping every rider within the detour limit, or None."""
+        pickups = [(ox, oy) for ox, oy, _, _, _ in trips]
+        if len(trips) == 1:
+            ox, oy, dx, dy, direct = trips[0]
+            return [(ox, oy), (dx, dy)], direct
+        if len(trips) == 2:
+            return self._pair_route(*trips)
+        # Distance driven from each pickup to the last pickup.
+        legs = [math.dist(a, b) for a, b in zip(pickups, pickups[1:])]
+        to_last_pickup = [sum(legs[i:]) for i in range(len(trips))]
+        limit = 1 + self.max_detour
+        last = pickups[-1]
+        # Nobody is dropped before the last pickup, so a rider already too far
+        # out of their way by then rules out every drop-off order.
+        for (_, _, dx, dy, direct), before in zip(trips, to_last_pickup):
+            if before + math.hypot(dx - last[0], dy - last[1]) > limit * direct + 1e-9:
+                return None
+        best = None
+        for order in permutations(range(len(trips))):
+            driven = 0.0
+            position = pickups[-1]
+            ok = True
+            for rider in order:
+                ox, oy, dx, dy, direct = trips[rider]
+                driven += math.dist(position, (dx, dy))
+                position = (dx, dy)
+                if to_last_pickup[rider] + driven > limit * direct + 1e-9:
+                    ok = False
+                    break
+            if ok:
+                total = sum(legs) + driven
+                if best is None or total < best[1]:
+                    best = (order, total)
+        if best is None:
+            return None
+        order, total = best
+        drops = [(trips[rider][2], trips[rider][3]) for rider in order]
+        return pickups + drops, total
+
+    def _pair_route(self, first: tuple, second: tuple) -> tuple[list[tuple[float, float]], float] | None:
+        # The common case, spelled out: pick up both, then drop either first.
+        ax, ay, adx, ady, a_direct = first
+        bx, by, bdx, bdy, b_direct = second
+        limit = 1 + self.max_detour
+        between = math.hypot(bx - ax, by - ay)
+        drop_a = math.hypot(adx - bx, ady - by)
+        drop_b = math.hypot(bdx - bx, bdy - by)
+        drops = math.hypot(bdx - adx, bdy - ady)
+        best = None
+        # A first: A rides between + drop_a, B rides drop_a + drops.
+        if between + drop_a <= limit * a_direct + 1e-9 and drop_a + drops <= limit * b_direct + 1e-9:
+            best = (between + drop_a + drops, [(adx, ady), (bdx, bdy)])
+        # B first: B rides straight there, A rides the whole way.
+        total = between + drop_b + drops
+        if total <= limit * a_direct + 1e-9 and (best is None or total < best[0]):
+            best = (total, [(bdx, bdy), (adx, ady)])
+        if best is None:
+            return None
+        return [(ax, ay), (bx, by), *best[1]], best[0]
+
+
+def _trip(ride: Ride) -> tuple[float, float, float, float, float]:
+    ox, oy = ride._to_coords(ride.from_place)
+    dx, dy = ride._to_coords(ride.to)
+    return ox, oy, dx, dy, math.hypot(dx - ox, dy - oy)
@@ -1,42 +1,141 @@
 from __future__ import annotations
 
 from abc import ABC, abstractmethod
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Sequence
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 if TYPE_CHECKING:
-    from Rides import Ride
+    from Rides import Ride, RideRecord
+    from Surge import SurgeEngine
+
+    PricedRide = Ride | RideRecord
 
 
 class Cost(ABC):
     @abstractmethod
     def cost(self, ride: Ride) -> float: ...
 
+    def cost_batch(self, rides: Sequence[PricedRide]) -> list[float]:
+        return [self.cost(ride) for ride in rides]
+
+
+class ScaledCost(Cost):
+    """A strategy whose fare is a fixed function of the ride's base cost."""
+
+    @abstractmethod
+    def from_base(self, base_cost):
+        """Works on a float or, elementwise, on a NumPy array of base costs."""
 
-class NormalCost(Cost):
     def cost(self, ride: Ride) -> float:
-        return ride.base_cost()
+        return self.from_base(ride.base_cost())
+
+    def cost_batch(self, rides: Sequence[PricedRide]) -> list[float]:
+        return self.cost_array(
+            [ride.distance() for ride in rides], [ride.fare_per_km() for ride in rides]
+        )
+
+    def cost_array(self, distances: Sequence[float], rates: Sequence[float] | float) -> list[float]:
+        if np is not None:
+            return self.from_base(np.asarray(distances, dtype=float) * np.asarray(rates, dtype=float)).tolist()
+        if isinstance(rates, (int, float)):
+            return [self.from_base(distance * rates) for distance in distances]
+        return [self.from_base(distance * rate) for distance, rate in zip(distances, rates)]
 
 
-class SurgeCost(Cost):
-    def __init__(self, multiplier: float = 1.5):
+class NormalCost(ScaledCost):
+    def from_base(self, base_cost):
+        return base_cost
+
+
+class SurgeCost(ScaledCost):
+    """
+    A fixed ``multiplier``, or with an ``engine`` the current multiplier of
+    the ride's pickup cell. ``from_base`` and ``cost_array`` know nothing
+    about location and always use the fixed multiplier.
+    """
+
+    def __init__(self, multiplier: float = 1.5, engine: SurgeEngine | None = None):
         self.multiplier = multiplier
+        self.engine = engine
+
+    def from_base(self, base_cost):
+        return base_cost * self.multiplier
 
     def cost(self, ride: Ride) -> float:
-        return ride.base_cost() * self.multiplier
+        if self.engine is None:
+            return self.from_base(ride.base_cost())
+        return ride.base_cost() * self.engine.multiplier_for(ride)
 
+    def cost_batch(self, rides: Sequence[PricedRide]) -> list[float]:
+        if self.engine is None:
+            return super().cost_batch(rides)
+        multiplier_for = self.engine.multiplier_for
+        return [ride.base_cost() * multiplier_for(ride) for ride in rides]
 
-class SharingCost(Cost):
+
+class SharingCost(ScaledCost):
 
     def __init__(self, num_share: int):
         self.num_share = max(1, num_share)
 
-    def cost(self, ride: Ride) -> float:
-        return ride.base_cost() / self.num_share
+    def from_base(self, base_cost):
+        return base_cost / self.num_share
 
 
-class LuxCost(Cost):
+class LuxCost(ScaledCost):
     def __init__(self, multiplier: float = 2.0):
         self.multiplier = multiplier
 
-    def cost(self, ride: Ride) -> float:
-        return ride.base_cost() * self.multiplier
+    def from_base(self, base_cost):
+        return base_cost * self.multiplier
+
+
+def price_rides(rides: Sequence[PricedRide]) -> list[float]:
+    """Price a mix of rides and strategies at once; fares come back in input order."""
+    groups: dict[int, tuple[Cost, list[int]]] = {}
+    for position, ride in enumerate(rides):
+        group = groups.get(id(ride.pricing))
+        if group is None:
+            group = groups[id(ride.pricing)] = (ride.pricing, [])
+        group[1].append(position)
+
+    fares = [0.0] * len(rides)
+    for strategy, positions in groups.values():
+        batch = strategy.cost_batch([rides[position] for position in positions])
+        for position, fare in zip(positions, batch):
+            fares[position] = fare
+    return fares
+
+
+def price_columns(
+    distances: Sequence[float],
+    rates: Sequence[float],
+    strategy_codes: Sequence[int],
+    strategies: Sequence[ScaledCost],
+) -> Sequence[float]:
+    """
+    Price rides stored column-wise, e.g. a night's worth of billing records.
+
+    ``strategy_codes[i]`` indexes into ``strategies``. Every strategy must be a
+    ScaledCost, since its fare is computed from distance and rate alone. Fares
+    come back as a NumPy array when NumPy is installed, otherwise as a list.
+    """
+    if np is None:
+        return [
+            strategies[code].from_base(distance * rate)
+            for distance, rate, code in zip(distances, rates, strategy_codes)
+        ]
+
+    distances = np.asarray(distances, dtype=float)
+    rates = np.asarray(rates, dtype=float)
+    codes = np.asarray(strategy_codes)
+    base_costs = distances * rates
+    fares = np.empty_like(base_costs)
+    for code in np.unique(codes):
+        mask = codes == code
+        fares[mask] = strategies[int(code)].from_base(base_costs[mask])
+    return fares
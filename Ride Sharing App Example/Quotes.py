@@ -0,0 +1,224 @@
+"""
+Cached fare quotes.
+
+Riders ask for the same trip several times before they book. QuoteService
+answers those quotes in place of Ride.calculate_cost. It keeps two caches:
+
+- trip distance per (pickup, drop-off, distance provider), with both points
+  snapped to a ``precision`` grid so that repeat requests for one trip share
+  an entry. Rides with a distance provider (see Roads) are measured by it,
+  as their fares are
+- fare per (distance bucket, vehicle type, fare per km, pricing strategy),
+  plus the pickup's surge cell when the strategy is a SurgeCost backed by
+  the service's SurgeEngine
+
+Both are LRU caches holding at most ``max_entries`` entries, each of which
+expires ``ttl`` seconds after it was stored. A fare is computed from the
+distance rounded to the nearest ``distance_step``, so a quote can differ
+from calculate_cost by up to half a step times the rate.
+
+Cached fares go stale when prices change. With ``surge=engine`` the fares for
+a cell are dropped as soon as that cell's counts change; between changes a
+surge fare may lag the smoothed multiplier by up to ``ttl``. After changing a
+strategy's multiplier call ``invalidate_strategy``; after changing a vehicle
+class's fare call ``invalidate_vehicle``. Fares from strategies that are not
+ScaledCosts, or from a SurgeCost on some other engine, are never cached.
+"""
+
+from __future__ import annotations
+
+import math
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Callable, Hashable
+
+from Pricing import ScaledCost
+from Rides import Ride
+
+if TYPE_CHECKING:
+    from Pricing import Cost
+    from Rides import RideRecord
+    from Surge import Cell, SurgeEngine
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    # Dropped to stay within max_entries.
+    evictions: int = 0
+    expirations: int = 0
+    invalidations: int = 0
+
+
+class LRUCache:
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl: float | None = None,
+        clock: Callable[[], float] = time.monotonic,
+        on_drop: Callable[[Hashable], None] | None = None,
+    ):
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        self.max_entries = max_entries
+        self.ttl = math.inf if ttl is None else ttl
+        self.clock = clock
+        # Called with the key of every entry that leaves other than by clear().
+        self.on_drop = on_drop
+        self.stats = CacheStats()
+        # key -> (value, expiry time), least recently used first.
+        self._entries: OrderedDict[Hashable, tuple[object, float]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable):
+        """The cached value, or None on a miss; values must not be None."""
+        entries = self._entries
+        entry = entries.get(key)
+        if entry is not None:
+            if entry[1] > self.clock():
+                entries.move_to_end(key)
+                self.stats.hits += 1
+                return entry[0]
+            self._drop(key)
+            self.stats.expirations += 1
+        self.stats.misses += 1
+        return None
+
+    def put(self, key: Hashable, value) -> None:
+        entries = self._entries
+        if key in entries:
+            entries.move_to_end(key)
+        entries[key] = (value, self.clock() + self.ttl)
+        while len(entries) > self.max_entries:
+            self._drop(next(iter(entries)))
+            self.stats.evictions += 1
+
+    def discard(self, key: Hashable) -> bool:
+        if key not in self._entries:
+            return False
+        self._drop(key)
+        self.stats.invalidations += 1
+        return True
+
+    def discard_where(self, predicate: Callable[[Hashable], bool]) -> int:
+        doomed = [key for key in self._entries if predicate(key)]
+        for key in doomed:
+            self._drop(key)
+        self.stats.invalidations += len(doomed)
+        return len(doomed)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def _drop(self, key: Hashable) -> None:
+        del self._entries[key]
+        if self.on_drop is not None:
+            self.on_drop(key)
+
+
+class QuoteService:
+
+    def __init__(
+        self,
+        surge: SurgeEngine | None = None,
+        precision: float = 0.001,
+        distance_step: float = 0.01,
+        max_entries: int = 100_000,
+        ttl: float | None = 60.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if precision <= 0 or distance_step <= 0:
+            raise ValueError("precision and distance_step must be positive")
+        self.precision = precision
+        self.distance_step = distance_step
+        self.distances = LRUCache(max_entries, ttl, clock)
+        self.fares = LRUCache(max_entries, ttl, clock, on_drop=self._fare_dropped)
+        # Fare keys that depend on each surge cell, for invalidation.
+        self._surge_keys: dict[Cell, set[tuple]] = {}
+        self.surge = surge
+        if surge is not None:
+            surge.add_listener(self)
+
+    def close(self) -> None:
+        """Stop listening to the surge engine."""
+        if self.surge is not None:
+            self.surge.remove_listener(self)
+
+    def quote(self, ride: Ride | RideRecord) -> float:
+        pricing = ride.pricing
+        engine = getattr(pricing, "engine", None)
+        if not isinstance(pricing, ScaledCost) or (engine is not None and engine is not self.surge):
+            return ride.calculate_cost()
+
+        bucket, cell = self._trip(ride)
+        if engine is None:
+            cell = None
+        driver = getattr(ride, "driver", None)
+        vehicle = type(driver.vehicle) if driver is not None else None
+        rate = ride.fare_per_km()
+        key = (bucket, vehicle, rate, pricing, cell)
+        fare = self.fares.get(key)
+        if fare is None:
+            base = bucket * self.distance_step * rate
+            fare = base * engine.cell_multiplier(cell) if engine is not None else pricing.from_base(base)
+            self.fares.put(key, fare)
+            if cell is not None:
+                self._surge_keys.setdefault(cell, set()).add(key)
+        return fare
+
+    def quote_many(self, rides: list[Ride | RideRecord]) -> list[float]:
+        return [self.quote(ride) for ride in rides]
+
+    def surge_changed(self, cell: Cell) -> None:
+        for key in self._surge_keys.pop(cell, ()):
+            self.fares.discard(key)
+
+    def invalidate_strategy(self, pricing: Cost) -> int:
+        """Drop every fare priced by ``pricing``; returns how many."""
+        return self.fares.discard_where(lambda key: key[3] is pricing)
+
+    def invalidate_vehicle(self, vehicle_type: type) -> int:
+        """Drop every fare for ``vehicle_type`` and its subclasses; returns how many."""
+        return self.fares.discard_where(lambda key: key[1] is not None and issubclass(key[1], vehicle_type))
+
+    def clear(self) -> None:
+        self.distances.clear()
+        self.fares.clear()
+        self._surge_keys.clear()
+
+    def _trip(self, ride: Ride | RideRecord) -> tuple[int, Cell | None]:
+        """The ride's distance bucket and pickup surge cell."""
+        from_place = getattr(ride, "from_place", None)
+        if from_place is None:
+            origin, destination = (ride.from_x, ride.from_y), (ride.to_x, ride.to_y)
+        else:
+            origin, destination = Ride._to_coords(from_place), Ride._to_coords(ride.to)
+        provider = ride.distance_provider
+        precision = self.precision
+        key = (
+            round(origin[0] / precision), round(origin[1] / precision),
+            round(destination[0] / precision), round(destination[1] / precision),
+            provider,
+        )
+        trip = self.distances.get(key)
+        if trip is None:
+            distance = math.dist(origin, destination) if provider is None else ride.distance()
+            bucket = round(distance / self.distance_step)
+            trip = (bucket, self.surge.cell_of(origin) if self.surge is not None else None)
+            self.distances.put(key, trip)
+        return trip
+
+    def _fare_dropped(self, key: tuple) -> None:
+        cell = key[4]
+        if cell is None:
+            return
+        keys = self._surge_keys.get(cell)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._surge_keys[cell]
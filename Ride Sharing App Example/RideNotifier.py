@@ -1,11 +1,177 @@
 from __future__ import annotations
 
+import asyncio
+import copy
+import inspect
+import logging
 from abc import ABC, abstractmethod
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
     from Rides import Ride
 
+logger = logging.getLogger(__name__)
+
+
 class RideObserver(ABC):
     @abstractmethod
     def observe_ride(self, ride: Ride) -> None: ...
+
+
+class AsyncNotificationDispatcher:
+    """
+    Delivers ride notifications from asyncio tasks instead of inline.
+
+    Every observer gets its own bounded queue and worker task, so a slow
+    observer only backs up its own queue. ``publish`` never blocks: when an
+    observer's queue is full the oldest (or, with ``overflow="drop_newest"``,
+    the incoming) notification for that observer is dropped and counted in
+    ``dropped``. Async producers that would rather wait for room can use
+    ``publish_wait``. Observers receive a shallow copy of the ride taken at
+    publish time, so they see the status the event was raised with.
+
+    A worker stops once its queue is empty and either the last notification
+    it delivered was for a completed ride or it has waited ``idle_timeout``
+    seconds for another one; the observer's next notification starts a new
+    worker. Riders come and go, so without this the dispatcher would keep a
+    queue and a task for every observer it had ever seen.
+    """
+
+    def __init__(
+        self,
+        queue_size: int = 1000,
+        overflow: str = "drop_oldest",
+        offload_sync_observers: bool = False,
+        idle_timeout: float | None = 60.0,
+        loop: asyncio.AbstractEventLoop | None = None,
+    ):
+        if queue_size < 1:
+            raise ValueError("queue_size must be at least 1")
+        if overflow not in ("drop_oldest", "drop_newest"):
+            raise ValueError("overflow must be 'drop_oldest' or 'drop_newest'")
+        if idle_timeout is not None and idle_timeout <= 0:
+            raise ValueError("idle_timeout must be positive or None")
+        self.queue_size = queue_size
+        self.overflow = overflow
+        self.offload_sync_observers = offload_sync_observers
+        self.idle_timeout = idle_timeout
+        self.dropped = 0
+        self.delivered = 0
+        self.failed = 0
+        self._loop = loop
+        self._queues: dict[RideObserver, asyncio.Queue] = {}
+        self._workers: dict[RideObserver, asyncio.Task] = {}
+        self._closed = False
+
+    def publish(self, ride: Ride, observers: list[RideObserver]) -> None:
+        if self._closed:
+            raise RuntimeError("dispatcher is closed")
+        loop = self._bind_loop()
+        snapshot = copy.copy(ride)
+        if self._in_loop_thread(loop):
+            self._enqueue(snapshot, observers)
+        else:
+            loop.call_soon_threadsafe(self._enqueue, snapshot, observers)
+
+    async def publish_wait(self, ride: Ride, observers: list[RideObserver]) -> None:
+        if self._closed:
+            raise RuntimeError("dispatcher is closed")
+        self._bind_loop()
+        snapshot = copy.copy(ride)
+        for observer in observers:
+            await self._queue_for(observer).put(snapshot)
+
+    async def drain(self) -> None:
+        """Wait until every notification published so far has been delivered."""
+        while True:
+            queues = set(self._queues.values())
+            await asyncio.gather(*(queue.join() for queue in queues))
+            # Deliveries can publish follow-up notifications, to new observers
+            # or to observers whose worker has stopped in the meantime.
+            if all(queue in queues and queue.empty() for queue in self._queues.values()):
+                return
+
+    async def aclose(self) -> None:
+        """Deliver what is queued, then stop the worker tasks."""
+        self._closed = True
+        await self.drain()
+        for worker in self._workers.values():
+            worker.cancel()
+        await asyncio.gather(*self._workers.values(), return_exceptions=True)
+        self._workers.clear()
+        self._queues.clear()
+
+    def pending(self) -> int:
+        return sum(queue.qsize() for queue in self._queues.values())
+
+    def workers(self) -> int:
+        return len(self._workers)
+
+    def _bind_loop(self) -> asyncio.AbstractEventLoop:
+        if self._loop is None:
+            try:
+                self._loop = asyncio.get_running_loop()
+            except RuntimeError:
+                raise RuntimeError(
+                    "AsyncNotificationDispatcher needs a running event loop; "
+                    "publish from inside one or pass loop=..."
+                ) from None
+        return self._loop
+
+    @staticmethod
+    def _in_loop_thread(loop: asyncio.AbstractEventLoop) -> bool:
+        try:
+            return asyncio.get_running_loop() is loop
+        except RuntimeError:
+            return False
+
+    def _enqueue(self, snapshot: Ride, observers: list[RideObserver]) -> None:
+        for observer in observers:
+            queue = self._queue_for(observer)
+            if queue.full():
+                self.dropped += 1
+                if self.overflow == "drop_newest":
+                    continue
+                queue.get_nowait()
+                queue.task_done()
+            queue.put_nowait(snapshot)
+
+    def _queue_for(self, observer: RideObserver) -> asyncio.Queue:
+        queue = self._queues.get(observer)
+        if queue is None:
+            queue = self._queues[observer] = asyncio.Queue(self.queue_size)
+            self._workers[observer] = self._bind_loop().create_task(self._deliver(observer, queue))
+        return queue
+
+    async def _deliver(self, observer: RideObserver, queue: asyncio.Queue) -> None:
+        while True:
+            try:
+                snapshot = await asyncio.wait_for(queue.get(), self.idle_timeout)
+            except asyncio.TimeoutError:
+                # Not the builtin TimeoutError before Python 3.11.
+                if queue.empty():
+                    break
+                continue
+            try:
+                if self.offload_sync_observers:
+                    result = await asyncio.get_running_loop().run_in_executor(
+                        None, observer.observe_ride, snapshot
+                    )
+                else:
+                    result = observer.observe_ride(snapshot)
+                if inspect.isawaitable(result):
+                    await result
+                self.delivered += 1
+            except Exception:
+                self.failed += 1
+                logger.exception("Observer %r failed to handle ride update", observer)
+            finally:
+                queue.task_done()
+            # RideStatus.COMPLETED; Rides imports this module, not the other way round.
+            if snapshot.status == "completed" and queue.empty():
+                break
+        # Nothing can be queued between the empty check and this: both run
+        # on the loop without awaiting.
+        if self._queues.get(observer) is queue:
+            del self._queues[observer]
+            del self._workers[observer]
@@ -1,15 +1,57 @@
 from __future__ import annotations
 
 import math
+import re
+from itertools import count
 from dataclasses import dataclass, field
 from enum import Enum
 from typing import TYPE_CHECKING
 
 from Pricing import Cost, NormalCost
-from RideNotifier import RideObserver
+from RideNotifier import AsyncNotificationDispatcher, RideObserver
 
 if TYPE_CHECKING:
     from People import Driver, Rider
+    from Pooling import Pool
+    from Roads import DistanceProvider
+
+
+_ride_ids = count(1)
+
+
+def reserve_ride_ids(last_id: int) -> None:
+    """Number new rides after ``last_id``, e.g. once old rides are restored."""
+    global _ride_ids
+    _ride_ids = count(max(next(_ride_ids), last_id + 1))
+
+
+_CLOCK_TIME = re.compile(r"(\d{1,2})(?::(\d{2}))?(?::(\d{2}))?\s*(?:([ap])\.?m\.?)?", re.IGNORECASE)
+
+
+def parse_request_time(value: str | float) -> float:
+    """
+    Seconds since midnight from a request time such as "10 pm", "10:30 pm",
+    "22:15" or "22:15:30". A plain number, or a string holding one, is taken
+    to be seconds already.
+    """
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    match = _CLOCK_TIME.fullmatch(value.strip())
+    if match is None:
+        raise ValueError(f"unrecognised request time {value!r}")
+    hours, minutes, seconds, half = match.groups()
+    hours, minutes, seconds = int(hours), int(minutes or 0), int(seconds or 0)
+    if half is not None:
+        if not 1 <= hours <= 12:
+            raise ValueError(f"unrecognised request time {value!r}")
+        hours = hours % 12 + (12 if half.lower() == "p" else 0)
+    if hours > 23 or minutes > 59 or seconds > 59:
+        raise ValueError(f"unrecognised request time {value!r}")
+    return float(hours * 3600 + minutes * 60 + seconds)
 
 
 class RideStatus(str, Enum):
@@ -30,7 +72,27 @@ class Ride:
     driver: Driver | None = None
     base_rate: float = 10.0
     pricing: Cost = field(default_factory=NormalCost)
+    dispatcher: AsyncNotificationDispatcher | None = field(default=None, repr=False, compare=False)
+    # Measures the trip; straight-line when None.
+    distance_provider: DistanceProvider | None = field(default=None, repr=False, compare=False)
+    # The pooled ride this is part of (see Pooling); its driver is freed by
+    # the last of the pool's rides to complete.
+    pool: Pool | None = field(default=None, repr=False, compare=False)
+    ride_id: int = field(default_factory=lambda: next(_ride_ids), init=False, compare=False)
     _observers: list[RideObserver] = field(default_factory=list, init=False, repr=False)
+    _distance: float | None = field(default=None, init=False, repr=False, compare=False)
+    _base_cost: float | None = field(default=None, init=False, repr=False, compare=False)
+
+    # Assigning any of these drops the memoized distance and/or base cost.
+    _DISTANCE_FIELDS = frozenset({"from_place", "to", "distance_provider"})
+    _COST_FIELDS = frozenset({"from_place", "to", "distance_provider", "driver", "base_rate", "pricing"})
+
+    def __setattr__(self, name: str, value) -> None:
+        object.__setattr__(self, name, value)
+        if name in self._COST_FIELDS:
+            object.__setattr__(self, "_base_cost", None)
+            if name in self._DISTANCE_FIELDS:
+                object.__setattr__(self, "_distance", None)
 
     def __post_init__(self) -> None:
         self.add_observer(self.rider)
@@ -47,7 +109,7 @@ class Ride:
 
     def assign_driver(self, driver: Driver, accept_time: str | None = None) -> None:
         self.driver = driver
-        self.driver.is_available = False
+        self.driver.set_available(False)
         self.accept_time = accept_time
         self.add_observer(driver)
         self._notify_observers()
@@ -58,8 +120,8 @@ class Ride:
 
     def complete_ride(self) -> None:
         self.status = RideStatus.COMPLETED
-        if self.driver is not None:
-            self.driver.is_available = True
+        if self.driver is not None and (self.pool is None or self.pool.drop_off(self)):
+            self.driver.set_available(True)
         self._notify_observers()
 
     def print_status(self) -> None:
@@ -70,27 +132,49 @@ class Ride:
         )
 
     def distance(self) -> float:
-        from_x, from_y = self._to_coords(self.from_place)
-        to_x, to_y = self._to_coords(self.to)
-        return math.dist((from_x, from_y), (to_x, to_y))
+        if self._distance is None:
+            origin, destination = self._to_coords(self.from_place), self._to_coords(self.to)
+            if self.distance_provider is None:
+                self._distance = math.dist(origin, destination)
+            else:
+                self._distance = self.distance_provider.distance(origin, destination)
+        return self._distance
 
     def base_cost(self) -> float:
+        # Cached per driver; swapping a driver's vehicle in place is not tracked.
+        if self._base_cost is None:
+            self._base_cost = self.distance() * self.fare_per_km()
+        return self._base_cost
+
+    def fare_per_km(self) -> float:
         if self.driver is not None:
-            return self.distance() * self.driver.vehicle.fare_per_km()
-        return self.distance() * self.base_rate
+            return self.driver.vehicle.fare_per_km()
+        return self.base_rate
 
     def calculate_cost(self) -> float:
         return self.pricing.cost(self)
 
+    def request_seconds(self) -> float:
+        return parse_request_time(self.request_time)
+
     def print_fare(self) -> None:
-        rate = self.driver.vehicle.fare_per_km() if self.driver is not None else self.base_rate
         print(
             f"Ride {self.from_place}->{self.to} fare "
-            f"(rate_per_km={rate}, strategy={self.pricing.__class__.__name__}): "
+            f"(rate_per_km={self.fare_per_km()}, strategy={self.pricing.__class__.__name__}): "
             f"{self.calculate_cost():.2f}"
         )
 
+    def to_record(self) -> RideRecord:
+        from_x, from_y = self._to_coords(self.from_place)
+        to_x, to_y = self._to_coords(self.to)
+        return RideRecord(
+            from_x, from_y, to_x, to_y, self.fare_per_km(), self.pricing, self.distance_provider, self.distance()
+        )
+
     def _notify_observers(self) -> None:
+        if self.dispatcher is not None:
+            self.dispatcher.publish(self, list(self._observers))
+            return
         for observer in list(self._observers):
             observer.observe_ride(self)
 
@@ -102,6 +186,56 @@ class Ride:
         return float(x), float(y)
 
 
+class RideRecord:
+    """
+    Minimal, already-parsed ride for bulk fare computation.
+
+    Has the same distance/base_cost/calculate_cost surface that the Cost
+    strategies use, without observers, status or string endpoints. Like a
+    Ride, it measures the trip with ``distance_provider`` when one is given;
+    ``distance`` skips measuring when the length is already known.
+    """
+
+    __slots__ = ("from_x", "from_y", "to_x", "to_y", "rate", "pricing", "distance_provider", "_distance")
+
+    def __init__(
+        self,
+        from_x: float,
+        from_y: float,
+        to_x: float,
+        to_y: float,
+        rate: float,
+        pricing: Cost,
+        distance_provider: DistanceProvider | None = None,
+        distance: float | None = None,
+    ):
+        self.from_x = from_x
+        self.from_y = from_y
+        self.to_x = to_x
+        self.to_y = to_y
+        self.rate = rate
+        self.pricing = pricing
+        self.distance_provider = distance_provider
+        if distance is None:
+            if distance_provider is None:
+                distance = math.hypot(to_x - from_x, to_y - from_y)
+            else:
+                distance = distance_provider.distance((from_x, from_y), (to_x, to_y))
+        self._distance = distance
+
+    def distance(self) -> float:
+        return self._distance
+
+    def fare_per_km(self) -> float:
+        return self.rate
+
+    def base_cost(self) -> float:
+        return self._distance * self.rate
+
+    def calculate_cost(self) -> float:
+        return self.pricing.cost(self)
+
+
 class NormalRide(Ride):
     pass
 
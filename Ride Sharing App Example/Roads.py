@@ -0,0 +1,414 @@
+"""
+Road-network distances.
+
+A DistanceProvider measures how far apart two points are. EuclideanDistance
+is the straight line the rest of the example uses. RoadNetwork measures
+along the streets instead, so pickup distances and fares follow the street
+grid and go round rivers to the nearest bridge.
+
+Building a network is an offline step. ``build_road_network`` reads an edge
+list and writes one binary file with everything a query needs:
+
+- the graph in compressed sparse row form (per-node offsets into flat
+  arrays of neighbours and street lengths)
+- shortest distances from a few landmarks to every node, for A* with
+  landmarks (ALT): by the triangle inequality, ``|d(L, t) - d(L, v)|`` is a
+  lower bound on the distance from v to t, which steers the search
+  straight at the target
+- a grid of nodes by cell, for snapping a point to its nearest node
+
+``RoadNetwork(path)`` memory-maps that file and reads its arrays in place,
+so startup costs the same for a village or a continent, and processes
+serving the same map share one copy of it in the page cache.
+
+The edge list is plain text, one record per line; ``#`` starts a comment::
+
+    n <node id> <x> <y>
+    e <node id> <node id> [length]
+
+Streets are two-way. A street's length defaults to the straight line
+between its ends and may never be shorter than that.
+"""
+
+from __future__ import annotations
+
+import heapq
+import math
+import mmap
+import os
+import struct
+import sys
+from abc import ABC, abstractmethod
+from array import array
+from operator import sub
+from typing import Sequence
+
+Point = tuple[float, float]
+
+MAGIC = b"RSMROAD\x01"
+# byte order flag, nodes, arcs (each street once per direction), landmarks,
+# snap grid columns and rows, snap cell size, snap grid origin.
+HEADER = struct.Struct("<BxxxxxxxQQQQQddd")
+
+# File layout after the header: 8-byte arrays first, then 4-byte ones, so
+# every array is aligned for memoryview.cast.
+_ARRAYS = (
+    ("xs", "d"), ("ys", "d"), ("offsets", "q"), ("lengths", "d"),
+    ("landmark_distances", "d"), ("cell_starts", "q"), ("landmarks", "q"),
+    ("neighbours", "i"), ("components", "i"), ("cell_nodes", "i"),
+)
+
+
+class DistanceProvider(ABC):
+
+    @abstractmethod
+    def distance(self, origin: Point, destination: Point) -> float: ...
+
+    def distances_from(self, origin: Point, destinations: Sequence[Point]) -> list[float]:
+        return [self.distance(origin, destination) for destination in destinations]
+
+
+class EuclideanDistance(DistanceProvider):
+
+    def distance(self, origin: Point, destination: Point) -> float:
+        return math.dist(origin, destination)
+
+
+class RoadNetwork(DistanceProvider):
+    """
+    Shortest street distances from a file written by ``build_road_network``.
+
+    A point joins the network at its nearest node; the straight legs from
+    each point to its node are added to the street distance. Points that
+    snap to the same node are measured in a straight line. Points whose
+    nodes are not connected are ``inf`` apart.
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as handle:
+            self._map = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[: len(MAGIC)] != MAGIC:
+            self._map.close()
+            raise ValueError(f"{path} is not a road network")
+        (
+            little_endian, num_nodes, num_arcs, num_landmarks,
+            self.columns, self.rows, self.cell_size, self.min_x, self.min_y,
+        ) = HEADER.unpack_from(self._map, len(MAGIC))
+        if bool(little_endian) != (sys.byteorder == "little"):
+            self._map.close()
+            raise ValueError(f"{path} was built on a machine of the other byte order; rebuild it here")
+        self.num_nodes = num_nodes
+        self.num_landmarks = num_landmarks
+
+        sizes = {
+            "xs": num_nodes, "ys": num_nodes, "offsets": num_nodes + 1, "lengths": num_arcs,
+            "landmark_distances": num_nodes * num_landmarks,
+            "cell_starts": self.columns * self.rows + 1, "landmarks": num_landmarks,
+            "neighbours": num_arcs, "components": num_nodes, "cell_nodes": num_nodes,
+        }
+        view = memoryview(self._map)
+        offset = len(MAGIC) + HEADER.size
+        self._views = [view]
+        for name, typecode in _ARRAYS:
+            size = sizes[name] * struct.calcsize(typecode)
+            array_view = view[offset:offset + size].cast(typecode)
+            self._views.append(array_view)
+            setattr(self, "_" + name, array_view)
+            offset += size
+        if offset != len(self._map):
+            self.close()
+            raise ValueError(f"{path} has {len(self._map) - offset} unexpected trailing bytes")
+
+    def __enter__(self) -> RoadNetwork:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        self._map.close()
+
+    def node_location(self, node: int) -> Point:
+        return self._xs[node], self._ys[node]
+
+    def nearest_node(self, point: Point) -> int:
+        x, y = point
+        xs, ys = self._xs, self._ys
+        cell_starts, cell_nodes = self._cell_starts, self._cell_nodes
+        columns, rows, cell_size = self.columns, self.rows, self.cell_size
+        column = min(max(int((x - self.min_x) // cell_size), 0), columns - 1)
+        row = min(max(int((y - self.min_y) // cell_size), 0), rows - 1)
+        best, best_squared = -1, math.inf
+        ring = 0
+        while True:
+            low_column, high_column = column - ring, column + ring
+            low_row, high_row = row - ring, row + ring
+            for ring_row in range(max(low_row, 0), min(high_row, rows - 1) + 1):
+                on_edge = ring_row in (low_row, high_row)
+                for ring_column in range(max(low_column, 0), min(high_column, columns - 1) + 1):
+                    # Inner cells were searched on earlier rings.
+                    if not on_edge and ring_column not in (low_column, high_column):
+                        continue
+                    cell = ring_row * columns + ring_column
+                    for position in range(cell_starts[cell], cell_starts[cell + 1]):
+                        node = cell_nodes[position]
+                        squared = (xs[node] - x) ** 2 + (ys[node] - y) ** 2
+                        if squared < best_squared or (squared == best_squared and node < best):
+                            best, best_squared = node, squared
+            # Anything unsearched is at least ``gap`` away, past a side of
+            # the searched square that does not lie on the grid's edge.
+            gap = math.inf
+            if low_column > 0:
+                gap = min(gap, x - (self.min_x + low_column * cell_size))
+            if high_column < columns - 1:
+                gap = min(gap, self.min_x + (high_column + 1) * cell_size - x)
+            if low_row > 0:
+                gap = min(gap, y - (self.min_y + low_row * cell_size))
+            if high_row < rows - 1:
+                gap = min(gap, self.min_y + (high_row + 1) * cell_size - y)
+            if gap == math.inf or (best >= 0 and gap > 0 and best_squared <= gap * gap):
+                return best
+            ring += 1
+
+    def distance(self, origin: Point, destination: Point) -> float:
+        source, target = self.nearest_node(origin), self.nearest_node(destination)
+        if source == target:
+            return math.dist(origin, destination)
+        return (
+            math.dist(origin, self.node_location(source))
+            + self.node_distance(source, target)
+            + math.dist(destination, self.node_location(target))
+        )
+
+    def distances_from(self, origin: Point, destinations: Sequence[Point]) -> list[float]:
+        """One search from ``origin`` that stops once every destination's node is reached."""
+        source = self.nearest_node(origin)
+        targets = [self.nearest_node(destination) for destination in destinations]
+        reached = self._search_many(source, set(targets))
+        leg = math.dist(origin, self.node_location(source))
+        return [
+            math.dist(origin, destination) if target == source
+            else leg + reached.get(target, math.inf) + math.dist(destination, self.node_location(target))
+            for destination, target in zip(destinations, targets)
+        ]
+
+    def node_distance(self, source: int, target: int) -> float:
+        """Street distance between two nodes, by A* with landmark lower bounds."""
+        if source == target:
+            return 0.0
+        if self._components[source] != self._components[target]:
+            return math.inf
+        offsets, neighbours, lengths = self._offsets, self._neighbours, self._lengths
+        table, width = self._landmark_distances, self.num_landmarks
+        target_row = table[target * width:target * width + width].tolist()
+
+        best = {source: 0.0}
+        # Lower bounds to the target, worked out once per node reached.
+        bounds: dict[int, float] = {}
+        heap = [(0.0, 0.0, source)]
+        while heap:
+            _, travelled, node = heapq.heappop(heap)
+            if node == target:
+                return travelled
+            if travelled > best[node]:
+                continue
+            for arc in range(offsets[node], offsets[node + 1]):
+                neighbour = neighbours[arc]
+                candidate = travelled + lengths[arc]
+                previous = best.get(neighbour)
+                if previous is None:
+                    start = neighbour * width
+                    bounds[neighbour] = max(map(abs, map(sub, target_row, table[start:start + width])), default=0.0)
+                elif candidate >= previous:
+                    continue
+                best[neighbour] = candidate
+                heapq.heappush(heap, (candidate + bounds[neighbour], candidate, neighbour))
+        return math.inf
+
+    def _search_many(self, source: int, targets: set[int]) -> dict[int, float]:
+        offsets, neighbours, lengths = self._offsets, self._neighbours, self._lengths
+        component = self._components[source]
+        remaining = {target for target in targets if self._components[target] == component}
+        remaining.discard(source)
+        found = {source: 0.0}
+        best = {source: 0.0}
+        heap = [(0.0, source)]
+        while heap and remaining:
+            travelled, node = heapq.heappop(heap)
+            if travelled > best[node]:
+                continue
+            if node in remaining:
+                remaining.discard(node)
+                found[node] = travelled
+            for arc in range(offsets[node], offsets[node + 1]):
+                neighbour = neighbours[arc]
+                candidate = travelled + lengths[arc]
+                if candidate < best.get(neighbour, math.inf):
+                    best[neighbour] = candidate
+                    heapq.heappush(heap, (candidate, neighbour))
+        return found
+
+
+def build_road_network(edge_list_path: str, path: str, landmarks: int = 8, nodes_per_cell: float = 4.0) -> None:
+    """Precompute a RoadNetwork file at ``path`` from an edge list."""
+    xs, ys, streets = _read_edge_list(edge_list_path)
+    num_nodes = len(xs)
+    if not num_nodes:
+        raise ValueError(f"{edge_list_path} has no nodes")
+
+    adjacency: list[list[tuple[int, float]]] = [[] for _ in range(num_nodes)]
+    for a, b, length in streets:
+        adjacency[a].append((b, length))
+        adjacency[b].append((a, length))
+    offsets = array("q", [0])
+    neighbours, lengths = array("i"), array("d")
+    for arcs in adjacency:
+        for neighbour, length in arcs:
+            neighbours.append(neighbour)
+            lengths.append(length)
+        offsets.append(len(neighbours))
+
+    components = _components(adjacency)
+    chosen, landmark_distances = _landmarks(adjacency, landmarks)
+
+    min_x, min_y = min(xs), min(ys)
+    width, height = max(xs) - min_x, max(ys) - min_y
+    # Nodes along one street have next to no area. Sizing cells as if they
+    # filled a strip at least one cell wide keeps the grid at about
+    # num_nodes / nodes_per_cell cells whatever the layout.
+    extent = max(width, height)
+    area = max(width * height, extent * extent * nodes_per_cell / num_nodes)
+    cell_size = math.sqrt(area * nodes_per_cell / num_nodes) or 1.0
+    columns = int(width // cell_size) + 1
+    rows = int(height // cell_size) + 1
+    cells = [int((y - min_y) // cell_size) * columns + int((x - min_x) // cell_size) for x, y in zip(xs, ys)]
+    counts = [0] * (columns * rows + 1)
+    for cell in cells:
+        counts[cell + 1] += 1
+    cell_starts = array("q", [0] * (columns * rows + 1))
+    for cell in range(columns * rows):
+        cell_starts[cell + 1] = cell_starts[cell] + counts[cell + 1]
+    cell_nodes = array("i", [0] * num_nodes)
+    filled = cell_starts[:-1].tolist()
+    for node, cell in enumerate(cells):
+        cell_nodes[filled[cell]] = node
+        filled[cell] += 1
+
+    arrays = {
+        "xs": array("d", xs), "ys": array("d", ys), "offsets": offsets, "lengths": lengths,
+        "landmark_distances": landmark_distances, "cell_starts": cell_starts,
+        "landmarks": array("q", chosen), "neighbours": neighbours,
+        "components": array("i", components), "cell_nodes": cell_nodes,
+    }
+    temporary = path + ".tmp"
+    with open(temporary, "wb") as handle:
+        handle.write(MAGIC)
+        handle.write(HEADER.pack(
+            sys.byteorder == "little", num_nodes, len(neighbours), len(chosen),
+            columns, rows, cell_size, min_x, min_y,
+        ))
+        for name, _ in _ARRAYS:
+            arrays[name].tofile(handle)
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(temporary, path)
+
+
+def _read_edge_list(path: str) -> tuple[list[float], list[float], list[tuple[int, int, float]]]:
+    nodes: dict[str, int] = {}
+    xs, ys = [], []
+    records = []
+    with open(path) as handle:
+        for line_number, line in enumerate(handle, 1):
+            fields = line.split("#", 1)[0].split()
+            if not fields:
+                continue
+            kind = fields[0]
+            if kind == "n" and len(fields) == 4:
+                if fields[1] in nodes:
+                    raise ValueError(f"{path}:{line_number}: node {fields[1]} defined twice")
+                nodes[fields[1]] = len(xs)
+                xs.append(float(fields[2]))
+                ys.append(float(fields[3]))
+            elif kind == "e" and len(fields) in (3, 4):
+                records.append((line_number, fields))
+            else:
+                raise ValueError(f"{path}:{line_number}: expected 'n id x y' or 'e id id [length]'")
+
+    streets = []
+    for line_number, fields in records:
+        try:
+            a, b = nodes[fields[1]], nodes[fields[2]]
+        except KeyError as error:
+            raise ValueError(f"{path}:{line_number}: unknown node {error.args[0]}") from None
+        straight = math.hypot(xs[b] - xs[a], ys[b] - ys[a])
+        length = float(fields[3]) if len(fields) == 4 else straight
+        # Keeps every road distance at least the straight-line one, so
+        # callers can prune with straight-line distance as a lower bound.
+        if length < straight * (1 - 1e-9):
+            raise ValueError(f"{path}:{line_number}: street is shorter than the straight line between its ends")
+        streets.append((a, b, length))
+    return xs, ys, streets
+
+
+def _shortest_distances(adjacency: list[list[tuple[int, float]]], source: int) -> list[float]:
+    distances = [math.inf] * len(adjacency)
+    distances[source] = 0.0
+    heap = [(0.0, source)]
+    while heap:
+        travelled, node = heapq.heappop(heap)
+        if travelled > distances[node]:
+            continue
+        for neighbour, length in adjacency[node]:
+            candidate = travelled + length
+            if candidate < distances[neighbour]:
+                distances[neighbour] = candidate
+                heapq.heappush(heap, (candidate, neighbour))
+    return distances
+
+
+def _components(adjacency: list[list[tuple[int, float]]]) -> list[int]:
+    components = [-1] * len(adjacency)
+    label = 0
+    for start in range(len(adjacency)):
+        if components[start] >= 0:
+            continue
+        components[start] = label
+        stack = [start]
+        while stack:
+            for neighbour, _ in adjacency[stack.pop()]:
+                if components[neighbour] < 0:
+                    components[neighbour] = label
+                    stack.append(neighbour)
+        label += 1
+    return components
+
+
+def _landmarks(adjacency: list[list[tuple[int, float]]], count: int) -> tuple[list[int], array]:
+    """
+    Pick landmarks far apart: each is the node farthest from those chosen so
+    far. Returns them with a node-major table of their distances.
+    """
+    num_nodes = len(adjacency)
+    chosen, tables = [], []
+    # Distance from every node to its nearest landmark; node 0 seeds the
+    # search, and landmarks are only placed in node 0's component.
+    nearest = _shortest_distances(adjacency, 0)
+    for _ in range(min(count, num_nodes)):
+        reachable = [(distance, node) for node, distance in enumerate(nearest) if distance < math.inf]
+        landmark = max(reachable)[1] if reachable else 0
+        if landmark in chosen:
+            break
+        distances = _shortest_distances(adjacency, landmark)
+        chosen.append(landmark)
+        # A landmark says nothing about other components; zero keeps its
+        # bound there at zero.
+        tables.append([distance if distance < math.inf else 0.0 for distance in distances])
+        nearest = [min(a, b) for a, b in zip(nearest, distances)]
+    table = array("d", [0.0]) * (num_nodes * len(chosen))
+    for column, distances in enumerate(tables):
+        table[column::len(chosen)] = array("d", distances)
+    return chosen, table
@@ -0,0 +1,216 @@
+"""
+Matching rounds on a schedule.
+
+MatchScheduler owns the queue of waiting requests in front of a Matcher and
+decides when matching runs: every ``interval`` seconds, or as soon as
+``batch_size`` requests are waiting, whichever comes first. Callers submit
+requests and call ``poll`` from their event loop (or use ``run_for``).
+
+Each request gets a deadline, its parsed ``request_time`` plus ``max_wait``,
+and every round takes the requests closest to their deadline first.
+Deadlines are Unix times that do not wrap at midnight: a request time is a
+time of day, placed on its occurrence nearest to ``clock()``, so "11:50 pm"
+seen just after midnight is last night's. A request without a readable time
+is stamped with ``clock()`` when submitted.
+
+To keep p99 time-to-match under ``target_p99``, a round may take at most
+``round_budget`` seconds: the scheduler tracks how long matching takes per
+request and caps how many requests each round considers, so a backlog is
+worked off over several short rounds instead of one long one. Whatever a
+round leaves unmatched goes back into the queue.
+
+Every round produces a RoundStats; the last ``history`` of them are kept in
+``stats``. The scheduler listens to the Matcher for cancelled requests, so
+``len`` and batch triggers only count requests that are still waiting; call
+``close`` to stop listening. A submitted request that is matched some other
+way, say by calling ``matcher.make_matches()`` directly, is only noticed
+when it surfaces in a round, and is dropped then.
+"""
+
+from __future__ import annotations
+
+import heapq
+import math
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from itertools import count
+from typing import TYPE_CHECKING, Callable, Iterator
+
+from Stats import percentile
+
+if TYPE_CHECKING:
+    from Matcher import Matcher
+    from Rides import Ride
+
+PROBE_ROUND = 64
+
+
+@dataclass
+class RoundStats:
+    round: int
+    # Pending requests when the round started.
+    queue_depth: int
+    # Requests offered to the strategy; fewer than queue_depth when capped.
+    considered: int
+    matched: int
+    unmatched: int
+    # Considered requests that were already past their deadline.
+    overdue: int
+    duration: float
+    round_limit: int | None
+    p50_time_to_match: float
+    p99_time_to_match: float
+
+
+class MatchScheduler:
+
+    def __init__(
+        self,
+        matcher: Matcher,
+        interval: float | None = 1.0,
+        batch_size: int | None = None,
+        max_wait: float = 120.0,
+        target_p99: float = 2.0,
+        round_budget: float | None = None,
+        history: int = 1_000,
+        clock: Callable[[], float] = time.time,
+        timer: Callable[[], float] = time.perf_counter,
+    ):
+        if interval is None and batch_size is None:
+            raise ValueError("need an interval, a batch_size or both")
+        self.matcher = matcher
+        self.interval = interval
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.target_p99 = target_p99
+        # Half the target is left for waiting on the next round.
+        self.round_budget = round_budget if round_budget is not None else target_p99 / 2
+        # ``clock`` gives Unix time, for deadlines; ``timer`` measures
+        # time-to-match and round durations.
+        self.clock = clock
+        self.timer = timer
+        self.stats: deque[RoundStats] = deque(maxlen=history)
+        self._queue: list[tuple[float, int, Ride, float]] = []
+        # Ids of the queued requests still waiting; cancelled ones stay in
+        # _queue until they surface.
+        self._waiting: set[int] = set()
+        self._sequence = count()
+        self._time_to_match: deque[float] = deque(maxlen=history)
+        self._seconds_per_request: float | None = None
+        self._rounds = 0
+        self._last_round = timer()
+        matcher.add_request_listener(self)
+
+    def __len__(self) -> int:
+        return len(self._waiting)
+
+    def close(self) -> None:
+        """Stop listening to the Matcher."""
+        self.matcher.remove_request_listener(self)
+
+    def submit(self, ride: Ride) -> None:
+        now = self.clock()
+        try:
+            requested = nearest_occurrence(ride.request_seconds(), now)
+        except ValueError:
+            requested = now
+        self.matcher.add_ride_request(ride)
+        self._waiting.add(id(ride))
+        heapq.heappush(self._queue, (requested + self.max_wait, next(self._sequence), ride, self.timer()))
+
+    def ride_request_cancelled(self, ride: Ride) -> None:
+        self._waiting.discard(id(ride))
+
+    def round_limit(self) -> int | None:
+        """How many requests the next round may consider; None means no cap."""
+        if math.isinf(self.round_budget):
+            return None
+        if not self._seconds_per_request:
+            # No timings yet: a small first round measures the cost per request.
+            return PROBE_ROUND
+        return max(1, int(self.round_budget / self._seconds_per_request))
+
+    def due(self) -> bool:
+        if not self._waiting:
+            return False
+        if self.batch_size is not None and len(self._waiting) >= self.batch_size:
+            return True
+        return self.interval is not None and self.timer() - self._last_round >= self.interval
+
+    def poll(self) -> RoundStats | None:
+        """Run a round if one is due."""
+        return self.run_round() if self.due() else None
+
+    def run_for(self, seconds: float, sleep: Callable[[float], None] = time.sleep) -> Iterator[RoundStats]:
+        end = self.timer() + seconds
+        while self.timer() < end:
+            stats = self.poll()
+            if stats is not None:
+                yield stats
+            elif self.interval is not None:
+                sleep(max(0.0, min(end, self._last_round + self.interval) - self.timer()))
+            else:
+                sleep(0.001)
+
+    def run_round(self) -> RoundStats:
+        started = self.timer()
+        now = self.clock()
+        matcher = self.matcher
+        queue_depth = matcher.num_ride_requests
+        limit = self.round_limit()
+
+        entries = []
+        while self._queue and (limit is None or len(entries) < limit):
+            entry = heapq.heappop(self._queue)
+            # Requests cancelled or matched elsewhere are dropped as they surface.
+            if matcher.has_ride_request(entry[2]):
+                entries.append(entry)
+            else:
+                self._waiting.discard(id(entry[2]))
+        overdue = sum(1 for deadline, *_ in entries if deadline < now)
+
+        matches = matcher.make_matches([entry[2] for entry in entries]) if entries else []
+        finished = self.timer()
+        matched = {id(ride) for ride, _ in matches}
+        for entry in entries:
+            if id(entry[2]) in matched:
+                self._waiting.discard(id(entry[2]))
+                self._time_to_match.append(finished - entry[3])
+            else:
+                heapq.heappush(self._queue, entry)
+
+        duration = finished - started
+        if entries:
+            per_request = duration / len(entries)
+            previous = self._seconds_per_request
+            self._seconds_per_request = per_request if previous is None else 0.7 * previous + 0.3 * per_request
+        latencies = sorted(self._time_to_match)
+        stats = RoundStats(
+            round=self._rounds,
+            queue_depth=queue_depth,
+            considered=len(entries),
+            matched=len(matches),
+            unmatched=len(entries) - len(matches),
+            overdue=overdue,
+            duration=duration,
+            round_limit=limit,
+            p50_time_to_match=percentile(latencies, 0.50),
+            p99_time_to_match=percentile(latencies, 0.99),
+        )
+        self.stats.append(stats)
+        self._rounds += 1
+        self._last_round = finished
+        return stats
+
+
+def nearest_occurrence(seconds_of_day: float, now: float) -> float:
+    """The Unix time, nearest to ``now``, at which the local clock reads ``seconds_of_day``."""
+    today = datetime.fromtimestamp(now).date()
+    occurrences = (
+        (datetime.combine(today + timedelta(days=offset), datetime.min.time()) + timedelta(seconds=seconds_of_day))
+        .timestamp()
+        for offset in (-1, 0, 1)
+    )
+    return min(occurrences, key=lambda moment: abs(moment - now))
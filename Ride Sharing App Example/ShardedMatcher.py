@@ -0,0 +1,428 @@
+"""
+Region-sharded matching across worker processes.
+
+The map is cut into a grid of regions and every region gets its own Matcher.
+Shards are spread over worker processes, each owning its shards' Matchers
+outright, so matching rounds run in parallel. Workers only ever see ids and
+coordinates; the Ride and Driver objects stay in the parent process, which
+merges the shards' proposals and applies the assignments.
+
+Drivers within ``halo`` of a region's edge are also registered in the
+neighbouring regions, so a rider near a border can still be offered a driver
+across it. When two shards propose the same driver, the earlier request wins
+and the other one is retried in a follow-up pass against the drivers that are
+left. Away from borders the result is exactly the single-Matcher greedy
+result; within ``halo`` of a border it is a close approximation.
+"""
+
+from __future__ import annotations
+
+import multiprocessing
+from dataclasses import dataclass
+from itertools import count
+from typing import TYPE_CHECKING, Callable
+
+from Matcher import Matcher
+from Matching import GreedyMatching
+
+if TYPE_CHECKING:
+    from Matching import MatchingStrategy
+    from People import Driver
+    from Rides import Ride
+    from SpatialIndex import SpatialIndex
+
+
+@dataclass(frozen=True)
+class RegionGrid:
+    min_x: float
+    min_y: float
+    max_x: float
+    max_y: float
+    columns: int
+    rows: int
+
+    def __post_init__(self) -> None:
+        if self.columns < 1 or self.rows < 1:
+            raise ValueError("a region grid needs at least one row and one column")
+        if self.max_x <= self.min_x or self.max_y <= self.min_y:
+            raise ValueError("region grid bounds are empty")
+
+    @property
+    def size(self) -> int:
+        return self.columns * self.rows
+
+    def region_of(self, point: tuple[float, float]) -> int:
+        column = self._clamp(int((point[0] - self.min_x) / self._width()), self.columns)
+        row = self._clamp(int((point[1] - self.min_y) / self._height()), self.rows)
+        return row * self.columns + column
+
+    def regions_near(self, point: tuple[float, float], margin: float) -> set[int]:
+        """The point's own region plus every region within ``margin`` of it."""
+        x, y = point
+        low_column = self._clamp(int((x - margin - self.min_x) / self._width()), self.columns)
+        high_column = self._clamp(int((x + margin - self.min_x) / self._width()), self.columns)
+        low_row = self._clamp(int((y - margin - self.min_y) / self._height()), self.rows)
+        high_row = self._clamp(int((y + margin - self.min_y) / self._height()), self.rows)
+        return {
+            row * self.columns + column
+            for row in range(low_row, high_row + 1)
+            for column in range(low_column, high_column + 1)
+        }
+
+    def _width(self) -> float:
+        return (self.max_x - self.min_x) / self.columns
+
+    def _height(self) -> float:
+        return (self.max_y - self.min_y) / self.rows
+
+    @staticmethod
+    def _clamp(value: int, limit: int) -> int:
+        # Points outside the bounds belong to the nearest edge region.
+        return min(max(value, 0), limit - 1)
+
+
+class _ShardDriver:
+    __slots__ = ("key", "location", "is_available")
+
+    def __init__(self, key: int, location: tuple[float, float], is_available: bool):
+        self.key = key
+        self.location = location
+        self.is_available = is_available
+
+    # The host tells its Matcher about availability changes itself.
+    def add_availability_listener(self, listener) -> None:
+        pass
+
+    def remove_availability_listener(self, listener) -> None:
+        pass
+
+
+class _ShardRider:
+    __slots__ = ("location",)
+
+    def __init__(self, location: tuple[float, float]):
+        self.location = location
+
+
+class _ShardRide:
+    __slots__ = ("key", "rider")
+
+    def __init__(self, key: int, location: tuple[float, float]):
+        self.key = key
+        self.rider = _ShardRider(location)
+
+
+class _ShardHost:
+    """Owns the Matchers for a set of shards and applies commands to them."""
+
+    def __init__(
+        self,
+        strategy_factory: Callable[[], MatchingStrategy],
+        index_factory: Callable[[], SpatialIndex] | None,
+    ):
+        self.strategy_factory = strategy_factory
+        self.index_factory = index_factory
+        self.matchers: dict[int, Matcher] = {}
+        self.drivers: dict[int, dict[int, _ShardDriver]] = {}
+        self.rides: dict[int, dict[int, _ShardRide]] = {}
+
+    def apply(self, commands: list[tuple]) -> None:
+        for command in commands:
+            getattr(self, command[0])(*command[1:])
+
+    def add_driver(self, shard: int, key: int, location: tuple[float, float], is_available: bool) -> None:
+        driver = _ShardDriver(key, location, is_available)
+        matcher = self._matcher(shard)
+        self.drivers[shard][key] = driver
+        matcher.add_driver(driver)
+
+    def remove_driver(self, shard: int, key: int) -> None:
+        driver = self.drivers[shard].pop(key, None)
+        if driver is not None:
+            self.matchers[shard].remove_driver(driver)
+
+    def move_driver(self, shard: int, key: int, location: tuple[float, float]) -> None:
+        self.matchers[shard].move_driver(self.drivers[shard][key], location)
+
+    def set_available(self, shard: int, key: int, is_available: bool) -> None:
+        driver = self.drivers[shard][key]
+        driver.is_available = is_available
+        self.matchers[shard].driver_availability_changed(driver)
+
+    def add_ride(self, shard: int, key: int, location: tuple[float, float]) -> None:
+        ride = _ShardRide(key, location)
+        matcher = self._matcher(shard)
+        self.rides[shard][key] = ride
+        matcher.add_ride_request(ride)
+
+    def remove_ride(self, shard: int, key: int) -> None:
+        ride = self.rides[shard].pop(key, None)
+        if ride is not None:
+            self.matchers[shard].remove_ride_request(ride)
+
+    def propose(self) -> list[tuple[int, int]]:
+        return [
+            (ride.key, driver.key)
+            for matcher in self.matchers.values()
+            for ride, driver in matcher.propose_matches()
+        ]
+
+    def commit(self, shard_rides: dict[int, list[int]], claimed: dict[int, list[int]]) -> None:
+        for shard, keys in shard_rides.items():
+            rides = self.rides[shard]
+            matcher = self.matchers[shard]
+            for key in keys:
+                matcher.remove_ride_request(rides.pop(key))
+        for shard, keys in claimed.items():
+            drivers = self.drivers[shard]
+            matcher = self.matchers[shard]
+            for key in keys:
+                drivers[key].is_available = False
+                matcher.driver_availability_changed(drivers[key])
+
+    def _matcher(self, shard: int) -> Matcher:
+        matcher = self.matchers.get(shard)
+        if matcher is None:
+            index = self.index_factory() if self.index_factory is not None else None
+            matcher = self.matchers[shard] = Matcher(index=index, strategy=self.strategy_factory())
+            self.drivers[shard] = {}
+            self.rides[shard] = {}
+        return matcher
+
+
+def _worker_main(connection, strategy_factory, index_factory) -> None:
+    host = _ShardHost(strategy_factory, index_factory)
+    while True:
+        message = connection.recv()
+        kind = message[0]
+        if kind == "stop":
+            connection.close()
+            return
+        host.apply(message[1])
+        if kind == "propose":
+            connection.send(host.propose())
+        elif kind == "commit":
+            host.commit(*message[2:])
+            connection.send(None)
+
+
+class ShardedMatcher:
+    """
+    Matcher facade that routes drivers and ride requests to region shards.
+
+    ``workers=0`` keeps every shard in this process, which is handy for tests
+    and single-core machines. Use it as a context manager, or call ``close``,
+    to stop the worker processes.
+    """
+
+    def __init__(
+        self,
+        regions: RegionGrid,
+        workers: int = 2,
+        halo: float = 0.0,
+        strategy_factory: Callable[[], MatchingStrategy] = GreedyMatching,
+        index_factory: Callable[[], SpatialIndex] | None = None,
+        max_passes: int = 3,
+    ):
+        self.regions = regions
+        self.halo = halo
+        self.max_passes = max_passes
+        self._driver_keys: dict[Driver, int] = {}
+        self._drivers: dict[int, Driver] = {}
+        self._driver_shards: dict[int, set[int]] = {}
+        self._rides: dict[int, Ride] = {}
+        self._ride_keys: dict[int, int] = {}
+        self._ride_shards: dict[int, int] = {}
+        # Keys of drivers the shards already hold as unavailable.
+        self._busy: set[int] = set()
+        self._sequence = count()
+
+        if workers <= 0:
+            self._local: _ShardHost | None = _ShardHost(strategy_factory, index_factory)
+            self._connections = []
+            self._processes = []
+            self._outbox: list[list[tuple]] = [[]]
+            return
+
+        self._local = None
+        self._connections = []
+        self._processes = []
+        for _ in range(workers):
+            parent, child = multiprocessing.Pipe()
+            process = multiprocessing.Process(
+                target=_worker_main, args=(child, strategy_factory, index_factory), daemon=True
+            )
+            process.start()
+            child.close()
+            self._connections.append(parent)
+            self._processes.append(process)
+        self._outbox = [[] for _ in range(workers)]
+
+    def __enter__(self) -> ShardedMatcher:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        for connection in self._connections:
+            connection.send(("stop",))
+            connection.close()
+        for process in self._processes:
+            process.join()
+        self._connections = []
+        self._processes = []
+
+    @property
+    def ride_requests(self) -> tuple[Ride, ...]:
+        return tuple(self._rides.values())
+
+    def add_driver(self, driver: Driver) -> None:
+        if driver in self._driver_keys:
+            return
+        key = next(self._sequence)
+        self._driver_keys[driver] = key
+        self._drivers[key] = driver
+        shards = self.regions.regions_near(driver.location, self.halo)
+        self._driver_shards[key] = shards
+        for shard in shards:
+            self._send(shard, ("add_driver", shard, key, driver.location, driver.is_available))
+        if not driver.is_available:
+            self._busy.add(key)
+        driver.add_availability_listener(self)
+
+    def remove_driver(self, driver: Driver) -> None:
+        key = self._driver_keys.pop(driver, None)
+        if key is None:
+            return
+        del self._drivers[key]
+        self._busy.discard(key)
+        driver.remove_availability_listener(self)
+        for shard in self._driver_shards.pop(key):
+            self._send(shard, ("remove_driver", shard, key))
+
+    def move_driver(self, driver: Driver, new_location: tuple[float, float] | str) -> None:
+        location = driver._to_coords(new_location)
+        driver.location = location
+        key = self._driver_keys.get(driver)
+        if key is None:
+            return
+        old_shards = self._driver_shards[key]
+        new_shards = self.regions.regions_near(location, self.halo)
+        for shard in old_shards - new_shards:
+            self._send(shard, ("remove_driver", shard, key))
+        for shard in old_shards & new_shards:
+            self._send(shard, ("move_driver", shard, key, location))
+        for shard in new_shards - old_shards:
+            self._send(shard, ("add_driver", shard, key, location, driver.is_available))
+        self._driver_shards[key] = new_shards
+
+    def add_ride_request(self, ride_request: Ride) -> None:
+        key = next(self._sequence)
+        self._rides[key] = ride_request
+        self._ride_keys[id(ride_request)] = key
+        shard = self.regions.region_of(ride_request.rider.location)
+        self._ride_shards[key] = shard
+        self._send(shard, ("add_ride", shard, key, ride_request.rider.location))
+
+    def remove_ride_request(self, ride_request: Ride) -> None:
+        key = self._ride_keys.pop(id(ride_request), None)
+        if key is None:
+            return
+        del self._rides[key]
+        shard = self._ride_shards.pop(key)
+        self._send(shard, ("remove_ride", shard, key))
+
+    def make_matches(self) -> list[tuple[Ride, Driver]]:
+        accepted: list[tuple[int, int]] = []
+        for _ in range(self.max_passes):
+            proposals = self._gather_proposals()
+            if not proposals:
+                break
+            round_accepted, conflicts = self._resolve(proposals)
+            accepted.extend(round_accepted)
+            self._commit(round_accepted)
+            if not conflicts:
+                break
+
+        matches = []
+        for ride_key, driver_key in sorted(accepted):
+            ride = self._rides.pop(ride_key)
+            del self._ride_keys[id(ride)]
+            del self._ride_shards[ride_key]
+            driver = self._drivers[driver_key]
+            # The shards marked it taken at commit; no need to tell them again.
+            self._busy.add(driver_key)
+            ride.assign_driver(driver)
+            matches.append((ride, driver))
+        return matches
+
+    def _resolve(self, proposals: list[tuple[int, int]]) -> tuple[list[tuple[int, int]], int]:
+        # Earlier requests keep their pick; later ones lose contested drivers.
+        claimed: set[int] = set()
+        accepted = []
+        conflicts = 0
+        for ride_key, driver_key in sorted(proposals):
+            if driver_key in claimed:
+                conflicts += 1
+                continue
+            claimed.add(driver_key)
+            accepted.append((ride_key, driver_key))
+        return accepted, conflicts
+
+    def _commit(self, accepted: list[tuple[int, int]]) -> None:
+        per_worker: list[tuple[dict[int, list[int]], dict[int, list[int]]]] = [
+            ({}, {}) for _ in self._outbox
+        ]
+        for ride_key, driver_key in accepted:
+            shard = self._ride_shards[ride_key]
+            per_worker[self._worker_of(shard)][0].setdefault(shard, []).append(ride_key)
+            for driver_shard in self._driver_shards[driver_key]:
+                per_worker[self._worker_of(driver_shard)][1].setdefault(driver_shard, []).append(driver_key)
+
+        if self._local is not None:
+            self._local.apply(self._outbox[0])
+            self._outbox[0] = []
+            self._local.commit(*per_worker[0])
+            return
+        for worker, connection in enumerate(self._connections):
+            connection.send(("commit", self._outbox[worker], *per_worker[worker]))
+            self._outbox[worker] = []
+        for connection in self._connections:
+            connection.recv()
+
+    def _gather_proposals(self) -> list[tuple[int, int]]:
+        if self._local is not None:
+            self._local.apply(self._outbox[0])
+            self._outbox[0] = []
+            return self._local.propose()
+        # Send to every worker first so they all match at the same time.
+        for worker, connection in enumerate(self._connections):
+            connection.send(("propose", self._outbox[worker]))
+            self._outbox[worker] = []
+        proposals = []
+        for connection in self._connections:
+            proposals.extend(connection.recv())
+        return proposals
+
+    def driver_availability_changed(self, driver: Driver) -> None:
+        key = self._driver_keys.get(driver)
+        if key is None:
+            return
+        if driver.is_available:
+            if key not in self._busy:
+                return
+            self._busy.discard(key)
+        elif key in self._busy:
+            return
+        else:
+            self._busy.add(key)
+        for shard in self._driver_shards[key]:
+            self._send(shard, ("set_available", shard, key, driver.is_available))
+
+    def _send(self, shard: int, command: tuple) -> None:
+        # Commands are batched per worker and shipped with the next round.
+        self._outbox[self._worker_of(shard)].append(command)
+
+    def _worker_of(self, shard: int) -> int:
+        return shard % len(self._outbox)
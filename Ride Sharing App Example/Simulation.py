@@ -0,0 +1,269 @@
+"""
+Discrete-event simulation of a day of ride-sharing traffic, for capacity
+planning.
+
+A Simulation runs a SyntheticCity through a real Matcher on simulated time.
+Everything that happens is an event on one heap, ordered by time:
+
+- request:  a rider asks for a ride; the request joins the Matcher
+- match:    a matching round, every ``match_interval`` seconds
+- pickup:   the driver reaches the rider (``Ride.start_ride``)
+- complete: the driver drops the rider off (``Ride.complete_ride``), is
+            moved to the drop-off point and becomes free again
+- abandon:  a rider still unmatched after ``patience`` seconds gives up
+- cruise:   a free driver drifts a little, as drivers do between rides
+
+Drivers travel at ``speed`` distance units per hour, along the roads when a
+``distance`` provider (see Roads) is given. Fares come from each ride's own
+pricing strategy once the ride completes.
+
+Runs are deterministic: the city and every random choice the simulation
+makes come from ``seed``, and simultaneous events run in the order they
+were scheduled. The same config always gives the same report. Wall-clock
+time is reported separately, so it never leaks into the results.
+
+    python3 Simulation.py --drivers 1500 --riders 20000 --out day.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import heapq
+import json
+import math
+import random
+import time
+from dataclasses import asdict, dataclass, field
+from itertools import count
+from typing import TYPE_CHECKING
+
+from Matcher import Matcher
+from SpatialIndex import KDTreeIndex
+from Stats import percentile
+from SyntheticCity import DAY_SECONDS, CityConfig, SyntheticCity
+
+if TYPE_CHECKING:
+    from People import Driver
+    from Rides import Ride
+    from Roads import DistanceProvider
+
+REQUEST, MATCH, PICKUP, COMPLETE, ABANDON, CRUISE = range(6)
+
+# Upper edges of the wait-time histogram buckets, in seconds.
+WAIT_BUCKETS = (60.0, 120.0, 300.0, 600.0, 1200.0, math.inf)
+
+
+@dataclass
+class SimulationConfig:
+    city: CityConfig = field(default_factory=CityConfig)
+    duration: float = DAY_SECONDS
+    # Distance units per hour; SyntheticCity's trip durations assume 30.
+    speed: float = 30.0
+    match_interval: float = 10.0
+    patience: float = 900.0
+    cruise_interval: float = 600.0
+    cruise_distance: float = 1.0
+    seed: int = 7
+
+    def __post_init__(self) -> None:
+        if self.speed <= 0 or self.match_interval <= 0 or self.cruise_interval <= 0:
+            raise ValueError("speed, match_interval and cruise_interval must be positive")
+
+
+@dataclass
+class SimulationReport:
+    requests: int = 0
+    matched: int = 0
+    completed: int = 0
+    abandoned: int = 0
+    # Still waiting, or still riding, when the day ended.
+    waiting_at_end: int = 0
+    riding_at_end: int = 0
+    # Share of the drivers' day spent driving to or with a rider.
+    utilization: float = 0.0
+    # Seconds from request to match, and from request to pickup.
+    match_wait: dict[str, float] = field(default_factory=dict)
+    pickup_wait: dict[str, float] = field(default_factory=dict)
+    # Pickups per wait bucket, keyed by the bucket's upper edge in seconds.
+    pickup_wait_histogram: dict[str, int] = field(default_factory=dict)
+    revenue: float = 0.0
+    revenue_by_pricing: dict[str, float] = field(default_factory=dict)
+    revenue_by_hour: list[float] = field(default_factory=lambda: [0.0] * 24)
+    events: int = 0
+
+
+class Simulation:
+
+    def __init__(self, config: SimulationConfig, distance: DistanceProvider | None = None):
+        self.config = config
+        self.now = 0.0
+        self.city = SyntheticCity(config.city)
+        self.matcher = Matcher(index=KDTreeIndex(), distance=distance)
+        self.drivers = self.city.build_drivers()
+        self.matcher.add_drivers(self.drivers)
+        self.report = SimulationReport()
+        self._rng = random.Random(config.seed)
+        self._events: list[tuple[float, int, int, object]] = []
+        self._sequence = count()
+        self._arrivals = self.city.timed_rides()
+        self._requested_at: dict[int, float] = {}
+        self._matched_at: dict[int, float] = {}
+        self._match_waits: list[float] = []
+        self._pickup_waits: list[float] = []
+        self._busy_seconds = 0.0
+        self._handlers = {
+            REQUEST: self._request,
+            MATCH: self._match,
+            PICKUP: self._pickup,
+            COMPLETE: self._complete,
+            ABANDON: self._abandon,
+            CRUISE: self._cruise,
+        }
+
+    def schedule(self, at: float, kind: int, payload: object = None) -> None:
+        heapq.heappush(self._events, (at, next(self._sequence), kind, payload))
+
+    def run(self) -> SimulationReport:
+        config = self.config
+        # Arrivals are fed in lazily: only the next one sits on the heap.
+        self._next_arrival()
+        self.schedule(config.match_interval, MATCH)
+        for driver in self.drivers:
+            self.schedule(self._rng.uniform(0, config.cruise_interval), CRUISE, driver)
+
+        events, handlers = self._events, self._handlers
+        while events and events[0][0] <= config.duration:
+            self.now, _, kind, payload = heapq.heappop(events)
+            handlers[kind](payload)
+            self.report.events += 1
+        self.now = config.duration
+        return self._finish()
+
+    def _next_arrival(self) -> None:
+        arrival = next(self._arrivals, None)
+        if arrival is not None:
+            self.schedule(arrival[0], REQUEST, arrival[1])
+
+    def _travel_seconds(self, distance: float) -> float:
+        return distance / self.config.speed * 3600.0
+
+    def _request(self, ride: Ride) -> None:
+        self.report.requests += 1
+        self._requested_at[id(ride)] = self.now
+        self.matcher.add_ride_request(ride)
+        self.schedule(self.now + self.config.patience, ABANDON, ride)
+        self._next_arrival()
+
+    def _match(self, _: None) -> None:
+        if self.matcher.num_ride_requests:
+            for ride, driver in self.matcher.make_matches():
+                self.report.matched += 1
+                self._matched_at[id(ride)] = self.now
+                self._match_waits.append(self.now - self._requested_at[id(ride)])
+                pickup = self.matcher.pickup_distance(ride, driver)
+                self.schedule(self.now + self._travel_seconds(pickup), PICKUP, ride)
+        self.schedule(self.now + self.config.match_interval, MATCH)
+
+    def _pickup(self, ride: Ride) -> None:
+        self._pickup_waits.append(self.now - self._requested_at[id(ride)])
+        self.matcher.move_driver(ride.driver, ride._to_coords(ride.from_place))
+        ride.start_ride()
+        self.schedule(self.now + self._travel_seconds(ride.distance()), COMPLETE, ride)
+
+    def _complete(self, ride: Ride) -> None:
+        report = self.report
+        driver = ride.driver
+        self.matcher.move_driver(driver, ride._to_coords(ride.to))
+        ride.complete_ride()
+        report.completed += 1
+        self._busy_seconds += self.now - self._matched_at.pop(id(ride))
+        del self._requested_at[id(ride)]
+        fare = ride.calculate_cost()
+        report.revenue += fare
+        name = type(ride.pricing).__name__
+        report.revenue_by_pricing[name] = report.revenue_by_pricing.get(name, 0.0) + fare
+        report.revenue_by_hour[min(int(self.now // 3600), 23)] += fare
+
+    def _abandon(self, ride: Ride) -> None:
+        if self.matcher.has_ride_request(ride):
+            self.matcher.remove_ride_request(ride)
+            del self._requested_at[id(ride)]
+            self.report.abandoned += 1
+
+    def _cruise(self, driver: Driver) -> None:
+        config = self.config
+        if driver.is_available:
+            angle = self._rng.uniform(0, 2 * math.pi)
+            size = config.city.size
+            x = min(max(driver.location[0] + config.cruise_distance * math.cos(angle), 0.0), size)
+            y = min(max(driver.location[1] + config.cruise_distance * math.sin(angle), 0.0), size)
+            self.matcher.move_driver(driver, (x, y))
+        self.schedule(self.now + config.cruise_interval, CRUISE, driver)
+
+    def _finish(self) -> SimulationReport:
+        report = self.report
+        report.waiting_at_end = self.matcher.num_ride_requests
+        report.riding_at_end = len(self._matched_at)
+        # Rides still under way count as busy up to the end of the day.
+        busy = self._busy_seconds + sum(self.now - matched for matched in self._matched_at.values())
+        report.utilization = busy / (len(self.drivers) * self.config.duration) if self.drivers else 0.0
+        report.match_wait = _distribution(self._match_waits)
+        report.pickup_wait = _distribution(self._pickup_waits)
+        histogram = dict.fromkeys(WAIT_BUCKETS, 0)
+        for wait in self._pickup_waits:
+            histogram[next(edge for edge in WAIT_BUCKETS if wait <= edge)] += 1
+        report.pickup_wait_histogram = {
+            ("inf" if edge == math.inf else f"{edge:.0f}"): pickups for edge, pickups in histogram.items()
+        }
+        return report
+
+
+def _distribution(values: list[float]) -> dict[str, float]:
+    values = sorted(values)
+    return {
+        "mean": sum(values) / len(values) if values else 0.0,
+        "p50": percentile(values, 0.50),
+        "p90": percentile(values, 0.90),
+        "p99": percentile(values, 0.99),
+        "max": values[-1] if values else 0.0,
+    }
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Simulate a day of ride-sharing traffic.")
+    parser.add_argument("--drivers", type=int, default=1_500)
+    parser.add_argument("--riders", type=int, default=20_000)
+    parser.add_argument("--distribution", choices=("uniform", "clustered"), default="clustered")
+    parser.add_argument("--hours", type=float, default=24.0)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--out", help="write the report here as JSON")
+    args = parser.parse_args(argv)
+
+    config = SimulationConfig(
+        city=CityConfig(
+            num_drivers=args.drivers, num_riders=args.riders, distribution=args.distribution, seed=args.seed
+        ),
+        duration=args.hours * 3600.0,
+        seed=args.seed,
+    )
+    start = time.perf_counter()
+    report = Simulation(config).run()
+    elapsed = time.perf_counter() - start
+
+    print(f"simulated {args.hours:g} h in {elapsed:.1f} s ({config.duration / elapsed:.0f}x real time)")
+    print(
+        f"requests {report.requests}, completed {report.completed}, abandoned {report.abandoned}, "
+        f"utilization {report.utilization:.1%}"
+    )
+    print(
+        f"pickup wait p50 {report.pickup_wait['p50'] / 60:.1f} min, p99 {report.pickup_wait['p99'] / 60:.1f} min; "
+        f"revenue {report.revenue:,.0f}"
+    )
+    if args.out:
+        with open(args.out, "w") as handle:
+            json.dump({"config": asdict(config), "report": asdict(report)}, handle, indent=2)
+        print(f"wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
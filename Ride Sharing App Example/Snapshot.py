@@ -0,0 +1,274 @@
+"""
+Compact binary snapshots of a Matcher, for fast restarts.
+
+A snapshot holds every registered driver (location, rating, vehicle, names)
+and every pending ride request. Driver fields are stored column by column:
+numbers as raw typed arrays and strings as one NUL-separated blob per
+field, so restoring is a few ``frombytes`` calls and splits followed by one
+bulk ``FleetStore.load_columns``, not one unpickle per driver. Pending rides
+are few and are stored as JSON lines.
+
+Rides already assigned or under way are not saved, so nothing in a restored
+Matcher would ever free their drivers: every driver comes back available.
+Vehicle classes are saved by name and looked up in the Vehicles module on
+restore, so a snapshot can only hold drivers whose vehicles are Vehicles
+classes; ``snapshot`` refuses any other.
+
+The file starts with a magic string and byte order, followed by
+length-prefixed sections in a fixed order. It is written to a temporary
+name and renamed into place, so a crash never leaves a half-written
+snapshot behind.
+
+With ``background=True`` the snapshot is written by a forked child, which
+sees a copy-on-write image of the Matcher as it was when ``snapshot`` was
+called; matching carries on in the parent meanwhile. A forked child only
+gets the calling thread, and could inherit a lock another thread held at
+the time (a ConcurrentMatcher stripe, say) and wait on it forever. So when
+other threads are running, or ``fork`` is not available, the state is
+copied in the caller and written on a thread instead.
+"""
+
+from __future__ import annotations
+
+import gc
+import json
+import os
+import struct
+import sys
+import threading
+from array import array
+from typing import TYPE_CHECKING
+
+import Vehicles
+from Fleet import DriverView, FleetStore
+from Journal import rebuild_ride, ride_info
+from Rides import reserve_ride_ids
+
+if TYPE_CHECKING:
+    from Matcher import Matcher
+
+MAGIC = b"RSMSNAP\x02"
+# byte order flag, driver count, ride count.
+HEADER = struct.Struct("<BxxxxxxxQQ")
+SECTION = struct.Struct("<Q")
+
+_NUMERIC_COLUMNS = (("xs", "d"), ("ys", "d"), ("ratings", "B"), ("vehicle_types", "B"))
+_STRING_COLUMNS = ("names", "phones", "vehicle_names", "vehicle_numbers")
+
+
+class SnapshotJob:
+    """A snapshot being written in the background; ``wait`` returns its path."""
+
+    def __init__(self, path: str, pid: int | None = None, thread: threading.Thread | None = None):
+        self.path = path
+        self._pid = pid
+        self._thread = thread
+        self._error: BaseException | None = None
+
+    def wait(self) -> str:
+        if self._pid is not None:
+            _, status = os.waitpid(self._pid, 0)
+            self._pid = None
+            code = os.waitstatus_to_exitcode(status)
+            if code != 0:
+                self._error = RuntimeError(f"snapshot process exited with code {code}")
+        elif self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._error is not None:
+            raise self._error
+        return self.path
+
+
+def snapshot(matcher: Matcher, path: str, background: bool = False) -> SnapshotJob:
+    if not background:
+        _write(path, _capture(matcher))
+        return SnapshotJob(path)
+    if hasattr(os, "fork") and threading.active_count() == 1:
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                _write(path, _capture(matcher))
+            except BaseException:
+                code = 1
+            finally:
+                # Skip the parent's atexit handlers and buffered output.
+                os._exit(code)
+        return SnapshotJob(path, pid=pid)
+
+    state = _capture(matcher)
+    job = SnapshotJob(path)
+
+    def write() -> None:
+        try:
+            _write(path, state)
+        except BaseException as error:
+            job._error = error
+
+    job._thread = threading.Thread(target=write, name="matcher-snapshot", daemon=True)
+    job._thread.start()
+    return job
+
+
+def restore(matcher: Matcher, path: str, store: FleetStore | None = None) -> FleetStore:
+    """Load a snapshot's drivers into ``store`` and register them and its rides with ``matcher``."""
+    # Nothing allocated here is cyclic garbage, but with half a million new
+    # views the collector would otherwise rescan the growing heap many times.
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return _restore(matcher, path, store)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+
+def _restore(matcher: Matcher, path: str, store: FleetStore | None) -> FleetStore:
+    columns, rides = _read(path)
+    if store is None:
+        store = FleetStore()
+    vehicle_classes = [getattr(Vehicles, name) for name in columns.pop("vehicle_classes")]
+    available = array("b", b"\x01") * len(columns["xs"])
+    slots = store.load_columns(vehicle_classes=vehicle_classes, available=available, **columns)
+
+    views = list(map(store.view, slots))
+    # Hash every view once; copying the dict keeps the stored hashes.
+    registered = dict.fromkeys(views)
+    matcher._drivers.update(registered)
+    matcher._available_drivers.update(registered.copy())
+    if matcher.surge is not None:
+        for view in views:
+            matcher.surge.driver_available(view)
+    store.add_availability_listener(matcher)
+    if matcher.index is not None:
+        matcher.index.add_many(views)
+    if matcher.journal is not None:
+        for view in views:
+            matcher.journal.driver_added(view)
+
+    last_id = 0
+    for info in rides:
+        ride = rebuild_ride(info)
+        ride.ride_id = info["id"]
+        last_id = max(last_id, ride.ride_id)
+        matcher.add_ride_request(ride)
+    reserve_ride_ids(last_id)
+    return store
+
+
+def _capture(matcher: Matcher) -> tuple[dict, list[dict]]:
+    drivers = list(matcher._drivers)
+    rides = []
+    for ride in matcher._ride_requests.values():
+        info = ride_info(ride)
+        info["id"] = ride.ride_id
+        rides.append(info)
+    return _columns(drivers), rides
+
+
+def _columns(drivers: list) -> dict:
+    store = drivers[0].store if drivers and isinstance(drivers[0], DriverView) else None
+    if store is not None and all(isinstance(d, DriverView) and d.store is store for d in drivers):
+        # Drivers backed by one FleetStore: copy straight out of its columns.
+        slots = [driver.slot for driver in drivers]
+        columns = {
+            name: array(typecode, [getattr(store, name)[slot] for slot in slots])
+            for name, typecode in _NUMERIC_COLUMNS
+        }
+        for name in _STRING_COLUMNS:
+            column = getattr(store, name)
+            columns[name] = [column[slot] for slot in slots]
+        columns["vehicle_classes"] = _class_names(store.vehicle_classes)
+        return columns
+
+    codes: dict[type, int] = {}
+    vehicles = [driver.vehicle for driver in drivers]
+    locations = [driver.location for driver in drivers]
+    return {
+        "xs": array("d", [x for x, _ in locations]),
+        "ys": array("d", [y for _, y in locations]),
+        "ratings": array("B", [driver.rating for driver in drivers]),
+        "vehicle_types": array("B", [codes.setdefault(type(v), len(codes)) for v in vehicles]),
+        "names": [driver.name for driver in drivers],
+        "phones": [driver.phone for driver in drivers],
+        "vehicle_names": [vehicle.name for vehicle in vehicles],
+        "vehicle_numbers": [vehicle.number for vehicle in vehicles],
+        "vehicle_classes": _class_names(codes),
+    }
+
+
+def _class_names(vehicle_classes) -> list[str]:
+    names = [cls.__name__ for cls in vehicle_classes]
+    for cls, name in zip(vehicle_classes, names):
+        if getattr(Vehicles, name, None) is not cls:
+            raise ValueError(f"cannot snapshot {cls.__qualname__}: only Vehicles classes can be restored")
+    return names
+
+
+def _write(path: str, state: tuple[dict, list[dict]]) -> None:
+    columns, rides = state
+    sections = [_join(columns["vehicle_classes"])]
+    sections += [columns[name].tobytes() for name, _ in _NUMERIC_COLUMNS]
+    sections += [_join(columns[name]) for name in _STRING_COLUMNS]
+    sections.append("".join(json.dumps(info) + "\n" for info in rides).encode())
+
+    temporary = path + ".tmp"
+    with open(temporary, "wb") as handle:
+        handle.write(MAGIC)
+        handle.write(HEADER.pack(sys.byteorder == "little", len(columns["xs"]), len(rides)))
+        for section in sections:
+            handle.write(SECTION.pack(len(section)))
+            handle.write(section)
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(temporary, path)
+
+
+def _read(path: str) -> tuple[dict, list[dict]]:
+    with open(path, "rb") as handle:
+        data = handle.read()
+    if data[: len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} is not a matcher snapshot")
+    little_endian, num_drivers, num_rides = HEADER.unpack_from(data, len(MAGIC))
+    offset = len(MAGIC) + HEADER.size
+    view = memoryview(data)
+    sections = []
+    for _ in range(2 + len(_NUMERIC_COLUMNS) + len(_STRING_COLUMNS)):
+        (size,) = SECTION.unpack_from(data, offset)
+        offset += SECTION.size
+        sections.append(view[offset : offset + size])
+        offset += size
+    if offset != len(data):
+        raise ValueError(f"{path} has {len(data) - offset} unexpected trailing bytes")
+
+    sections = iter(sections)
+    columns = {"vehicle_classes": _split(next(sections), None)}
+    for name, typecode in _NUMERIC_COLUMNS:
+        column = array(typecode)
+        column.frombytes(next(sections))
+        if typecode == "d" and bool(little_endian) != (sys.byteorder == "little"):
+            column.byteswap()
+        columns[name] = column
+    for name in _STRING_COLUMNS:
+        columns[name] = _split(next(sections), num_drivers)
+    rides = [json.loads(line) for line in bytes(next(sections)).decode().splitlines()]
+    if len(columns["xs"]) != num_drivers or len(rides) != num_rides:
+        raise ValueError(f"{path} is truncated or corrupt")
+    return columns, rides
+
+
+def _join(strings: list[str]) -> bytes:
+    blob = "\0".join(strings)
+    if blob.count("\0") != max(len(strings) - 1, 0):
+        raise ValueError("snapshot strings must not contain NUL characters")
+    return blob.encode()
+
+
+def _split(section: memoryview, count: int | None) -> list[str]:
+    if count == 0 or (count is None and not section):
+        return []
+    strings = bytes(section).decode().split("\0")
+    if count is not None and len(strings) != count:
+        raise ValueError("snapshot string column does not match the driver count")
+    return strings
@@ -0,0 +1,505 @@
+"""
+Spatial indexes for nearest-driver lookup.
+
+An index stores drivers by location so the Matcher only has to look at
+drivers near a rider instead of scanning the whole fleet. Ties are broken by
+insertion order, which keeps the result identical to a linear ``min()`` over
+the drivers in the order they were added.
+"""
+
+from __future__ import annotations
+
+import heapq
+import math
+from abc import ABC, abstractmethod
+from itertools import count
+from typing import TYPE_CHECKING, Callable, Iterable, Optional
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+if TYPE_CHECKING:
+    from People import Driver
+
+DriverFilter = Optional[Callable[["Driver"], bool]]
+
+
+class SpatialIndex(ABC):
+    @abstractmethod
+    def add(self, driver: Driver) -> None: ...
+
+    @abstractmethod
+    def remove(self, driver: Driver) -> None: ...
+
+    @abstractmethod
+    def move(self, driver: Driver, location: tuple[float, float]) -> None: ...
+
+    @abstractmethod
+    def k_nearest(
+        self, point: tuple[float, float], k: int, accept: DriverFilter = None
+    ) -> list[Driver]: ...
+
+    @abstractmethod
+    def within(
+        self, point: tuple[float, float], radius: float, accept: DriverFilter = None
+    ) -> list[Driver]: ...
+
+    @abstractmethod
+    def __len__(self) -> int: ...
+
+    @abstractmethod
+    def __contains__(self, driver: object) -> bool: ...
+
+    def nearest(self, point: tuple[float, float], accept: DriverFilter = None) -> Driver | None:
+        found = self.k_nearest(point, 1, accept)
+        return found[0] if found else None
+
+    def add_many(self, drivers: Iterable[Driver]) -> None:
+        for driver in drivers:
+            self.add(driver)
+
+
+class _KBest:
+    """Keeps the k smallest (distance, sequence) keys seen so far."""
+
+    __slots__ = ("k", "heap")
+
+    def __init__(self, k: int):
+        self.k = k
+        # Max-heap on the key via negation; sequences are unique so drivers never get compared.
+        self.heap: list[tuple[float, int, Driver]] = []
+
+    def full(self) -> bool:
+        return len(self.heap) >= self.k
+
+    def worst(self) -> float:
+        return -self.heap[0][0]
+
+    def offer(self, d2: float, seq: int, driver: Driver) -> None:
+        if len(self.heap) < self.k:
+            heapq.heappush(self.heap, (-d2, -seq, driver))
+        elif (d2, seq) < (-self.heap[0][0], -self.heap[0][1]):
+            heapq.heapreplace(self.heap, (-d2, -seq, driver))
+
+    def result(self) -> list[Driver]:
+        return [driver for _, _, driver in sorted(self.heap, reverse=True)] if self.heap else []
+
+
+class GridIndex(SpatialIndex):
+    """Uniform grid of square buckets keyed by integer cell coordinates."""
+
+    def __init__(self, cell_size: float = 1.0):
+        if cell_size <= 0:
+            raise ValueError("cell_size must be positive")
+        self.cell_size = cell_size
+        self._cells: dict[tuple[int, int], dict[Driver, int]] = {}
+        self._entries: dict[Driver, tuple[int, tuple[int, int]]] = {}
+        self._sequence = count()
+        self._min_cell: tuple[int, int] | None = None
+        self._max_cell: tuple[int, int] | None = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, driver: object) -> bool:
+        return driver in self._entries
+
+    def add(self, driver: Driver) -> None:
+        if driver in self._entries:
+            return
+        cell = self._cell_of(driver.location)
+        seq = next(self._sequence)
+        self._entries[driver] = (seq, cell)
+        self._cells.setdefault(cell, {})[driver] = seq
+        self._extend_bounds(cell)
+
+    def remove(self, driver: Driver) -> None:
+        entry = self._entries.pop(driver, None)
+        if entry is None:
+            return
+        _, cell = entry
+        self._discard(cell, driver)
+
+    def move(self, driver: Driver, location: tuple[float, float]) -> None:
+        driver.location = location
+        entry = self._entries.get(driver)
+        if entry is None:
+            return
+        seq, old_cell = entry
+        new_cell = self._cell_of(location)
+        if new_cell == old_cell:
+            return
+        self._discard(old_cell, driver)
+        self._entries[driver] = (seq, new_cell)
+        self._cells.setdefault(new_cell, {})[driver] = seq
+        self._extend_bounds(new_cell)
+
+    def k_nearest(
+        self, point: tuple[float, float], k: int, accept: DriverFilter = None
+    ) -> list[Driver]:
+        if not self._entries or k <= 0:
+            return []
+        qx, qy = point
+        cx, cy = self._cell_of(point)
+        best = _KBest(k)
+
+        for ring in range(self._max_ring(cx, cy) + 1):
+            # Everything outside rings 0..ring-1 is farther than (ring - 1) cells,
+            # so once the k-th candidate beats that bound we can stop.
+            if best.full() and best.worst() < ((ring - 1) * self.cell_size) ** 2:
+                break
+            sparse = 8 * ring > len(self._cells)
+            if sparse:
+                # The grid is sparse out here: walking occupied cells is cheaper
+                # than walking every empty cell of the remaining rings.
+                cells = [
+                    cell for cell in self._cells
+                    if max(abs(cell[0] - cx), abs(cell[1] - cy)) >= ring
+                ]
+            else:
+                cells = self._ring_cells(cx, cy, ring)
+            for cell in cells:
+                bucket = self._cells.get(cell)
+                if bucket:
+                    self._scan(bucket, qx, qy, accept, best)
+            if sparse:
+                break
+        return best.result()
+
+    def within(
+        self, point: tuple[float, float], radius: float, accept: DriverFilter = None
+    ) -> list[Driver]:
+        qx, qy = point
+        r2 = radius ** 2
+        low_x, low_y = self._cell_of((qx - radius, qy - radius))
+        high_x, high_y = self._cell_of((qx + radius, qy + radius))
+        found = []
+        for x in range(low_x, high_x + 1):
+            for y in range(low_y, high_y + 1):
+                bucket = self._cells.get((x, y))
+                if not bucket:
+                    continue
+                for driver, seq in bucket.items():
+                    if accept is not None and not accept(driver):
+                        continue
+                    d2 = (driver.location[0] - qx) ** 2 + (driver.location[1] - qy) ** 2
+                    if d2 <= r2:
+                        found.append((d2, seq, driver))
+        found.sort(key=lambda item: item[:2])
+        return [driver for _, _, driver in found]
+
+    @staticmethod
+    def _scan(bucket: dict[Driver, int], qx: float, qy: float, accept: DriverFilter, best: _KBest) -> None:
+        for driver, seq in bucket.items():
+            if accept is not None and not accept(driver):
+                continue
+            dx = driver.location[0] - qx
+            dy = driver.location[1] - qy
+            best.offer(dx ** 2 + dy ** 2, seq, driver)
+
+    def _discard(self, cell: tuple[int, int], driver: Driver) -> None:
+        bucket = self._cells[cell]
+        del bucket[driver]
+        if not bucket:
+            del self._cells[cell]
+
+    def _cell_of(self, location: tuple[float, float]) -> tuple[int, int]:
+        return math.floor(location[0] / self.cell_size), math.floor(location[1] / self.cell_size)
+
+    def _extend_bounds(self, cell: tuple[int, int]) -> None:
+        if self._min_cell is None or self._max_cell is None:
+            self._min_cell = self._max_cell = cell
+            return
+        self._min_cell = (min(self._min_cell[0], cell[0]), min(self._min_cell[1], cell[1]))
+        self._max_cell = (max(self._max_cell[0], cell[0]), max(self._max_cell[1], cell[1]))
+
+    def _max_ring(self, cx: int, cy: int) -> int:
+        # Bounds only ever grow, so this is a safe (if loose) search limit.
+        assert self._min_cell is not None and self._max_cell is not None
+        return max(
+            abs(cx - self._min_cell[0]),
+            abs(cx - self._max_cell[0]),
+            abs(cy - self._min_cell[1]),
+            abs(cy - self._max_cell[1]),
+        )
+
+    @staticmethod
+    def _ring_cells(cx: int, cy: int, ring: int):
+        if ring == 0:
+            yield cx, cy
+            return
+        for x in range(cx - ring, cx + ring + 1):
+            yield x, cy - ring
+            yield x, cy + ring
+        for y in range(cy - ring + 1, cy + ring):
+            yield cx - ring, y
+            yield cx + ring, y
+
+
+class _KDNode:
+    # A leaf holds drivers directly; an internal node only holds its split plane.
+    # Leaves remember the box their ancestors carve out so a move that stays
+    # inside it can be applied without touching the tree shape.
+    __slots__ = ("axis", "value", "left", "right", "drivers", "bounds", "count")
+
+    def __init__(self, bounds: tuple[float, float, float, float]):
+        self.axis = 0
+        self.value = 0.0
+        self.left: _KDNode | None = None
+        self.right: _KDNode | None = None
+        self.drivers: dict[Driver, tuple[float, float, int]] | None = {}
+        self.bounds = bounds
+        self.count = 0
+
+    def contains(self, x: float, y: float) -> bool:
+        low_x, low_y, high_x, high_y = self.bounds
+        return low_x <= x < high_x and low_y <= y < high_y
+
+    def child_for(self, x: float, y: float) -> _KDNode:
+        coord = x if self.axis == 0 else y
+        return self.right if coord >= self.value else self.left
+
+
+class KDTreeIndex(SpatialIndex):
+    """
+    Bucketed 2-d tree with in-place inserts, deletes and moves.
+
+    Drivers live in leaf buckets. Inserting splits an overfull bucket at its
+    median, deleting drops the driver from its bucket, and moving a driver
+    within its bucket's box is O(1). When skewed inserts make a path too deep,
+    only the unbalanced subtree above it is rebuilt (scapegoat style).
+    """
+
+    def __init__(self, bucket_size: int = 16, balance: float = 0.75):
+        if bucket_size < 2:
+            raise ValueError("bucket_size must be at least 2")
+        if not 0.5 < balance < 1.0:
+            raise ValueError("balance must be between 0.5 and 1.0")
+        self.bucket_size = bucket_size
+        self.balance = balance
+        self._root = _KDNode((-math.inf, -math.inf, math.inf, math.inf))
+        self._leaf_of: dict[Driver, _KDNode] = {}
+        self._sequence = count()
+        self._leaves = 1
+
+    def __len__(self) -> int:
+        return len(self._leaf_of)
+
+    def __contains__(self, driver: object) -> bool:
+        return driver in self._leaf_of
+
+    def add(self, driver: Driver) -> None:
+        if driver in self._leaf_of:
+            return
+        x, y = driver.location
+        self._insert(driver, x, y, next(self._sequence))
+
+    def add_many(self, drivers: Iterable[Driver]) -> None:
+        if self._leaf_of:
+            super().add_many(drivers)
+            return
+        # Into an empty tree: one bucket, split top-down at medians.
+        drivers = list(dict.fromkeys(drivers))
+        if np is not None and len(drivers) > self.bucket_size:
+            locations = np.array([driver.location for driver in drivers], dtype=float)
+            first_seq = next(self._sequence)
+            self._sequence = count(first_seq + len(drivers))
+            self._bulk_build(
+                self._root, drivers, locations[:, 0].copy(), locations[:, 1].copy(),
+                np.arange(len(drivers)), first_seq,
+            )
+            return
+        entries = self._root.drivers
+        for driver in drivers:
+            x, y = driver.location
+            entries[driver] = (x, y, next(self._sequence))
+            self._leaf_of[driver] = self._root
+        self._root.count = len(entries)
+        self._build(self._root)
+
+    def remove(self, driver: Driver) -> None:
+        if driver not in self._leaf_of:
+            return
+        self._delete(driver)
+        # Deletes never merge buckets; compact once most of them are empty.
+        if self._leaves > 4 * (len(self._leaf_of) // self.bucket_size + 4):
+            self._rebuild(self._root)
+
+    def move(self, driver: Driver, location: tuple[float, float]) -> None:
+        driver.location = location
+        leaf = self._leaf_of.get(driver)
+        if leaf is None:
+            return
+        x, y = location
+        _, _, seq = leaf.drivers[driver]
+        if leaf.contains(x, y):
+            leaf.drivers[driver] = (x, y, seq)
+            return
+        self._delete(driver)
+        self._insert(driver, x, y, seq)
+
+    def k_nearest(
+        self, point: tuple[float, float], k: int, accept: DriverFilter = None
+    ) -> list[Driver]:
+        if not self._leaf_of or k <= 0:
+            return []
+        best = _KBest(k)
+        self._search(self._root, point[0], point[1], accept, best)
+        return best.result()
+
+    def within(
+        self, point: tuple[float, float], radius: float, accept: DriverFilter = None
+    ) -> list[Driver]:
+        qx, qy = point
+        r2 = radius ** 2
+        found = []
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            if node.drivers is not None:
+                for driver, (x, y, seq) in node.drivers.items():
+                    d2 = (x - qx) ** 2 + (y - qy) ** 2
+                    if d2 <= r2 and (accept is None or accept(driver)):
+                        found.append((d2, seq, driver))
+                continue
+            diff = (qx if node.axis == 0 else qy) - node.value
+            stack.append(node.right if diff >= 0 else node.left)
+            if diff * diff <= r2:
+                stack.append(node.left if diff >= 0 else node.right)
+        found.sort(key=lambda item: item[:2])
+        return [driver for _, _, driver in found]
+
+    def _search(self, node: _KDNode, qx: float, qy: float, accept: DriverFilter, best: _KBest) -> None:
+        if node.drivers is not None:
+            for driver, (x, y, seq) in node.drivers.items():
+                if accept is not None and not accept(driver):
+                    continue
+                dx = x - qx
+                dy = y - qy
+                best.offer(dx ** 2 + dy ** 2, seq, driver)
+            return
+        diff = (qx if node.axis == 0 else qy) - node.value
+        near, far = (node.right, node.left) if diff >= 0 else (node.left, node.right)
+        self._search(near, qx, qy, accept, best)
+        # Keep searching on ties so the lowest sequence number still wins.
+        if not best.full() or diff * diff <= best.worst():
+            self._search(far, qx, qy, accept, best)
+
+    def _insert(self, driver: Driver, x: float, y: float, seq: int) -> None:
+        path = []
+        node = self._root
+        while node.drivers is None:
+            node.count += 1
+            path.append(node)
+            node = node.child_for(x, y)
+        node.count += 1
+        node.drivers[driver] = (x, y, seq)
+        self._leaf_of[driver] = node
+        if len(node.drivers) > self.bucket_size:
+            self._split(node)
+
+        if len(path) > 2 * math.log2(len(self._leaf_of) / self.bucket_size + 1) + 4:
+            for ancestor in path:
+                if max(ancestor.left.count, ancestor.right.count) > self.balance * ancestor.count:
+                    self._rebuild(ancestor)
+                    break
+
+    def _delete(self, driver: Driver) -> None:
+        leaf = self._leaf_of.pop(driver)
+        x, y, _ = leaf.drivers.pop(driver)
+        node = self._root
+        while node is not leaf:
+            node.count -= 1
+            node = node.child_for(x, y)
+        leaf.count -= 1
+
+    def _split(self, leaf: _KDNode) -> bool:
+        entries = leaf.drivers
+        for axis in self._axes_by_spread(entries):
+            coords = sorted(entry[axis] for entry in entries.values())
+            value = coords[len(coords) // 2]
+            if value == coords[0]:
+                # Everything below the median is a duplicate; split above it instead.
+                value = next((c for c in coords if c > coords[0]), None)
+                if value is None:
+                    continue
+            self._make_internal(leaf, axis, value)
+            for driver, entry in entries.items():
+                child = leaf.child_for(entry[0], entry[1])
+                child.drivers[driver] = entry
+                child.count += 1
+                self._leaf_of[driver] = child
+            return True
+        # All drivers share one location; let the bucket overflow.
+        return False
+
+    def _make_internal(self, node: _KDNode, axis: int, value: float) -> None:
+        low_x, low_y, high_x, high_y = node.bounds
+        if axis == 0:
+            left_bounds = (low_x, low_y, value, high_y)
+            right_bounds = (value, low_y, high_x, high_y)
+        else:
+            left_bounds = (low_x, low_y, high_x, value)
+            right_bounds = (low_x, value, high_x, high_y)
+        node.axis = axis
+        node.value = value
+        node.left = _KDNode(left_bounds)
+        node.right = _KDNode(right_bounds)
+        node.drivers = None
+        self._leaves += 1
+
+    @staticmethod
+    def _axes_by_spread(entries: dict[Driver, tuple[float, float, int]]) -> tuple[int, int]:
+        xs = [entry[0] for entry in entries.values()]
+        ys = [entry[1] for entry in entries.values()]
+        return (0, 1) if max(xs) - min(xs) >= max(ys) - min(ys) else (1, 0)
+
+    def _rebuild(self, subtree: _KDNode) -> None:
+        entries = {}
+        stack = [subtree]
+        while stack:
+            node = stack.pop()
+            if node.drivers is not None:
+                entries.update(node.drivers)
+                self._leaves -= 1
+            else:
+                stack.extend((node.left, node.right))
+        subtree.left = subtree.right = None
+        subtree.drivers = entries
+        subtree.count = len(entries)
+        self._leaves += 1
+        for driver in entries:
+            self._leaf_of[driver] = subtree
+        self._build(subtree)
+
+    def _bulk_build(self, node: _KDNode, drivers: list[Driver], xs, ys, rows, first_seq: int) -> None:
+        # Same splits _split would choose, with NumPy doing the per-level work.
+        node.count = len(rows)
+        if len(rows) > self.bucket_size:
+            node_xs, node_ys = xs[rows], ys[rows]
+            by_x = node_xs.max() - node_xs.min() >= node_ys.max() - node_ys.min()
+            for axis, coords in ((0, node_xs), (1, node_ys)) if by_x else ((1, node_ys), (0, node_xs)):
+                value = np.partition(coords, len(coords) // 2)[len(coords) // 2]
+                left = coords < value
+                if not left.any():
+                    above = coords[coords > value]
+                    if not len(above):
+                        continue
+                    value = above.min()
+                    left = coords < value
+                self._make_internal(node, axis, float(value))
+                self._bulk_build(node.left, drivers, xs, ys, rows[left], first_seq)
+                self._bulk_build(node.right, drivers, xs, ys, rows[~left], first_seq)
+                return
+        leaf_drivers = list(map(drivers.__getitem__, rows.tolist()))
+        node.drivers.update(
+            zip(leaf_drivers, zip(xs[rows].tolist(), ys[rows].tolist(), (rows + first_seq).tolist()))
+        )
+        self._leaf_of.update(dict.fromkeys(leaf_drivers, node))
+
+    def _build(self, node: _KDNode) -> None:
+        if len(node.drivers) > self.bucket_size and self._split(node):
+            self._build(node.left)
+            self._build(node.right)
@@ -0,0 +1,13 @@
+"""
+Small statistics helpers shared by the load suite, simulation and scheduler.
+"""
+
+from __future__ import annotations
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[rank]
@@ -0,0 +1,176 @@
+"""
+Demand/supply heatmap for surge pricing.
+
+SurgeEngine splits the map into square cells and counts, per cell, the open
+ride requests and the available drivers. A Matcher created with
+``surge=engine`` reports every request it adds, matches or drops and every
+driver that becomes free, busy or moves, so each count changes in O(1).
+
+Each cell's demand ratio (open requests per available driver) is smoothed
+over time with an exponential window: a change in the counts takes about
+``window`` seconds to show fully in the price, so one burst of requests does
+not swing fares. The smoothed value is kept per cell and brought up to date
+only when that cell changes or is quoted, so a quote is a dict lookup and a
+few arithmetic operations however many requests are open.
+
+SurgeCost(engine=engine) looks up the multiplier for the ride's pickup cell.
+Listeners added with ``add_listener`` have ``surge_changed(cell)`` called
+whenever a cell's counts change.
+"""
+
+from __future__ import annotations
+
+import math
+import time
+from typing import TYPE_CHECKING, Callable
+
+if TYPE_CHECKING:
+    from People import Driver
+    from Rides import Ride, RideRecord
+
+Cell = tuple[int, int]
+
+
+class SurgeEngine:
+
+    def __init__(
+        self,
+        cell_size: float = 5.0,
+        window: float = 300.0,
+        base_ratio: float = 1.0,
+        sensitivity: float = 0.5,
+        max_multiplier: float = 3.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if cell_size <= 0 or window <= 0:
+            raise ValueError("cell_size and window must be positive")
+        self.cell_size = cell_size
+        self.window = window
+        # Below base_ratio requests per driver there is no surge; above it the
+        # multiplier grows by ``sensitivity`` per extra request per driver.
+        self.base_ratio = base_ratio
+        self.sensitivity = sensitivity
+        self.max_multiplier = max_multiplier
+        self.clock = clock
+        self._requests: dict[Cell, int] = {}
+        self._drivers: dict[Cell, int] = {}
+        # Where each counted request and free driver was counted, so it can be
+        # taken back out of the same cell.
+        self._request_cells: dict[int, Cell] = {}
+        self._driver_cells: dict[Driver, Cell] = {}
+        # cell -> [smoothed ratio, current ratio, time of last change]
+        self._smoothed: dict[Cell, list[float]] = {}
+        self.listeners: tuple = ()
+
+    def add_listener(self, listener) -> None:
+        if listener not in self.listeners:
+            self.listeners = (*self.listeners, listener)
+
+    def remove_listener(self, listener) -> None:
+        self.listeners = tuple(existing for existing in self.listeners if existing is not listener)
+
+    def cell_of(self, location: tuple[float, float] | str) -> Cell:
+        x, y = _coords(location)
+        return int(x // self.cell_size), int(y // self.cell_size)
+
+    def request_opened(self, ride: Ride) -> None:
+        key = id(ride)
+        if key in self._request_cells:
+            return
+        cell = self._request_cells[key] = self.cell_of(ride.from_place)
+        self._requests[cell] = self._requests.get(cell, 0) + 1
+        self._changed(cell)
+
+    def request_closed(self, ride: Ride) -> None:
+        cell = self._request_cells.pop(id(ride), None)
+        if cell is not None:
+            _decrement(self._requests, cell)
+            self._changed(cell)
+
+    def driver_available(self, driver: Driver) -> None:
+        if driver in self._driver_cells:
+            return
+        cell = self._driver_cells[driver] = self.cell_of(driver.location)
+        self._drivers[cell] = self._drivers.get(cell, 0) + 1
+        self._changed(cell)
+
+    def driver_unavailable(self, driver: Driver) -> None:
+        cell = self._driver_cells.pop(driver, None)
+        if cell is not None:
+            _decrement(self._drivers, cell)
+            self._changed(cell)
+
+    def driver_moved(self, driver: Driver) -> None:
+        old = self._driver_cells.get(driver)
+        if old is None:
+            return
+        new = self.cell_of(driver.location)
+        if new != old:
+            self._driver_cells[driver] = new
+            _decrement(self._drivers, old)
+            self._drivers[new] = self._drivers.get(new, 0) + 1
+            self._changed(old)
+            self._changed(new)
+
+    def counts(self, cell: Cell) -> tuple[int, int]:
+        """Open requests and available drivers in ``cell``."""
+        return self._requests.get(cell, 0), self._drivers.get(cell, 0)
+
+    def multiplier(self, location: tuple[float, float] | str) -> float:
+        return self.cell_multiplier(self.cell_of(location))
+
+    def multiplier_for(self, ride: Ride | RideRecord) -> float:
+        from_place = getattr(ride, "from_place", None)
+        if from_place is None:
+            return self.multiplier((ride.from_x, ride.from_y))
+        return self.multiplier(from_place)
+
+    def cell_multiplier(self, cell: Cell) -> float:
+        state = self._smoothed.get(cell)
+        if state is None:
+            return 1.0
+        smoothed, ratio, changed_at = state
+        elapsed = self.clock() - changed_at
+        if elapsed > 0:
+            smoothed = ratio + (smoothed - ratio) * math.exp(-elapsed / self.window)
+        surge = 1.0 + self.sensitivity * (smoothed - self.base_ratio)
+        return min(max(surge, 1.0), self.max_multiplier)
+
+    def heatmap(self) -> dict[Cell, tuple[int, int, float]]:
+        """Every cell with open requests or free drivers: (requests, drivers, multiplier)."""
+        return {
+            cell: (*self.counts(cell), self.cell_multiplier(cell))
+            for cell in self._requests.keys() | self._drivers.keys()
+        }
+
+    def _changed(self, cell: Cell) -> None:
+        now = self.clock()
+        requests = self._requests.get(cell, 0)
+        ratio = requests / max(self._drivers.get(cell, 0), 1)
+        state = self._smoothed.get(cell)
+        if state is None:
+            # A cell starts out calm and drifts towards its first reading.
+            self._smoothed[cell] = [0.0, ratio, now]
+        else:
+            smoothed, previous, changed_at = state
+            elapsed = now - changed_at
+            if elapsed > 0:
+                smoothed = previous + (smoothed - previous) * math.exp(-elapsed / self.window)
+            state[0], state[1], state[2] = smoothed, ratio, now
+        for listener in self.listeners:
+            listener.surge_changed(cell)
+
+
+def _decrement(counts: dict[Cell, int], cell: Cell) -> None:
+    remaining = counts[cell] - 1
+    if remaining:
+        counts[cell] = remaining
+    else:
+        del counts[cell]
+
+
+def _coords(location: tuple[float, float] | str) -> tuple[float, float]:
+    if isinstance(location, str):
+        x, y = location.split()
+        return float(x), float(y)
+    return location
@@ -0,0 +1,223 @@
+"""
+Synthetic cities for load testing.
+
+A CityConfig describes how many drivers and riders there are, how they are
+spread over the map and which vehicles and pricing strategies they use.
+SyntheticCity turns it into Driver objects (or a FleetStore) and streams ride
+requests in batches, so a million riders never have to exist at once. The
+same city can also be written out as an Ingestion event stream:
+
+    python3 SyntheticCity.py --drivers 5000 --riders 100000 --distribution clustered > day.jsonl
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import random
+import sys
+from dataclasses import dataclass, field
+from typing import Iterator
+
+from Fleet import FleetStore
+from Ingestion import VEHICLE_TYPES
+from People import Driver, Rider
+from Pricing import Cost, LuxCost, NormalCost, SharingCost, SurgeCost
+from Rides import Ride
+
+DAY_SECONDS = 24 * 60 * 60.0
+
+PRICING_TYPES: dict[str, Cost] = {
+    "normal": NormalCost(),
+    "surge": SurgeCost(),
+    "sharing": SharingCost(num_share=2),
+    "lux": LuxCost(),
+}
+
+
+@dataclass
+class CityConfig:
+    num_drivers: int = 1_000
+    num_riders: int = 4_000
+    size: float = 100.0
+    # "uniform" or "clustered"; clustered puts hotspot_share of all points
+    # in Gaussian blobs around randomly placed hotspots.
+    distribution: str = "uniform"
+    hotspots: int = 8
+    hotspot_spread: float = 4.0
+    hotspot_share: float = 0.7
+    vehicle_mix: dict[str, float] = field(
+        default_factory=lambda: {"car": 0.5, "smallcar": 0.2, "largecar": 0.1, "luxcar": 0.1, "bike": 0.1}
+    )
+    pricing_mix: dict[str, float] = field(
+        default_factory=lambda: {"normal": 0.6, "surge": 0.2, "sharing": 0.15, "lux": 0.05}
+    )
+    # "objects" builds one Driver per driver, "fleet" a columnar FleetStore.
+    driver_store: str = "objects"
+    seed: int = 7
+
+    def __post_init__(self) -> None:
+        if self.distribution not in ("uniform", "clustered"):
+            raise ValueError(f"unknown distribution {self.distribution!r}")
+        if self.driver_store not in ("objects", "fleet"):
+            raise ValueError(f"unknown driver_store {self.driver_store!r}")
+        unknown = set(self.vehicle_mix) - set(VEHICLE_TYPES)
+        if unknown:
+            raise ValueError(f"unknown vehicle types {sorted(unknown)}")
+        unknown = set(self.pricing_mix) - set(PRICING_TYPES)
+        if unknown:
+            raise ValueError(f"unknown pricing strategies {sorted(unknown)}")
+
+
+class SyntheticCity:
+
+    def __init__(self, config: CityConfig):
+        self.config = config
+        rng = random.Random(config.seed)
+        self.hotspot_centers = [
+            (rng.uniform(0, config.size), rng.uniform(0, config.size)) for _ in range(config.hotspots)
+        ]
+        # Drivers and riders draw from separate streams so changing one count
+        # leaves the other population unchanged.
+        self._driver_seed = rng.getrandbits(32)
+        self._rider_seed = rng.getrandbits(32)
+
+    def point(self, rng: random.Random) -> tuple[float, float]:
+        config = self.config
+        if config.distribution == "clustered" and self.hotspot_centers and rng.random() < config.hotspot_share:
+            cx, cy = rng.choice(self.hotspot_centers)
+            x, y = rng.gauss(cx, config.hotspot_spread), rng.gauss(cy, config.hotspot_spread)
+            return min(max(x, 0.0), config.size), min(max(y, 0.0), config.size)
+        return rng.uniform(0, config.size), rng.uniform(0, config.size)
+
+    def drivers(self) -> list[Driver]:
+        rng = random.Random(self._driver_seed)
+        drivers = []
+        for i, vehicle_name in enumerate(self._draw(rng, self.config.vehicle_mix, self.config.num_drivers)):
+            driver = Driver(
+                name=f"driver-{i}",
+                phone=str(i),
+                rating=rng.randint(3, 5),
+                location=self.point(rng),
+                vehicle=VEHICLE_TYPES[vehicle_name](name=vehicle_name, number=f"plate-{i}"),
+            )
+            driver.echo_notifications = False
+            drivers.append(driver)
+        return drivers
+
+    def fleet(self) -> tuple[FleetStore, list[Driver]]:
+        """The same drivers as ``drivers()``, stored column-wise, with a view per driver."""
+        rng = random.Random(self._driver_seed)
+        store = FleetStore()
+        views = []
+        for i, vehicle_name in enumerate(self._draw(rng, self.config.vehicle_mix, self.config.num_drivers)):
+            rating = rng.randint(3, 5)
+            view = store.add(
+                f"driver-{i}",
+                str(i),
+                rating,
+                self.point(rng),
+                VEHICLE_TYPES[vehicle_name](name=vehicle_name, number=f"plate-{i}"),
+            )
+            view.echo_notifications = False
+            views.append(view)
+        return store, views
+
+    def build_drivers(self) -> list[Driver]:
+        if self.config.driver_store == "fleet":
+            return self.fleet()[1]
+        return self.drivers()
+
+    def ride_batches(self, batch_size: int) -> Iterator[list[Ride]]:
+        """Every rider's request, in arrival order, ``batch_size`` at a time."""
+        batch = []
+        for request in self._requests():
+            batch.append(self._ride(*request))
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def timed_rides(self) -> Iterator[tuple[float, Ride]]:
+        """Every rider's request with its arrival time in seconds after midnight."""
+        for request in self._requests():
+            yield request[1], self._ride(*request)
+
+    def events(self) -> Iterator[dict]:
+        """The city as Ingestion events: drivers first, then requests in arrival order."""
+        rng = random.Random(self._driver_seed)
+        for i, vehicle_name in enumerate(self._draw(rng, self.config.vehicle_mix, self.config.num_drivers)):
+            rating = rng.randint(3, 5)
+            x, y = self.point(rng)
+            yield {
+                "type": "driver", "id": f"d{i}", "name": f"driver-{i}", "phone": str(i),
+                "rating": rating, "location": f"{x:.4f} {y:.4f}", "vehicle": vehicle_name,
+                "plate": f"plate-{i}",
+            }
+        for i, request_time, origin, destination, pricing_name in self._requests():
+            yield {
+                "type": "request", "id": f"r{i}", "time": round(request_time, 3), "name": f"rider-{i}",
+                "from": f"{origin[0]:.4f} {origin[1]:.4f}", "to": f"{destination[0]:.4f} {destination[1]:.4f}",
+                "pricing": pricing_name,
+            }
+
+    def _requests(self) -> Iterator[tuple[int, float, tuple[float, float], tuple[float, float], str]]:
+        rng = random.Random(self._rider_seed)
+        count = self.config.num_riders
+        # Poisson arrivals spread over one day.
+        rate = count / DAY_SECONDS if count else 1.0
+        now = 0.0
+        for i, pricing_name in enumerate(self._draw(rng, self.config.pricing_mix, count)):
+            now += rng.expovariate(rate)
+            yield i, now, self.point(rng), self.point(rng), pricing_name
+
+    def _ride(
+        self,
+        i: int,
+        request_time: float,
+        origin: tuple[float, float],
+        destination: tuple[float, float],
+        pricing_name: str,
+    ) -> Ride:
+        rider = Rider(name=f"rider-{i}", phone=str(i), rating=5, location=origin)
+        rider.echo_notifications = False
+        hours, minutes = divmod(int(request_time // 60), 60)
+        return Ride(
+            from_place=origin,
+            to=destination,
+            ride_duration=f"{math.dist(origin, destination) * 2:.0f} mins",
+            request_time=f"{hours % 24:02d}:{minutes:02d}",
+            rider=rider,
+            pricing=PRICING_TYPES[pricing_name],
+        )
+
+    @staticmethod
+    def _draw(rng: random.Random, mix: dict[str, float], count: int) -> Iterator[str]:
+        names = list(mix)
+        weights = [mix[name] for name in names]
+        # Chunked so a million draws never sit in one list.
+        for start in range(0, count, 4096):
+            yield from rng.choices(names, weights, k=min(4096, count - start))
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Write a synthetic city as JSONL ingestion events.")
+    parser.add_argument("--drivers", type=int, default=1_000)
+    parser.add_argument("--riders", type=int, default=4_000)
+    parser.add_argument("--distribution", choices=("uniform", "clustered"), default="uniform")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args(argv)
+
+    city = SyntheticCity(
+        CityConfig(
+            num_drivers=args.drivers, num_riders=args.riders, distribution=args.distribution, seed=args.seed
+        )
+    )
+    for event in city.events():
+        sys.stdout.write(json.dumps(event) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,14 @@
+"""
+Tests for the ride-sharing example, one module per feature.
+
+    python3 -m pytest tests
+    python3 -m unittest discover tests
+
+Either command is run from the example directory; the modules under test are
+imported by their plain names, as the example's own scripts do.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,56 @@
+"""Small fixtures shared by the tests: quiet drivers and ride requests on a random city."""
+
+from __future__ import annotations
+
+import random
+
+from People import Driver, Rider
+from Rides import Ride
+from Roads import DistanceProvider
+from Vehicles import Car
+
+CITY_SIZE = 100.0
+
+
+class GridDistance(DistanceProvider):
+    """Blocks driven on a square street grid; a stand-in for a RoadNetwork."""
+
+    def distance(self, origin, destination) -> float:
+        return abs(destination[0] - origin[0]) + abs(destination[1] - origin[1])
+
+
+def make_driver(name: str, location: tuple[float, float], vehicle=None, rating: int = 5) -> Driver:
+    driver = Driver(
+        name=name,
+        phone=name,
+        rating=rating,
+        location=location,
+        vehicle=vehicle if vehicle is not None else Car(name="camry", number=name),
+    )
+    driver.echo_notifications = False
+    return driver
+
+
+def make_ride(origin, destination, ride_class: type[Ride] = Ride, request_time: str = "10 pm", **fields) -> Ride:
+    rider = Rider(name="rider", phone="", rating=5, location=Ride._to_coords(origin))
+    rider.echo_notifications = False
+    return ride_class(
+        from_place=origin, to=destination, ride_duration="10 mins", request_time=request_time, rider=rider, **fields
+    )
+
+
+def random_point(rng: random.Random, size: float = CITY_SIZE) -> tuple[float, float]:
+    return rng.uniform(0, size), rng.uniform(0, size)
+
+
+def make_drivers(count: int, rng: random.Random, size: float = CITY_SIZE) -> list[Driver]:
+    return [make_driver(f"driver-{i}", random_point(rng, size)) for i in range(count)]
+
+
+def make_rides(count: int, rng: random.Random, size: float = CITY_SIZE) -> list[Ride]:
+    return [make_ride(random_point(rng, size), random_point(rng, size)) for _ in range(count)]
+
+
+def pair_ids(pairs) -> list[tuple[int, int]]:
+    """Matches as (ride id, driver id) pairs, for comparing strategies."""
+    return [(id(ride), id(driver)) for ride, driver in pairs]
@@ -0,0 +1,74 @@
+import random
+import threading
+import unittest
+
+from ConcurrentMatcher import ConcurrentMatcher
+from Rides import RideStatus
+from SpatialIndex import GridIndex
+from support import make_driver, make_drivers, make_rides, random_point
+
+
+class ConcurrentMatcherTest(unittest.TestCase):
+
+    def test_producers_and_matchers_never_double_book(self):
+        drivers = make_drivers(300, random.Random(7))
+        matcher = ConcurrentMatcher(index=GridIndex(cell_size=10.0))
+        matcher.add_drivers(drivers)
+        producers, matchers = 8, 2
+        submitted = [[] for _ in range(producers)]
+        matched = [[] for _ in range(matchers)]
+        done = threading.Event()
+
+        def produce(worker: int) -> None:
+            rng = random.Random(worker)
+            own, extra = submitted[worker], []
+            for i in range(300):
+                roll = rng.random()
+                if roll < 0.70 or not own:
+                    (ride,) = make_rides(1, rng)
+                    own.append(ride)
+                    matcher.add_ride_request(ride)
+                elif roll < 0.75:
+                    matcher.remove_ride_request(rng.choice(own))
+                elif roll < 0.80:
+                    driver = make_driver(f"late-{worker}-{i}", random_point(rng))
+                    extra.append(driver)
+                    matcher.add_driver(driver)
+                elif roll < 0.85:
+                    matcher.move_driver(rng.choice(drivers), random_point(rng))
+                elif roll < 0.87 and extra:
+                    matcher.remove_driver(extra.pop())
+                else:
+                    ride = rng.choice(own)
+                    if ride.driver is not None and ride.status == RideStatus.PENDING:
+                        matcher.complete_ride(ride)
+
+        def match(worker: int) -> None:
+            while not done.is_set():
+                matched[worker].extend(matcher.make_matches())
+            matched[worker].extend(matcher.make_matches())
+
+        matching = [threading.Thread(target=match, args=(i,)) for i in range(matchers)]
+        producing = [threading.Thread(target=produce, args=(i,)) for i in range(producers)]
+        for thread in matching + producing:
+            thread.start()
+        for thread in producing:
+            thread.join()
+        done.set()
+        for thread in matching:
+            thread.join()
+
+        pairs = [pair for worker in matched for pair in worker]
+        self.assertTrue(pairs)
+        self.assertEqual(len({id(ride) for ride, _ in pairs}), len(pairs))
+        busy = {}
+        for ride in (ride for own in submitted for ride in own):
+            if ride.driver is not None and ride.status == RideStatus.PENDING:
+                busy[ride.driver] = busy.get(ride.driver, 0) + 1
+        self.assertTrue(all(count == 1 for count in busy.values()))
+        self.assertFalse(any(driver.is_available for driver in busy))
+        self.assertEqual(set(matcher.available_drivers), {d for d in matcher.drivers if d.is_available})
+
+
+if __name__ == "__main__":
+    unittest.main()
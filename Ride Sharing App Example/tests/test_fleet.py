@@ -0,0 +1,79 @@
+import random
+import unittest
+from unittest import mock
+
+import Matching
+from Fleet import FleetStore
+from Matcher import Matcher
+from Matching import FleetMatching, GreedyMatching
+from SpatialIndex import KDTreeIndex
+from Vehicles import Car, LuxCar
+from support import make_drivers, make_rides
+
+
+def build_store(drivers) -> FleetStore:
+    store = FleetStore()
+    for driver in drivers:
+        store.add(driver.name, driver.phone, driver.rating, driver.location, driver.vehicle)
+    return store
+
+
+class FleetStoreTest(unittest.TestCase):
+
+    def test_views_read_and_write_the_columns(self):
+        store = FleetStore()
+        view = store.add("ann", "1", 4, "3 4", LuxCar(name="rolls", number="L1"))
+        self.assertEqual((view.name, view.rating, view.location), ("ann", 4, (3.0, 4.0)))
+        self.assertIsInstance(view.vehicle, LuxCar)
+        self.assertEqual(view.vehicle.number, "L1")
+        view.location = (5.0, 6.0)
+        view.is_available = False
+        self.assertEqual((store.xs[0], store.ys[0], store.available[0]), (5.0, 6.0, 0))
+        self.assertEqual(view, store.view(0))
+        self.assertEqual(len({view, store.view(0)}), 1)
+
+    def test_matcher_tracks_view_availability(self):
+        store = FleetStore()
+        views = [store.add(f"d{i}", "", 5, (float(i), 0.0), Car(name="c", number=str(i))) for i in range(3)]
+        matcher = Matcher()
+        matcher.add_drivers(views)
+        store.view(1).set_available(False)
+        self.assertEqual(matcher.available_drivers, (views[0], views[2]))
+        matcher.remove_driver(views[1])
+        self.assertEqual(store.view(1).availability_listeners, ())
+        self.assertEqual(store.view(0).availability_listeners, (matcher,))
+        store.view(1).set_available(True)
+        self.assertEqual(matcher.available_drivers, (views[0], views[2]))
+        matcher.add_driver(views[1])
+        self.assertEqual(store.view(1).availability_listeners, (matcher,))
+
+    def test_removed_slots_leave_the_matcher(self):
+        store = build_store(make_drivers(3, random.Random(2)))
+        matcher = Matcher(index=KDTreeIndex())
+        matcher.add_drivers(store)
+        store.remove(0)
+        self.assertNotIn(store.view(0), matcher.available_drivers)
+        rides = make_rides(3, random.Random(4))
+        self.assertNotIn(store.view(0), [driver for _, driver in matcher.propose_matches(rides)])
+
+    def test_removed_slots_are_not_matched(self):
+        store = build_store(make_drivers(10, random.Random(1)))
+        for slot in range(9):
+            store.remove(slot)
+        self.assertEqual(store.available_slots(), [9])
+        self.assertEqual(list(store), [store.view(9)])
+
+    def test_fleet_matching_picks_the_same_drivers(self):
+        for numpy in (Matching.np, None):
+            rng = random.Random(3)
+            drivers = make_drivers(500, rng)
+            rides = make_rides(200, rng)
+            store = build_store(drivers)
+            expected = [driver.name for _, driver in GreedyMatching().match(rides, drivers, None)]
+            with mock.patch.object(Matching, "np", numpy):
+                matches = FleetMatching(store).match(rides, [], None)
+            self.assertEqual([driver.name for _, driver in matches], expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+import io
+import json
+import unittest
+
+from Ingestion import MAX_PENDING, IngestionPipeline, read_csv, read_jsonl
+from Matcher import Matcher
+from Rides import SharingRide
+from SpatialIndex import KDTreeIndex
+from support import make_ride
+
+
+def driver(i: int, x: float) -> dict:
+    return {"type": "driver", "id": f"d{i}", "location": f"{x} 0", "vehicle": "car"}
+
+
+def request(i: int, time: float, x: float = 0.0, **extra) -> dict:
+    return {"type": "request", "id": f"r{i}", "time": time, "from": f"{x} 0", "to": f"{x} 5", **extra}
+
+
+class IngestionPipelineTest(unittest.TestCase):
+
+    def test_batches_close_on_size_or_window(self):
+        events = [driver(i, i) for i in range(10)]
+        events += [request(i, time=i) for i in range(5)]
+        # A gap longer than the window closes the batch early.
+        events += [request(5, time=100.0)]
+        pipeline = IngestionPipeline(Matcher(index=KDTreeIndex()), batch_size=3, window=10.0)
+        reports = list(pipeline.run(events))
+        self.assertEqual([report.requests for report in reports], [3, 2, 1])
+        self.assertEqual([report.matched for report in reports], [3, 2, 1])
+        self.assertEqual(reports[0].drivers_added, 10)
+
+    def test_completions_free_drivers(self):
+        events = [driver(0, 0.0), request(0, 1.0), request(1, 2.0)]
+        events += [{"type": "complete", "id": "r0"}, request(2, 3.0)]
+        pipeline = IngestionPipeline(Matcher(), batch_size=2)
+        reports = list(pipeline.run(events))
+        self.assertEqual([(report.matched, report.pending) for report in reports], [(1, 1), (1, 1)])
+        self.assertEqual(reports[1].completions, 1)
+
+    def test_backlog_is_capped(self):
+        events = [request(i, time=i) for i in range(10)]
+        matcher = Matcher()
+        (report,) = IngestionPipeline(matcher, batch_size=100, max_pending=4).run(events)
+        self.assertEqual((report.dropped, report.pending), (6, 4))
+        self.assertEqual([ride.request_time for ride in matcher.ride_requests], ["6", "7", "8", "9"])
+
+    def test_backlog_is_capped_by_default(self):
+        self.assertEqual(IngestionPipeline(Matcher()).max_pending, MAX_PENDING)
+
+    def test_requests_from_elsewhere_are_skipped(self):
+        matcher = Matcher()
+        outside = make_ride("0 0", "0 5")
+        matcher.add_ride_request(outside)
+        events = [driver(0, 0.0), driver(1, 1.0), request(0, 1.0), {"type": "complete", "id": "r0"}]
+        reports = list(IngestionPipeline(matcher, batch_size=1).run(events))
+        self.assertEqual([report.matched for report in reports], [2, 0])
+        self.assertIsNotNone(outside.driver)
+        self.assertEqual(reports[1].completions, 1)
+
+    def test_sharing_requests(self):
+        matcher = Matcher()
+        events = [request(i, 1.0, pricing="sharing", share=3) for i in range(2)]
+        list(IngestionPipeline(matcher).run(events))
+        first, second = matcher.ride_requests
+        self.assertIsInstance(first, SharingRide)
+        self.assertEqual((first.shared_by, first.pricing.num_share), (3, 3))
+        self.assertIs(first.pricing, second.pricing)
+
+    def test_share_out_of_range(self):
+        pipeline = IngestionPipeline(Matcher(), max_share=3)
+        for share in (0, 4, 1_000_000):
+            with self.assertRaises(ValueError):
+                list(pipeline.run([request(0, 1.0, pricing="sharing", share=share)]))
+        self.assertEqual(len(pipeline._sharing_pricing), 3)
+
+    def test_readers(self):
+        lines = [json.dumps(driver(0, 1.0)), "", json.dumps(request(0, 2.0))]
+        self.assertEqual([event["type"] for event in read_jsonl(lines)], ["driver", "request"])
+        text = "type,id,location,from,to,time\ndriver,d0,1 0,,,\nrequest,r0,,0 0,0 5,3\n"
+        events = list(read_csv(io.StringIO(text)))
+        self.assertEqual(events[0], {"type": "driver", "id": "d0", "location": "1 0"})
+        self.assertNotIn("location", events[1])
+
+
+if __name__ == "__main__":
+    unittest.main()
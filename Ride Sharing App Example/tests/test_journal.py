@@ -0,0 +1,122 @@
+import os
+import random
+import tempfile
+import unittest
+from unittest import mock
+
+import Journal
+from Journal import RideJournal, replay
+from Matcher import Matcher
+from Pricing import SharingCost, SurgeCost
+from Rides import RideStatus, SharingRide
+from SpatialIndex import KDTreeIndex
+from Vehicles import Car, LuxCar
+from support import make_driver, make_ride, random_point
+
+
+def matcher_state(matcher: Matcher, live_rides):
+    drivers = sorted(
+        (d.name, d.location, d.is_available, type(d.vehicle).__name__, d.vehicle.number) for d in matcher.drivers
+    )
+    pending = [
+        (r.ride_id, r.from_place, r.to, type(r.pricing).__name__, vars(r.pricing)) for r in matcher.ride_requests
+    ]
+    live = sorted(
+        (r.ride_id, r.status.value, r.driver.name if r.driver else None, r.calculate_cost()) for r in live_rides
+    )
+    return drivers, pending, live
+
+
+class RideJournalTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "journal")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write_history(self):
+        rng = random.Random(3)
+        journal = RideJournal(self.path, group_size=7)
+        matcher = Matcher(index=KDTreeIndex(), journal=journal)
+        drivers = [
+            make_driver(f"d{i}", random_point(rng, 50), vehicle=rng.choice([Car, LuxCar])(name="v", number=f"p{i}"))
+            for i in range(40)
+        ]
+        for driver in drivers:
+            matcher.add_driver(driver)
+        rides = []
+        for i in range(60):
+            if i % 3 == 2:
+                ride = make_ride(f"{rng.uniform(0, 50):.2f} 3.5", (1.0, 2.0), SharingRide, shared_by=3)
+                ride.pricing = SharingCost(3)
+            else:
+                ride = make_ride(random_point(rng, 50), random_point(rng, 50), pricing=SurgeCost(1.0 + i % 2))
+            rides.append(ride)
+            matcher.add_ride_request(ride)
+        cancelled = rides[5:7]
+        for ride in cancelled:
+            matcher.remove_ride_request(ride)
+        for k, (ride, _) in enumerate(matcher.make_matches()):
+            if k % 3:
+                ride.start_ride()
+            if k % 3 == 2:
+                ride.complete_ride()
+        for driver in drivers[:10]:
+            matcher.move_driver(driver, random_point(rng, 50))
+        matcher.remove_driver(next(driver for driver in reversed(drivers) if driver.is_available))
+        matcher.make_matches()
+        live = [r for r in rides if r.status != RideStatus.COMPLETED and all(r is not c for c in cancelled)]
+        state = matcher_state(matcher, live)
+        journal.close()
+        return state, max(ride.ride_id for ride in rides)
+
+    def check_replay(self):
+        expected, last_id = self.write_history()
+        journal = RideJournal(self.path)
+        matcher = Matcher(index=KDTreeIndex())
+        result = journal.replay(matcher)
+        self.assertEqual(matcher_state(matcher, result.rides.values()), expected)
+
+        journal.compact()
+        journal.close()
+        journal = RideJournal(self.path)
+        matcher = Matcher(index=KDTreeIndex())
+        result = journal.replay(matcher)
+        self.assertEqual(matcher_state(matcher, result.rides.values()), expected)
+
+        # Recording carries on after a replay, without reusing ride ids.
+        ride = make_ride((1.0, 1.0), (2.0, 2.0))
+        self.assertGreater(ride.ride_id, last_id)
+        matcher.add_ride_request(ride)
+        journal.close()
+        self.assertIn(ride.ride_id, replay(self.path, Matcher()).rides)
+
+    def test_replay_restores_the_matcher(self):
+        self.check_replay()
+
+    def test_replay_without_numpy(self):
+        with mock.patch.object(Journal, "np", None):
+            self.check_replay()
+
+    def test_poll_commits_a_group_after_max_delay(self):
+        journal = RideJournal(self.path, group_size=100, max_delay=60.0)
+        Matcher(journal=journal).add_driver(make_driver("d", (1.0, 2.0)))
+        journal.poll()
+        self.assertEqual(journal._events_size, 0)
+        journal._oldest_pending -= 60.0
+        journal.poll()
+        self.assertEqual(journal._events_size, Journal.RECORD_SIZE)
+        journal.close()
+
+    def test_rebuilt_ride_keeps_its_fields(self):
+        ride = make_ride("1 2", (3.0, 4.0), SharingRide, pricing=SharingCost(3), shared_by=3)
+        rebuilt = Journal.rebuild_ride(Journal.ride_info(ride))
+        self.assertIsInstance(rebuilt, SharingRide)
+        self.assertEqual((rebuilt.from_place, rebuilt.to, rebuilt.shared_by), ("1 2", (3.0, 4.0), 3))
+        self.assertEqual(rebuilt.calculate_cost(), ride.calculate_cost())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import random
+import unittest
+
+from Matcher import Matcher
+from SpatialIndex import KDTreeIndex
+from support import make_drivers, make_rides
+
+
+class MatcherRegistryTest(unittest.TestCase):
+
+    def setUp(self):
+        rng = random.Random(1)
+        self.drivers = make_drivers(100, rng)
+        self.rides = make_rides(100, rng)
+        self.matcher = Matcher(index=KDTreeIndex())
+        self.matcher.add_drivers(self.drivers)
+        for ride in self.rides:
+            self.matcher.add_ride_request(ride)
+
+    def test_views_are_read_only(self):
+        matcher = self.matcher
+        for view in (matcher.ride_requests, matcher.drivers, matcher.available_drivers):
+            with self.assertRaises(AttributeError):
+                view.append(None)
+            with self.assertRaises(TypeError):
+                view[0] = None
+
+    def test_removals_keep_order(self):
+        matcher = self.matcher
+        for ride in self.rides[::2]:
+            matcher.remove_ride_request(ride)
+        for driver in self.drivers[::2]:
+            matcher.remove_driver(driver)
+        self.assertEqual(matcher.ride_requests, tuple(self.rides[1::2]))
+        self.assertEqual(matcher.drivers, tuple(self.drivers[1::2]))
+        self.assertEqual(matcher.num_ride_requests, 50)
+        self.assertEqual(len(matcher.index), 50)
+        # Removing twice is a no-op.
+        matcher.remove_ride_request(self.rides[0])
+        matcher.remove_driver(self.drivers[0])
+        self.assertEqual(len(matcher.drivers), 50)
+
+    def test_availability_is_tracked_incrementally(self):
+        matcher = self.matcher
+        self.drivers[1].set_available(False)
+        self.assertNotIn(self.drivers[1], matcher.available_drivers)
+        self.drivers[1].set_available(True)
+        self.assertEqual(matcher.available_drivers[-1], self.drivers[1])
+        matcher.remove_driver(self.drivers[2])
+        self.drivers[2].set_available(False)
+        self.drivers[2].set_available(True)
+        self.assertNotIn(self.drivers[2], matcher.available_drivers)
+        self.assertEqual(self.drivers[2].availability_listeners, ())
+
+    def test_matching_round_trip(self):
+        matcher = self.matcher
+        matches = matcher.make_matches()
+        self.assertEqual(len(matches), 100)
+        self.assertEqual((matcher.num_ride_requests, len(matcher.available_drivers)), (0, 0))
+        for ride, driver in matches:
+            self.assertIs(ride.driver, driver)
+            ride.complete_ride()
+        self.assertEqual(len(matcher.available_drivers), 100)
+
+    def test_move_driver_updates_the_index(self):
+        driver = self.drivers[0]
+        self.matcher.move_driver(driver, "500 500")
+        self.assertEqual(driver.location, (500.0, 500.0))
+        self.assertIs(self.matcher.index.nearest((499.0, 499.0)), driver)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+import itertools
+import random
+import unittest
+
+from Matching import (
+    BatchMatching, EtaCost, GreedyMatching, RerankedMatching, VectorizedMatching, pickup_distance,
+)
+from SpatialIndex import GridIndex, KDTreeIndex
+from Vehicles import Bike
+from support import make_driver, make_drivers, make_ride, make_rides, pair_ids
+
+
+def best_total_pickup(rides, drivers) -> float:
+    """Lowest total pickup distance over every way of serving as many riders as possible."""
+    matched = min(len(rides), len(drivers))
+    return min(
+        sum(pickup_distance(rides[i], driver) for i, driver in zip(chosen, ordering))
+        for chosen in itertools.combinations(range(len(rides)), matched)
+        for ordering in itertools.permutations(drivers, matched)
+    )
+
+
+class GreedyMatchingTest(unittest.TestCase):
+
+    def test_vectorized_matches_greedy(self):
+        for seed in range(5):
+            rng = random.Random(seed)
+            drivers = make_drivers(rng.randint(0, 400), rng)
+            rides = make_rides(rng.randint(0, 300), rng)
+            for driver in drivers[::5]:
+                driver.is_available = False
+            expected = pair_ids(GreedyMatching().match(rides, drivers, None))
+            self.assertEqual(pair_ids(VectorizedMatching(chunk_size=17).match(rides, drivers, None)), expected)
+
+    def test_each_driver_taken_once(self):
+        rng = random.Random(3)
+        drivers = make_drivers(50, rng)
+        matches = GreedyMatching().match(make_rides(80, rng), drivers, None)
+        self.assertEqual(len(matches), 50)
+        self.assertEqual(len({id(driver) for _, driver in matches}), 50)
+
+
+class BatchMatchingTest(unittest.TestCase):
+
+    def test_total_pickup_is_optimal_on_small_windows(self):
+        for seed in range(60):
+            rng = random.Random(seed)
+            drivers = make_drivers(rng.randint(1, 6), rng, size=10)
+            rides = make_rides(rng.randint(1, 5), rng, size=10)
+            if seed % 2:
+                for person in [*drivers, *(ride.rider for ride in rides)]:
+                    person.location = (float(rng.randint(0, 3)), float(rng.randint(0, 3)))
+            strategy = BatchMatching(candidates=10, compare_greedy=True)
+            matches = strategy.match(rides, drivers, None)
+            report = strategy.last_report
+            self.assertEqual(len(matches), min(len(rides), len(drivers)))
+            self.assertEqual(len({id(driver) for _, driver in matches}), len(matches))
+            self.assertAlmostEqual(report.total_pickup, best_total_pickup(rides, drivers), places=9)
+            self.assertLessEqual(report.total_pickup, report.greedy_total_pickup + 1e-9)
+
+    def test_leftovers_fall_back_to_nearest_free_driver(self):
+        rng = random.Random(4)
+        drivers = make_drivers(40, rng)
+        rides = make_rides(30, rng)
+        index = KDTreeIndex()
+        index.add_many(drivers)
+        matches = BatchMatching(candidates=1).match(rides, drivers, index)
+        self.assertEqual(len(matches), 30)
+        self.assertEqual(len({id(driver) for _, driver in matches}), 30)
+
+
+class RerankedMatchingTest(unittest.TestCase):
+
+    def setUp(self):
+        rng = random.Random(2)
+        self.drivers = make_drivers(300, rng)
+        self.rides = make_rides(150, rng)
+        for driver in self.drivers[::4]:
+            driver.is_available = False
+
+    def test_straight_line_cost_matches_greedy(self):
+        for index in (None, KDTreeIndex(), GridIndex(5.0)):
+            if index is not None:
+                index.add_many(self.drivers)
+            strategy = RerankedMatching(EtaCost(), candidates=5)
+            matches = strategy.match(self.rides, self.drivers, index)
+            self.assertEqual(pair_ids(matches), pair_ids(GreedyMatching().match(self.rides, self.drivers, index)))
+            self.assertEqual((strategy.last_report.reranked, strategy.last_report.changed), (150, 0))
+
+    def test_spent_budget_falls_back_to_nearest(self):
+        strategy = RerankedMatching(EtaCost(rating_penalty=1e9), round_budget=0.0)
+        matches = strategy.match(self.rides, self.drivers, None)
+        self.assertEqual(pair_ids(matches), pair_ids(GreedyMatching().match(self.rides, self.drivers, None)))
+        self.assertEqual((strategy.last_report.reranked, strategy.last_report.over_budget), (0, 150))
+
+    def test_penalties_change_the_pick(self):
+        ride = make_ride((0.0, 0.0), (5.0, 5.0))
+        bike = make_driver("bike", (1.0, 0.0), vehicle=Bike(name="bike", number="b"))
+        car = make_driver("car", (2.0, 0.0))
+        cost = EtaCost(speed=30, vehicle_penalties={Bike: 600.0})
+        self.assertEqual(cost(ride, [bike, car]), [120.0 + 600.0, 240.0])
+        strategy = RerankedMatching(cost)
+        self.assertIs(strategy.match([ride], [bike, car], None)[0][1], car)
+        self.assertEqual(strategy.last_report.change_rate, 1.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,164 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+import urllib.request
+
+import Metrics
+from ConcurrentMatcher import ConcurrentMatcher
+from Matcher import Matcher
+from People import Person
+from Rides import Ride
+from SpatialIndex import KDTreeIndex
+from SyntheticCity import CityConfig, SyntheticCity
+
+PATCHED = [(Matcher, "make_matches"), (Matcher, "propose_matches"), (Matcher, "assign"),
+           (ConcurrentMatcher, "make_matches"), (ConcurrentMatcher, "assign"),
+           (Ride, "_notify_observers"), (Ride, "calculate_cost"), (Person, "observe_ride")]
+
+
+def originals():
+    return [owner.__dict__[name] for owner, name in PATCHED]
+
+
+class MetricsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.addCleanup(Metrics.disable)
+        self.city = SyntheticCity(CityConfig(num_drivers=300, num_riders=400, seed=3))
+        self.matcher = Matcher(index=KDTreeIndex())
+        self.matcher.add_drivers(self.city.drivers())
+
+    def run_traffic(self):
+        matched = []
+        for batch in self.city.ride_batches(100):
+            for ride in batch:
+                self.matcher.add_ride_request(ride)
+            matched += self.matcher.make_matches()
+            for ride in batch:
+                ride.calculate_cost()
+        return matched
+
+    def counters(self, registry):
+        return {counter["name"]: counter["value"] for counter in registry.to_json()["counters"]}
+
+    def test_enable_counts_and_disable_restores(self):
+        before = originals()
+        registry = Metrics.enable(Metrics.MetricsRegistry(), sample_rate=0.5)
+        self.assertTrue(Metrics.enabled())
+        matched = self.run_traffic()
+        Metrics.disable()
+        self.assertFalse(Metrics.enabled())
+        self.assertEqual(originals(), before)
+
+        counters = self.counters(registry)
+        self.assertEqual(counters["matcher_rounds_total"], 4)
+        self.assertEqual(counters["matcher_assignments_total"], len(matched))
+        self.assertEqual(counters["ride_fares_total"], 400)
+        histograms = {(h["name"], h["labels"].get("phase")): h for h in registry.to_json()["histograms"]}
+        self.assertEqual(histograms["matcher_round_seconds", None]["count"], 2)
+        # Every timed assignment is split into its two phases.
+        self.assertEqual(
+            histograms["matcher_phase_seconds", "assignment"]["count"],
+            histograms["matcher_phase_seconds", "notification"]["count"],
+        )
+        self.assertEqual(histograms["matcher_phase_seconds", "assignment"]["count"], len(matched) // 2)
+
+    def test_concurrent_matcher_is_recorded_from_many_threads(self):
+        matcher = ConcurrentMatcher(index=KDTreeIndex())
+        matcher.add_drivers(self.city.drivers())
+        registry = Metrics.enable(Metrics.MetricsRegistry(), sample_rate=0.5)
+        batches = list(self.city.ride_batches(50))
+        matched = [[] for _ in batches]
+
+        def work(worker: int) -> None:
+            for ride in batches[worker]:
+                matcher.add_ride_request(ride)
+            matched[worker] += matcher.make_matches()
+
+        threads = [threading.Thread(target=work, args=(worker,)) for worker in range(len(batches))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        Metrics.disable()
+
+        counters = self.counters(registry)
+        self.assertEqual(counters["matcher_rounds_total"], len(batches))
+        self.assertEqual(counters["matcher_assignments_total"], sum(map(len, matched)))
+        self.assertGreater(counters["matcher_assignments_total"], 0)
+
+    def test_matcher_subclasses_are_wrapped(self):
+        class CountingMatcher(Matcher):
+            def assign(self, ride_request, driver):
+                return super().assign(ride_request, driver)
+
+        matcher = CountingMatcher(index=KDTreeIndex())
+        matcher.add_drivers(self.city.drivers())
+        self.matcher = matcher
+        registry = Metrics.enable(Metrics.MetricsRegistry())
+        self.assertIsNot(CountingMatcher.__dict__["assign"], Matcher.__dict__["assign"])
+        matched = self.run_traffic()
+        Metrics.disable()
+        # The override and the Matcher.assign it calls are one assignment.
+        self.assertEqual(self.counters(registry)["matcher_assignments_total"], len(matched))
+
+    def test_counters_do_not_lose_updates(self):
+        counter, histogram = Metrics.Counter(), Metrics.Histogram()
+
+        def bump() -> None:
+            for _ in range(10_000):
+                counter.inc()
+                histogram.observe(0.001)
+
+        threads = [threading.Thread(target=bump) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual((counter.value, histogram.count, histogram.cumulative()[-1]), (40_000, 40_000, 40_000))
+
+    def test_histogram_buckets(self):
+        histogram = Metrics.Histogram(buckets=(1.0, 2.0))
+        for value in (0.5, 1.0, 1.5, 3.0):
+            histogram.observe(value)
+        self.assertEqual(histogram.cumulative(), [2, 3, 4])
+        self.assertEqual((histogram.count, histogram.sum), (4, 6.0))
+
+    def test_exports(self):
+        registry = Metrics.MetricsRegistry()
+        registry.counter("requests_total", "Requests", kind="plain").inc(3)
+        registry.histogram("wait_seconds", "Wait", buckets=(1.0,)).observe(0.5)
+        text = registry.to_prometheus()
+        self.assertIn("# TYPE requests_total counter", text)
+        self.assertIn('requests_total{kind="plain"} 3', text)
+        self.assertIn('wait_seconds_bucket{le="+Inf"} 1', text)
+        with tempfile.TemporaryDirectory() as directory:
+            registry.write(os.path.join(directory, "metrics.json"))
+            with open(os.path.join(directory, "metrics.json")) as handle:
+                self.assertEqual(json.load(handle), registry.to_json())
+            registry.write(os.path.join(directory, "metrics.prom"))
+            with open(os.path.join(directory, "metrics.prom")) as handle:
+                self.assertEqual(handle.read(), text)
+        server = registry.serve(port=0)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+        with urllib.request.urlopen(url + "/metrics") as response:
+            self.assertEqual(response.read().decode(), text)
+        with urllib.request.urlopen(url + "/metrics.json") as response:
+            self.assertEqual(json.loads(response.read()), registry.to_json())
+
+    def test_label_values_are_escaped(self):
+        registry = Metrics.MetricsRegistry()
+        registry.counter("odd_total", path='C:\\new "dir"\n').inc()
+        self.assertIn('odd_total{path="C:\\\\new \\"dir\\"\\n"} 1', registry.to_prometheus())
+
+    def test_bad_sample_rate(self):
+        with self.assertRaises(ValueError):
+            Metrics.enable(Metrics.MetricsRegistry(), sample_rate=0)
+
+
+if __name__ == "__main__":
+    unittest.main()
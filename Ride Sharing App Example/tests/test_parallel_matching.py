@@ -0,0 +1,43 @@
+import os
+import random
+import unittest
+
+from Matching import VectorizedMatching
+from ParallelMatching import ParallelMatching
+from support import make_drivers, make_rides, pair_ids
+
+
+def scenario(seed: int):
+    rng = random.Random(seed)
+    drivers = make_drivers(rng.randint(0, 200), rng)
+    rides = make_rides(rng.randint(0, 200), rng)
+    if seed % 3 == 0:
+        # An integer grid, so many drivers tie on distance.
+        for person in drivers + [ride.rider for ride in rides]:
+            person.location = (float(rng.randint(0, 3)), float(rng.randint(0, 3)))
+    for driver in drivers[::5]:
+        driver.is_available = False
+    return rides, drivers
+
+
+class ParallelMatchingTest(unittest.TestCase):
+
+    def test_workers_match_like_vectorized_matching(self):
+        with ParallelMatching(workers=2, candidates=2, rows_per_task=37) as parallel, \
+                ParallelMatching(workers=0, candidates=1) as local:
+            for seed in range(12):
+                rides, drivers = scenario(seed)
+                expected = pair_ids(VectorizedMatching().match(rides, drivers, None))
+                self.assertEqual(pair_ids(parallel.match(rides, drivers, None)), expected, seed)
+                self.assertEqual(pair_ids(local.match(rides, drivers, None)), expected, seed)
+
+    @unittest.skipUnless(os.path.isdir("/dev/shm"), "needs /dev/shm")
+    def test_close_releases_shared_memory(self):
+        before = set(os.listdir("/dev/shm"))
+        with ParallelMatching(workers=1) as parallel:
+            parallel.match(*scenario(1), None)
+        self.assertEqual(set(os.listdir("/dev/shm")) - before, set())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+
+from People import NotificationLog
+from Rides import RideStatus
+from support import make_driver, make_ride
+
+
+class NotificationLogTest(unittest.TestCase):
+
+    def test_keeps_the_newest_entries(self):
+        log = NotificationLog(capacity=3)
+        rides = [make_ride(f"{i} 0", "9 9") for i in range(5)]
+        for ride in rides:
+            log.append(ride)
+        self.assertEqual(len(log), 3)
+        self.assertEqual([record.ride_id for record in log], [ride.ride_id for ride in rides[2:]])
+        self.assertEqual(log.last().from_place, "4 0")
+
+    def test_unbounded_log_keeps_everything(self):
+        log = NotificationLog(capacity=None)
+        for i in range(250):
+            log.append(make_ride(f"{i} 0", "9 9"))
+        self.assertEqual(len(log), 250)
+
+    def test_notifications_are_formatted_on_demand(self):
+        driver = make_driver("abc", (0.0, 0.0))
+        ride = make_ride("1 3", "12 7")
+        ride.assign_driver(driver)
+        ride.complete_ride()
+        self.assertEqual(
+            driver.notifications,
+            [
+                "Driver abc: Ride 1 3->12 7 is pending (driver=abc)",
+                "Driver abc: Ride 1 3->12 7 is completed (driver=abc)",
+            ],
+        )
+        self.assertEqual(ride.rider.notification_log.last().status, RideStatus.COMPLETED)
+
+    def test_empty_log_has_no_last_entry(self):
+        with self.assertRaises(IndexError):
+            NotificationLog().last()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+import math
+import random
+import unittest
+
+from Matcher import Matcher
+from Pooling import PoolingEngine
+from Pricing import SharingCost
+from Rides import Ride, SharingRide
+from SpatialIndex import KDTreeIndex
+from support import make_driver, make_drivers, make_ride
+
+
+def sharing_rides(count: int, rng: random.Random, shared_by: int = 3) -> list[SharingRide]:
+    """Trips that mostly head the same way, so many of them can pool."""
+    rides = []
+    for _ in range(count):
+        origin = (rng.uniform(0, 30), rng.uniform(0, 30))
+        heading, length = rng.gauss(0.7, 0.3), rng.uniform(5, 20)
+        destination = (origin[0] + length * math.cos(heading), origin[1] + length * math.sin(heading))
+        rides.append(make_ride(origin, destination, SharingRide, pricing=SharingCost(num_share=2), shared_by=shared_by))
+    return rides
+
+
+def riding_distance(pool, ride) -> float:
+    """How far ``ride``'s rider travels along the pool's route."""
+    points = pool.route
+    start = points.index(ride._to_coords(ride.from_place))
+    end = len(points) - 1 - points[::-1].index(ride._to_coords(ride.to))
+    return sum(math.dist(a, b) for a, b in zip(points[start:end], points[start + 1:end + 1]))
+
+
+class PoolingEngineTest(unittest.TestCase):
+
+    def test_every_ride_in_one_pool_within_its_detour(self):
+        engine = PoolingEngine(max_detour=0.3)
+        rides = sharing_rides(2_000, random.Random(3))
+        pools = engine.group(rides)
+        self.assertEqual(sorted(id(ride) for pool in pools for ride in pool.rides), sorted(map(id, rides)))
+        self.assertTrue(any(len(pool.rides) == 3 for pool in pools))
+        for pool in pools:
+            self.assertLessEqual(len(pool.rides), 3)
+            for ride in pool.rides:
+                self.assertLessEqual(riding_distance(pool, ride), 1.3 * ride.distance() + 1e-9)
+            legs = sum(math.dist(a, b) for a, b in zip(pool.route, pool.route[1:]))
+            self.assertAlmostEqual(legs, pool.distance)
+
+    def test_pools_respect_every_riders_limit(self):
+        rides = [
+            make_ride((1.0, 1.0), (9.0, 9.0), SharingRide, shared_by=shared_by)
+            for shared_by in (3, 2, 3, 1, 4, 4, 4)
+        ]
+        pools = PoolingEngine(max_group=4).group(rides)
+        self.assertEqual([[ride.shared_by for ride in pool.rides] for pool in pools], [[3, 2], [3, 4, 4], [1], [4]])
+        self.assertEqual([ride.shared_by for ride in rides], [3, 2, 3, 1, 4, 4, 4])
+
+    def test_plain_rides_ride_alone(self):
+        plain = make_ride((1.0, 1.0), (9.0, 9.0))
+        shared = make_ride((1.0, 1.0), (9.0, 9.0), SharingRide, shared_by=2)
+        pools = PoolingEngine().group([plain, shared])
+        self.assertEqual([[type(ride) for ride in pool.rides] for pool in pools], [[Ride], [SharingRide]])
+
+    def test_dispatch_gives_a_pool_one_driver(self):
+        matcher = Matcher(index=KDTreeIndex())
+        matcher.add_drivers(make_drivers(200, random.Random(1), size=30))
+        rides = sharing_rides(300, random.Random(2))
+        for ride in rides:
+            matcher.add_ride_request(ride)
+        engine = PoolingEngine()
+        assigned = engine.dispatch(matcher)
+        self.assertEqual(matcher.num_ride_requests, 0)
+        pool, driver = max(assigned, key=lambda pair: len(pair[0].rides))
+        self.assertGreater(len(pool.rides), 1)
+        self.assertTrue(all(ride.driver is driver for ride in pool.rides))
+        self.assertNotIn(driver, matcher.available_drivers)
+        self.assertIs(pool.rides[0].pricing, engine.pricing(len(pool.rides)))
+        self.assertEqual(pool.fares(), [ride.base_cost() / len(pool.rides) for ride in pool.rides])
+
+    def test_pooled_driver_is_busy_until_the_last_drop_off(self):
+        matcher = Matcher()
+        driver = make_driver("pool", (1.0, 1.0))
+        matcher.add_driver(driver)
+        rides = [make_ride((1.0, 1.0), (9.0, 9.0), SharingRide, shared_by=2) for _ in range(2)]
+        for ride in rides:
+            matcher.add_ride_request(ride)
+        ((pool, assigned),) = PoolingEngine().dispatch(matcher)
+        self.assertIs(assigned, driver)
+        self.assertEqual(len(pool.rides), 2)
+
+        rides[0].complete_ride()
+        self.assertFalse(driver.is_available)
+        waiting = make_ride((1.0, 1.0), (5.0, 5.0))
+        matcher.add_ride_request(waiting)
+        self.assertEqual(matcher.make_matches(), [])
+        self.assertIsNone(waiting.driver)
+
+        rides[1].complete_ride()
+        self.assertTrue(driver.is_available)
+        self.assertEqual(matcher.make_matches(), [(waiting, driver)])
+
+
+if __name__ == "__main__":
+    unittest.main()
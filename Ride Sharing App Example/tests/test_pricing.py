@@ -0,0 +1,44 @@
+import random
+import unittest
+from unittest import mock
+
+import Pricing
+from Pricing import LuxCost, NormalCost, SharingCost, SurgeCost, price_columns, price_rides
+from support import make_rides
+
+
+class BatchPricingTest(unittest.TestCase):
+
+    def setUp(self):
+        rng = random.Random(7)
+        self.strategies = [NormalCost(), SurgeCost(), SharingCost(num_share=2), LuxCost()]
+        self.rides = make_rides(500, rng)
+        for ride in self.rides:
+            ride.pricing = rng.choice(self.strategies)
+        self.expected = [ride.calculate_cost() for ride in self.rides]
+
+    def test_price_rides_matches_per_ride_pricing(self):
+        self.assertEqual(price_rides(self.rides), self.expected)
+        self.assertEqual(price_rides([ride.to_record() for ride in self.rides]), self.expected)
+
+    def test_price_columns_matches_per_ride_pricing(self):
+        codes = {id(strategy): code for code, strategy in enumerate(self.strategies)}
+        columns = (
+            [ride.distance() for ride in self.rides],
+            [ride.fare_per_km() for ride in self.rides],
+            [codes[id(ride.pricing)] for ride in self.rides],
+        )
+        for numpy in (Pricing.np, None):
+            with mock.patch.object(Pricing, "np", numpy):
+                fares = price_columns(*columns, self.strategies)
+            for fare, expected in zip(fares, self.expected):
+                self.assertAlmostEqual(fare, expected, places=9)
+
+    def test_cost_array_without_numpy(self):
+        with mock.patch.object(Pricing, "np", None):
+            self.assertEqual(LuxCost().cost_array([1.0, 2.0], 10.0), [20.0, 40.0])
+            self.assertEqual(SharingCost(num_share=2).cost_array([1.0, 2.0], [10.0, 20.0]), [5.0, 20.0])
+
+
+if __name__ == "__main__":
+    unittest.main()
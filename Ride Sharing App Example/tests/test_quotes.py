@@ -0,0 +1,109 @@
+import random
+import unittest
+
+from Pricing import LuxCost, NormalCost, SharingCost, SurgeCost
+from Quotes import LRUCache, QuoteService
+from Surge import SurgeEngine
+from Vehicles import Car
+from support import GridDistance, make_drivers, make_ride, make_rides
+
+
+class Clock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class LRUCacheTest(unittest.TestCase):
+
+    def test_evicts_least_recent_and_expires(self):
+        clock, dropped = Clock(), []
+        cache = LRUCache(2, ttl=10, clock=clock, on_drop=dropped.append)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        self.assertEqual(cache.get("a"), 1)
+        cache.put("c", 3)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual((cache.stats.evictions, dropped), (1, ["b"]))
+        clock.now = 11
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.stats.expirations, 1)
+
+
+class QuoteServiceTest(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+        self.engine = SurgeEngine(clock=self.clock)
+        self.service = QuoteService(surge=self.engine, clock=self.clock)
+        self.addCleanup(self.service.close)
+        rng = random.Random(1)
+        self.rides = make_rides(100, rng)
+        drivers = make_drivers(20, rng)
+        self.strategies = [NormalCost(), SharingCost(2), LuxCost(), SurgeCost(1.7), SurgeCost(engine=self.engine)]
+        for i, ride in enumerate(self.rides):
+            ride.pricing = self.strategies[i % 5]
+            if i % 3 == 0:
+                ride.driver = drivers[i % 20]
+
+    def assertQuotesMatch(self, rides, tolerance):
+        for ride in rides:
+            self.assertAlmostEqual(self.service.quote(ride), ride.calculate_cost(), delta=tolerance)
+
+    def test_quotes_match_fares_and_repeat_from_cache(self):
+        # Half a distance step at up to 30 per km.
+        self.assertQuotesMatch(self.rides, 0.005 * 30 + 1e-9)
+        hits = self.service.fares.stats.hits
+        self.service.quote_many(self.rides)
+        self.assertGreaterEqual(self.service.fares.stats.hits - hits, len(self.rides))
+
+    def test_surge_changes_drop_cell_fares(self):
+        self.service.quote_many(self.rides)
+        for ride in self.rides[4::5]:
+            self.engine.request_opened(ride)
+        self.assertFalse(self.service._surge_keys)
+        self.assertQuotesMatch(self.rides, 0.15)
+
+    def test_invalidation_after_price_changes(self):
+        self.service.quote_many(self.rides)
+        strategy = self.strategies[3]
+        self.assertGreater(self.service.invalidate_strategy(strategy), 0)
+        strategy.multiplier = 2.5
+        self.assertQuotesMatch(self.rides[3::5], 0.2)
+        fare = Car.base_fare_per_km
+        self.addCleanup(setattr, Car, "base_fare_per_km", fare)
+        Car.base_fare_per_km = fare + 1
+        self.assertGreater(self.service.invalidate_vehicle(Car), 0)
+        for ride in self.rides:
+            ride._base_cost = None
+        self.assertQuotesMatch(self.rides, 0.3)
+
+    def test_string_endpoints_and_records(self):
+        ride = make_ride("1 2", "4 6")
+        self.assertEqual(self.service.quote(ride), 50.0)
+        self.assertEqual(self.service.quote(ride.to_record()), 50.0)
+
+    def test_one_distance_entry_per_trip(self):
+        self.service.quote(make_ride("1 2", "4 6"))
+        self.service.quote(make_ride((1.0, 2.0), (4.0, 6.0)))
+        stats = self.service.distances.stats
+        self.assertEqual((len(self.service.distances), stats.misses, stats.hits), (1, 1, 1))
+
+    def test_road_distances_are_quoted_and_cached_apart(self):
+        straight = make_ride("1 2", "4 6")
+        road = make_ride("1 2", "4 6", distance_provider=GridDistance())
+        self.assertEqual(self.service.quote(straight), 50.0)
+        self.assertEqual(self.service.quote(road), 70.0)
+        self.assertEqual(self.service.quote(road.to_record()), 70.0)
+        self.assertEqual(self.service.quote(straight.to_record()), 50.0)
+
+    def test_close_stops_listening(self):
+        self.service.close()
+        self.assertEqual(self.engine.listeners, ())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+import asyncio
+import unittest
+
+from RideNotifier import AsyncNotificationDispatcher, RideObserver
+from Rides import RideStatus
+from support import make_driver, make_ride
+
+
+class Recorder(RideObserver):
+
+    def __init__(self):
+        self.statuses = []
+
+    def observe_ride(self, ride) -> None:
+        self.statuses.append(ride.status)
+
+
+class AsyncNotificationDispatcherTest(unittest.TestCase):
+
+    def test_observers_see_each_status_in_order(self):
+        async def scenario():
+            dispatcher = AsyncNotificationDispatcher()
+            ride = make_ride("0 0", "1 1", dispatcher=dispatcher)
+            recorder = Recorder()
+            ride.add_observer(recorder)
+            ride.assign_driver(make_driver("d", (0.0, 0.0)))
+            ride.start_ride()
+            ride.complete_ride()
+            # Nothing is delivered until the loop gets a turn.
+            self.assertEqual(recorder.statuses, [])
+            await dispatcher.aclose()
+            return recorder.statuses, dispatcher
+
+        statuses, dispatcher = asyncio.run(scenario())
+        self.assertEqual(statuses, [RideStatus.PENDING, RideStatus.ONGOING, RideStatus.COMPLETED])
+        self.assertEqual(dispatcher.failed, 0)
+
+    def test_full_queue_drops_oldest(self):
+        async def scenario():
+            dispatcher = AsyncNotificationDispatcher(queue_size=1)
+            ride = make_ride("0 0", "1 1")
+            recorder = Recorder()
+            dispatcher.publish(ride, [recorder])
+            ride.status = RideStatus.COMPLETED
+            dispatcher.publish(ride, [recorder])
+            await dispatcher.aclose()
+            return recorder.statuses, dispatcher.dropped
+
+        self.assertEqual(asyncio.run(scenario()), ([RideStatus.COMPLETED], 1))
+
+    def test_workers_stop_when_the_ride_completes(self):
+        async def scenario():
+            dispatcher = AsyncNotificationDispatcher()
+            ride = make_ride("0 0", "1 1", dispatcher=dispatcher)
+            recorder = Recorder()
+            ride.add_observer(recorder)
+            ride.assign_driver(make_driver("d", (0.0, 0.0)))
+            await dispatcher.drain()
+            running = dispatcher.workers()
+            ride.start_ride()
+            ride.complete_ride()
+            await dispatcher.drain()
+            # Let the workers finish stopping.
+            await asyncio.sleep(0)
+            return running, dispatcher.workers(), recorder.statuses
+
+        running, left, statuses = asyncio.run(scenario())
+        # The rider, the driver and the recorder.
+        self.assertEqual((running, left), (3, 0))
+        self.assertEqual(statuses[-1], RideStatus.COMPLETED)
+
+    def test_idle_workers_stop_and_restart(self):
+        async def scenario():
+            dispatcher = AsyncNotificationDispatcher(idle_timeout=0.01)
+            ride = make_ride("0 0", "1 1")
+            recorder = Recorder()
+            dispatcher.publish(ride, [recorder])
+            await dispatcher.drain()
+            running = dispatcher.workers()
+            await asyncio.sleep(0.05)
+            idle = dispatcher.workers()
+            dispatcher.publish(ride, [recorder])
+            await dispatcher.aclose()
+            return running, idle, recorder.statuses
+
+        self.assertEqual(asyncio.run(scenario()), (1, 0, [RideStatus.PENDING] * 2))
+
+    def test_idle_timeout_retires_the_worker_cleanly(self):
+        async def scenario():
+            dispatcher = AsyncNotificationDispatcher(idle_timeout=0.01)
+            ride = make_ride("0 0", "1 1")
+            recorder = Recorder()
+            dispatcher.publish(ride, [recorder])
+            worker = dispatcher._workers[recorder]
+            await asyncio.sleep(0.05)
+            finished = worker.done() and worker.exception() is None
+            dispatcher.publish(ride, [recorder])
+            # A worker killed by the timeout would leave this queue unserved.
+            await asyncio.wait_for(dispatcher.drain(), 1.0)
+            await dispatcher.aclose()
+            return finished, recorder.statuses
+
+        self.assertEqual(asyncio.run(scenario()), (True, [RideStatus.PENDING] * 2))
+
+    def test_bad_idle_timeout(self):
+        with self.assertRaises(ValueError):
+            AsyncNotificationDispatcher(idle_timeout=0)
+
+    def test_publish_needs_a_loop(self):
+        with self.assertRaises(RuntimeError):
+            AsyncNotificationDispatcher().publish(make_ride("0 0", "1 1"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
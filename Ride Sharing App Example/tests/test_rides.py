@@ -0,0 +1,60 @@
+import unittest
+
+from Pricing import LuxCost, NormalCost
+from Rides import RideRecord, RideStatus, parse_request_time
+from Vehicles import LuxCar
+from support import GridDistance, make_driver, make_ride
+
+
+class RideTest(unittest.TestCase):
+
+    def test_distance_and_cost_follow_field_changes(self):
+        ride = make_ride("0 0", "3 4")
+        self.assertEqual((ride.distance(), ride.calculate_cost()), (5.0, 50.0))
+        ride.to = (6.0, 8.0)
+        self.assertEqual((ride.distance(), ride.calculate_cost()), (10.0, 100.0))
+        ride.pricing = LuxCost()
+        self.assertEqual(ride.calculate_cost(), 200.0)
+        ride.pricing = NormalCost()
+        ride.base_rate = 1.0
+        self.assertEqual(ride.calculate_cost(), 10.0)
+        ride.assign_driver(make_driver("lux", (0.0, 0.0), vehicle=LuxCar(name="rolls", number="L")))
+        self.assertEqual(ride.calculate_cost(), 10.0 * LuxCar.base_fare_per_km)
+
+    def test_record_prices_like_the_ride(self):
+        ride = make_ride("1 2", "4 6", pricing=LuxCost())
+        record = ride.to_record()
+        self.assertEqual((record.from_x, record.from_y, record.to_x, record.to_y), (1.0, 2.0, 4.0, 6.0))
+        self.assertEqual(record.calculate_cost(), ride.calculate_cost())
+
+    def test_record_keeps_the_road_distance(self):
+        ride = make_ride("1 2", "4 6", distance_provider=GridDistance())
+        record = ride.to_record()
+        self.assertEqual((record.distance(), record.calculate_cost()), (7.0, ride.calculate_cost()))
+        self.assertEqual(RideRecord(1.0, 2.0, 4.0, 6.0, 10.0, NormalCost(), GridDistance()).distance(), 7.0)
+
+    def test_lifecycle_frees_the_driver(self):
+        ride = make_ride("0 0", "1 1")
+        driver = make_driver("d", (0.0, 0.0))
+        ride.assign_driver(driver)
+        self.assertFalse(driver.is_available)
+        ride.start_ride()
+        ride.complete_ride()
+        self.assertEqual(ride.status, RideStatus.COMPLETED)
+        self.assertTrue(driver.is_available)
+        self.assertEqual([record.status for record in driver.notification_log][-1], RideStatus.COMPLETED)
+
+    def test_parse_request_time(self):
+        cases = {
+            "10 pm": 22 * 3600, "12 am": 0, "12 pm": 12 * 3600, "10:30 pm": 22 * 3600 + 1800,
+            "22:15": 22 * 3600 + 900, "22:15:30": 22 * 3600 + 930, "90": 90, 45: 45,
+        }
+        for value, seconds in cases.items():
+            self.assertEqual(parse_request_time(value), seconds, value)
+        for value in ("13 pm", "25:00", "noon"):
+            with self.assertRaises(ValueError):
+                parse_request_time(value)
+
+
+if __name__ == "__main__":
+    unittest.main()
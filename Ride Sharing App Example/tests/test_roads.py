@@ -0,0 +1,166 @@
+import heapq
+import math
+import os
+import random
+import tempfile
+import unittest
+
+from Matcher import Matcher
+from Matching import BatchMatching, GreedyMatching
+from Roads import RoadNetwork, build_road_network
+from SpatialIndex import KDTreeIndex
+from support import GridDistance, make_driver, make_ride, make_rides
+
+
+class RoadNetworkTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        rng = random.Random(3)
+        cls.directory = tempfile.TemporaryDirectory()
+        edge_list = os.path.join(cls.directory.name, "streets.txt")
+        cls.path = os.path.join(cls.directory.name, "streets.road")
+        points = {node: (rng.uniform(0, 50), rng.uniform(0, 50)) for node in range(150)}
+        # A separate component off to the side.
+        points.update({node: (100.0 + node, 100.0) for node in range(150, 155)})
+        cls.points = points
+        cls.adjacency = {node: [] for node in points}
+        with open(edge_list, "w") as handle:
+            handle.write("# test city\n")
+            handle.writelines(f"n {node} {x} {y}\n" for node, (x, y) in points.items())
+            for node in range(150):
+                nearest = sorted(range(150), key=lambda other: math.dist(points[node], points[other]))[1:4]
+                for other in nearest:
+                    length = math.dist(points[node], points[other]) * rng.uniform(1, 2)
+                    handle.write(f"e {node} {other} {length}\n")
+                    cls._connect(node, other, length)
+            for node in range(150, 154):
+                # No length given: the straight-line length.
+                handle.write(f"e {node} {node + 1}\n")
+                cls._connect(node, node + 1, math.dist(points[node], points[node + 1]))
+        build_road_network(edge_list, cls.path, landmarks=4)
+
+    @classmethod
+    def _connect(cls, a, b, length):
+        cls.adjacency[a].append((b, length))
+        cls.adjacency[b].append((a, length))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+
+    def setUp(self):
+        self.network = RoadNetwork(self.path)
+        self.addCleanup(self.network.close)
+
+    def dijkstra(self, source):
+        best, heap = {source: 0.0}, [(0.0, source)]
+        while heap:
+            travelled, node = heapq.heappop(heap)
+            if travelled > best[node]:
+                continue
+            for neighbour, length in self.adjacency[node]:
+                if travelled + length < best.get(neighbour, math.inf):
+                    best[neighbour] = travelled + length
+                    heapq.heappush(heap, (travelled + length, neighbour))
+        return best
+
+    def test_node_distances_are_shortest_paths(self):
+        for source in range(0, 155, 7):
+            expected = self.dijkstra(source)
+            for target in range(0, 155, 3):
+                self.assertAlmostEqual(
+                    self.network.node_distance(source, target), expected.get(target, math.inf), places=9
+                )
+
+    def test_nearest_node(self):
+        rng = random.Random(4)
+        for _ in range(100):
+            point = (rng.uniform(-10, 260), rng.uniform(-10, 110))
+            nearest = self.network.nearest_node(point)
+            best = min(self.points, key=lambda node: math.dist(point, self.points[node]))
+            self.assertAlmostEqual(math.dist(point, self.points[nearest]), math.dist(point, self.points[best]))
+
+    def test_distances_from_agrees_with_distance(self):
+        rng = random.Random(5)
+        origin = (10.0, 10.0)
+        destinations = [(rng.uniform(0, 50), rng.uniform(0, 50)) for _ in range(20)] + [(251.0, 100.0)]
+        many = self.network.distances_from(origin, destinations)
+        for got, destination in zip(many, destinations):
+            self.assertAlmostEqual(got, self.network.distance(origin, destination))
+            self.assertGreaterEqual(got, math.dist(origin, destination) - 1e-9)
+        self.assertEqual(many[-1], math.inf)
+
+    def test_matcher_hands_rides_its_network(self):
+        rng = random.Random(6)
+        (ride,) = make_rides(1, rng, size=50)
+        straight = ride.distance()
+        matcher = Matcher(distance=self.network)
+        matcher.add_ride_request(ride)
+        self.assertIs(ride.distance_provider, self.network)
+        self.assertGreaterEqual(ride.distance(), straight - 1e-9)
+        driver = make_driver("driver", (20.0, 20.0))
+        self.assertGreaterEqual(
+            matcher.pickup_distance(ride, driver), math.dist(ride.rider.location, driver.location) - 1e-9
+        )
+
+
+class RoadMatchingTest(unittest.TestCase):
+
+    def test_road_distance_changes_the_pick(self):
+        for strategy in (GreedyMatching, BatchMatching):
+            for index in (None, KDTreeIndex()):
+                diagonal, straight_ahead = make_driver("diagonal", (3.0, 3.0)), make_driver("ahead", (0.0, 5.0))
+                # 4.2 against 5 in a straight line, but 6 against 5 blocks on the grid.
+                picks = []
+                for distance in (None, GridDistance()):
+                    matcher = Matcher(index=index, strategy=strategy(), distance=distance)
+                    matcher.add_drivers([diagonal, straight_ahead])
+                    matcher.add_ride_request(make_ride((0.0, 0.0), (9.0, 9.0)))
+                    picks.append(matcher.propose_matches()[0][1])
+                    matcher.remove_driver(diagonal)
+                    matcher.remove_driver(straight_ahead)
+                self.assertEqual(picks, [diagonal, straight_ahead], (strategy, index))
+
+    def test_own_distance_is_kept(self):
+        own = GridDistance()
+        strategy = GreedyMatching(distance=own)
+        matcher = Matcher(strategy=strategy, distance=GridDistance())
+        matcher.propose_matches()
+        self.assertIs(strategy.distance, own)
+
+
+class GridSizingTest(unittest.TestCase):
+
+    def build(self, points):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        edge_list = os.path.join(directory.name, "streets.txt")
+        path = os.path.join(directory.name, "streets.road")
+        with open(edge_list, "w") as handle:
+            handle.writelines(f"n {node} {x} {y}\n" for node, (x, y) in enumerate(points))
+            handle.writelines(f"e {node} {node + 1}\n" for node in range(len(points) - 1))
+        build_road_network(edge_list, path, landmarks=1)
+        network = RoadNetwork(path)
+        self.addCleanup(network.close)
+        return network
+
+    def test_collinear_nodes_keep_the_grid_small(self):
+        for points in (
+            [(float(node), 5.0) for node in range(2_000)],
+            [(1.0, node * 0.5) for node in range(2_000)],
+            [(node * 0.5, node * 0.5 + 1e-9 * (node % 2)) for node in range(2_000)],
+        ):
+            network = self.build(points)
+            self.assertLessEqual(network.columns * network.rows, 2 * len(points))
+            for node in (0, 777, 1_999):
+                self.assertEqual(network.nearest_node(points[node]), node)
+
+    def test_single_point(self):
+        network = self.build([(3.0, 3.0)])
+        self.assertEqual((network.columns, network.rows), (1, 1))
+        self.assertEqual(network.nearest_node((0.0, 0.0)), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
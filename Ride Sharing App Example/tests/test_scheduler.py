@@ -0,0 +1,122 @@
+import unittest
+from datetime import datetime
+
+from Matcher import Matcher
+from Scheduler import PROBE_ROUND, MatchScheduler, nearest_occurrence
+from support import make_driver, make_ride
+
+
+ELEVEN_PM = datetime(2024, 3, 1, 23, 0).timestamp()
+
+
+class Timer:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class MatchSchedulerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.matcher = Matcher()
+        self.timer = Timer()
+
+    def scheduler(self, **options) -> MatchScheduler:
+        options.setdefault("clock", lambda: ELEVEN_PM)
+        return MatchScheduler(self.matcher, timer=self.timer, **options)
+
+    def test_earliest_deadline_is_served_first(self):
+        scheduler = self.scheduler(interval=0.0)
+        rides = [make_ride("0 0", "1 1", request_time=time) for time in ("11 pm", "10 pm", "22:30")]
+        for ride in rides:
+            scheduler.submit(ride)
+        self.matcher.add_driver(make_driver("d", (0.0, 0.0)))
+        stats = scheduler.poll()
+        self.assertEqual((stats.considered, stats.matched, stats.unmatched), (3, 1, 2))
+        self.assertEqual([ride.driver is not None for ride in rides], [False, True, False])
+        # 10 pm and 22:30 plus two minutes are both before 11 pm.
+        self.assertEqual(stats.overdue, 2)
+        self.assertEqual(len(scheduler), 2)
+
+    def test_cancelled_requests_are_skipped(self):
+        scheduler = self.scheduler(interval=0.0)
+        rides = [make_ride("0 0", "1 1") for _ in range(3)]
+        for ride in rides:
+            scheduler.submit(ride)
+        self.matcher.remove_ride_request(rides[0])
+        self.matcher.add_driver(make_driver("d", (0.0, 0.0)))
+        stats = scheduler.poll()
+        self.assertEqual((stats.queue_depth, stats.considered, stats.matched), (2, 2, 1))
+        self.assertIsNone(rides[0].driver)
+        self.assertEqual(len(scheduler), 1)
+
+    def test_cancelled_requests_do_not_trigger_rounds(self):
+        scheduler = self.scheduler(interval=None, batch_size=2)
+        rides = [make_ride("0 0", "1 1") for _ in range(2)]
+        scheduler.submit(rides[0])
+        self.matcher.remove_ride_request(rides[0])
+        self.assertEqual(len(scheduler), 0)
+        scheduler.submit(rides[1])
+        self.assertFalse(scheduler.due())
+        scheduler.close()
+        self.assertEqual(self.matcher.request_listeners, ())
+
+    def test_requests_matched_elsewhere_stop_counting(self):
+        scheduler = self.scheduler(interval=0.0)
+        ride = make_ride("0 0", "1 1")
+        scheduler.submit(ride)
+        self.matcher.add_driver(make_driver("d", (0.0, 0.0)))
+        self.matcher.make_matches()
+        stats = scheduler.poll()
+        self.assertEqual((stats.considered, stats.matched), (0, 0))
+        self.assertEqual(len(scheduler), 0)
+        self.assertFalse(scheduler.due())
+        self.assertIsNone(scheduler.poll())
+
+    def test_deadlines_carry_across_midnight(self):
+        just_after_midnight = datetime(2024, 3, 2, 0, 5).timestamp()
+        scheduler = self.scheduler(interval=0.0, clock=lambda: just_after_midnight)
+        late, early = make_ride("0 0", "1 1", request_time="11:50 pm"), make_ride("0 0", "1 1", request_time="00:04")
+        scheduler.submit(late)
+        scheduler.submit(early)
+        stats = scheduler.poll()
+        # Only last night's request is past its two minutes.
+        self.assertEqual((stats.considered, stats.overdue), (2, 1))
+
+    def test_nearest_occurrence(self):
+        self.assertEqual(nearest_occurrence(22 * 3600, ELEVEN_PM), ELEVEN_PM - 3600)
+        self.assertEqual(nearest_occurrence(3600, ELEVEN_PM), datetime(2024, 3, 2, 1, 0).timestamp())
+        self.assertEqual(nearest_occurrence(23 * 3600, ELEVEN_PM + 3 * 3600), ELEVEN_PM)
+
+    def test_rounds_run_on_interval_or_batch_size(self):
+        scheduler = self.scheduler(interval=5.0, batch_size=3)
+        self.assertIsNone(scheduler.poll())
+        scheduler.submit(make_ride("0 0", "1 1"))
+        self.assertFalse(scheduler.due())
+        self.timer.now = 5.0
+        self.assertTrue(scheduler.due())
+        scheduler.run_round()
+        for _ in range(2):
+            scheduler.submit(make_ride("0 0", "1 1"))
+        self.assertTrue(scheduler.due())
+
+    def test_round_size_is_capped_by_the_budget(self):
+        scheduler = self.scheduler(interval=0.0, round_budget=0.01)
+        self.assertEqual(scheduler.round_limit(), PROBE_ROUND)
+        for _ in range(200):
+            scheduler.submit(make_ride("0 0", "1 1"))
+        first = scheduler.run_round()
+        self.assertEqual(first.considered, PROBE_ROUND)
+        self.assertEqual(first.round_limit, PROBE_ROUND)
+        self.assertEqual(self.scheduler(interval=0.0, round_budget=float("inf")).round_limit(), None)
+
+    def test_needs_a_trigger(self):
+        with self.assertRaises(ValueError):
+            MatchScheduler(self.matcher, interval=None, batch_size=None)
+
+
+if __name__ == "__main__":
+    unittest.main()
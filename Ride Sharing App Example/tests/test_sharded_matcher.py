@@ -0,0 +1,55 @@
+import random
+import unittest
+
+from Matcher import Matcher
+from ShardedMatcher import RegionGrid, ShardedMatcher
+from SpatialIndex import KDTreeIndex
+from support import CITY_SIZE, make_drivers, make_rides
+
+
+def run_sharded(grid: RegionGrid, workers: int, halo: float, seed: int = 1):
+    rng = random.Random(seed)
+    drivers = make_drivers(400, rng)
+    rides = make_rides(150, rng)
+    with ShardedMatcher(grid, workers=workers, halo=halo, index_factory=KDTreeIndex) as matcher:
+        for driver in drivers:
+            matcher.add_driver(driver)
+        for ride in rides:
+            matcher.add_ride_request(ride)
+        position = {id(ride): i for i, ride in enumerate(rides)}
+        matches = [(position[id(ride)], driver.name) for ride, driver in matcher.make_matches()]
+        pending = len(matcher.ride_requests)
+    return drivers, rides, matches, pending
+
+
+class ShardedMatcherTest(unittest.TestCase):
+
+    def test_one_region_is_plain_greedy_matching(self):
+        grid = RegionGrid(0, 0, CITY_SIZE, CITY_SIZE, 1, 1)
+        drivers, rides, matches, _ = run_sharded(grid, workers=0, halo=0.0)
+        for driver in drivers:
+            driver.is_available = True
+        for ride in rides:
+            ride.driver = None
+        matcher = Matcher()
+        matcher.add_drivers(drivers)
+        position = {id(ride): i for i, ride in enumerate(rides)}
+        expected = [(position[id(ride)], driver.name) for ride, driver in matcher.propose_matches(rides)]
+        self.assertEqual(matches, expected)
+
+    def test_regions_never_share_a_driver(self):
+        grid = RegionGrid(0, 0, CITY_SIZE, CITY_SIZE, 4, 4)
+        for halo in (0.0, 5.0, 30.0):
+            drivers, rides, matches, pending = run_sharded(grid, workers=0, halo=halo)
+            self.assertEqual(len({name for _, name in matches}), len(matches))
+            self.assertEqual(len(matches) + pending, len(rides))
+            busy = {driver.name for driver in drivers if not driver.is_available}
+            self.assertEqual(busy, {name for _, name in matches})
+
+    def test_worker_processes_agree_with_in_process_shards(self):
+        grid = RegionGrid(0, 0, CITY_SIZE, CITY_SIZE, 2, 2)
+        self.assertEqual(run_sharded(grid, workers=2, halo=5.0)[2], run_sharded(grid, workers=0, halo=5.0)[2])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,36 @@
+import unittest
+from dataclasses import asdict
+
+from Simulation import Simulation, SimulationConfig
+from SyntheticCity import CityConfig
+
+
+def config(**fields) -> SimulationConfig:
+    city = CityConfig(num_drivers=60, num_riders=600, distribution="clustered", seed=5)
+    return SimulationConfig(city=city, **fields)
+
+
+class SimulationTest(unittest.TestCase):
+
+    def test_same_seed_same_report(self):
+        self.assertEqual(asdict(Simulation(config()).run()), asdict(Simulation(config()).run()))
+
+    def test_every_request_is_accounted_for(self):
+        report = Simulation(config()).run()
+        self.assertEqual(report.requests, 600)
+        self.assertEqual(report.requests, report.matched + report.abandoned + report.waiting_at_end)
+        self.assertEqual(report.matched, report.completed + report.riding_at_end)
+        # Riding at the end includes drivers still on their way to the pickup.
+        pickups = sum(report.pickup_wait_histogram.values())
+        self.assertTrue(report.completed <= pickups <= report.matched)
+        self.assertAlmostEqual(sum(report.revenue_by_hour), report.revenue)
+        self.assertAlmostEqual(sum(report.revenue_by_pricing.values()), report.revenue)
+        self.assertTrue(0 < report.utilization <= 1)
+
+    def test_bad_config(self):
+        with self.assertRaises(ValueError):
+            SimulationConfig(speed=0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+import os
+import tempfile
+import threading
+import unittest
+
+from Matcher import Matcher
+from Pricing import SharingCost
+from Rides import SharingRide
+from SpatialIndex import KDTreeIndex
+from SyntheticCity import CityConfig, SyntheticCity
+from Vehicles import Car
+from support import make_driver, make_ride
+
+
+def driver_state(matcher: Matcher):
+    return [(d.name, d.phone, d.rating, d.location, type(d.vehicle).__name__, d.vehicle.number) for d in matcher.drivers]
+
+
+def request_state(matcher: Matcher):
+    return [(r.ride_id, r.from_place, r.to, type(r).__name__, type(r.pricing).__name__) for r in matcher.ride_requests]
+
+
+class SnapshotTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def build(self, driver_store: str) -> Matcher:
+        city = SyntheticCity(CityConfig(num_drivers=300, num_riders=150, driver_store=driver_store))
+        matcher = Matcher(index=KDTreeIndex())
+        matcher.add_drivers(city.build_drivers())
+        rides = [ride for batch in city.ride_batches(50) for ride in batch]
+        for ride in rides[:100]:
+            matcher.add_ride_request(ride)
+        matcher.make_matches()
+        for ride in rides[100:]:
+            matcher.add_ride_request(ride)
+        shared = make_ride((1.0, 2.0), "3 4", SharingRide, pricing=SharingCost(num_share=3), shared_by=3)
+        matcher.add_ride_request(shared)
+        return matcher
+
+    def test_round_trip(self):
+        for driver_store in ("objects", "fleet"):
+            for background in (False, True):
+                matcher = self.build(driver_store)
+                path = os.path.join(self.directory.name, f"{driver_store}-{background}.snap")
+                matcher.snapshot(path, background=background).wait()
+                restored = Matcher(index=KDTreeIndex())
+                restored.restore(path)
+                self.assertEqual(driver_state(restored), driver_state(matcher))
+                self.assertEqual(request_state(restored), request_state(matcher))
+                self.assertEqual(restored.ride_requests[-1].shared_by, 3)
+                # Assigned rides are not saved, so busy drivers come back free.
+                self.assertLess(len(matcher.available_drivers), len(matcher.drivers))
+                self.assertEqual(len(restored.available_drivers), len(restored.drivers))
+
+                # Restored drivers are live: matching and completing still tracks them.
+                ride, driver = restored.make_matches()[0]
+                self.assertNotIn(driver, restored.available_drivers)
+                ride.complete_ride()
+                self.assertIn(driver, restored.available_drivers)
+
+    def test_no_fork_while_other_threads_run(self):
+        matcher = self.build("objects")
+        path = os.path.join(self.directory.name, "threaded.snap")
+        release = threading.Event()
+        thread = threading.Thread(target=release.wait)
+        thread.start()
+        try:
+            job = matcher.snapshot(path, background=True)
+            self.assertIsNone(job._pid)
+            job.wait()
+        finally:
+            release.set()
+            thread.join()
+        restored = Matcher()
+        restored.restore(path)
+        self.assertEqual(driver_state(restored), driver_state(matcher))
+
+    def test_only_vehicles_classes_are_saved(self):
+        class Scooter(Car):
+            pass
+
+        matcher = Matcher()
+        matcher.add_driver(make_driver("d", (0.0, 0.0), vehicle=Scooter(name="s", number="1")))
+        with self.assertRaises(ValueError):
+            matcher.snapshot(os.path.join(self.directory.name, "scooter.snap"))
+
+    def test_empty_matcher(self):
+        path = os.path.join(self.directory.name, "empty.snap")
+        Matcher().snapshot(path).wait()
+        restored = Matcher()
+        restored.restore(path)
+        self.assertEqual((restored.drivers, restored.ride_requests), ((), ()))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import math
+import random
+import unittest
+
+from Matcher import Matcher
+from SpatialIndex import GridIndex, KDTreeIndex
+from support import make_drivers, make_rides, pair_ids
+
+
+def brute_force(drivers, point):
+    """Drivers by distance to ``point``, ties in insertion order."""
+    order = {driver: position for position, driver in enumerate(drivers)}
+    return sorted(drivers, key=lambda driver: (math.dist(point, driver.location) ** 2, order[driver]))
+
+
+class SpatialIndexTest(unittest.TestCase):
+
+    def indexes(self):
+        return [GridIndex(cell_size=3.0), GridIndex(cell_size=0.5), KDTreeIndex(bucket_size=4), KDTreeIndex()]
+
+    def test_queries_match_brute_force_after_updates(self):
+        for index in self.indexes():
+            rng = random.Random(1)
+            drivers = make_drivers(300, rng, size=20)
+            # Integer positions make plenty of exact ties.
+            for driver in drivers[::2]:
+                driver.location = (float(rng.randint(0, 20)), float(rng.randint(0, 20)))
+            registered = list(drivers)
+            for driver in registered:
+                index.add(driver)
+            for _ in range(1_000):
+                driver = rng.choice(drivers)
+                if rng.random() < 0.05 and driver in index:
+                    index.remove(driver)
+                    registered.remove(driver)
+                elif rng.random() < 0.05 and driver not in index:
+                    index.add(driver)
+                    registered.append(driver)
+                else:
+                    index.move(driver, (rng.uniform(-3, 23), rng.uniform(-3, 23)))
+            self.assertEqual(len(index), len(registered))
+
+            even = set(registered[::2])
+            for _ in range(50):
+                point = (rng.uniform(0, 20), rng.uniform(0, 20))
+                expected = brute_force(registered, point)
+                k, radius = rng.randint(1, 8), rng.uniform(0, 5)
+                self.assertEqual(index.k_nearest(point, k), expected[:k], index)
+                self.assertEqual(
+                    index.within(point, radius), [d for d in expected if math.dist(point, d.location) <= radius]
+                )
+                self.assertIs(index.nearest(point, even.__contains__), next(d for d in expected if d in even))
+
+    def test_bulk_load_matches_incremental_adds(self):
+        rng = random.Random(5)
+        drivers = make_drivers(2_000, rng)
+        bulk, incremental = KDTreeIndex(), KDTreeIndex()
+        bulk.add_many(drivers)
+        for driver in drivers:
+            incremental.add(driver)
+        for _ in range(100):
+            point = (rng.uniform(0, 100), rng.uniform(0, 100))
+            self.assertEqual(bulk.k_nearest(point, 5), incremental.k_nearest(point, 5))
+
+    def test_indexed_matcher_picks_brute_force_drivers(self):
+        rng = random.Random(7)
+        drivers = make_drivers(500, rng)
+        rides = make_rides(200, rng)
+        expected = pair_ids(Matcher().strategy.match(rides, drivers, None))
+        for index in self.indexes():
+            matcher = Matcher(index=index)
+            matcher.add_drivers(drivers)
+            self.assertEqual(pair_ids(matcher.propose_matches(rides)), expected, index)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+import math
+import random
+import unittest
+from collections import Counter
+
+from Matcher import Matcher
+from Pricing import SurgeCost, price_rides
+from SpatialIndex import KDTreeIndex
+from Surge import SurgeEngine
+from SyntheticCity import CityConfig, SyntheticCity
+from support import make_driver, make_ride
+
+
+class Clock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class Recorder:
+
+    def __init__(self):
+        self.cells = []
+
+    def surge_changed(self, cell) -> None:
+        self.cells.append(cell)
+
+
+class SurgeEngineTest(unittest.TestCase):
+
+    def test_counts_follow_the_matcher(self):
+        engine = SurgeEngine(cell_size=10, window=60, clock=Clock())
+        matcher = Matcher(index=KDTreeIndex(), surge=engine)
+        city = SyntheticCity(CityConfig(num_drivers=100, num_riders=600, distribution="clustered"))
+        matcher.add_drivers(city.drivers())
+        rng = random.Random(1)
+
+        def check():
+            requests = Counter(engine.cell_of(ride.from_place) for ride in matcher.ride_requests)
+            drivers = Counter(engine.cell_of(driver.location) for driver in matcher.available_drivers)
+            for cell in requests.keys() | drivers.keys() | engine.heatmap().keys():
+                self.assertEqual(engine.counts(cell), (requests[cell], drivers[cell]))
+
+        open_rides = []
+        for batch in city.ride_batches(100):
+            for ride in batch:
+                matcher.add_ride_request(ride)
+            check()
+            open_rides += [ride for ride, _ in matcher.make_matches()]
+            check()
+            for driver in rng.sample(matcher.drivers, 20):
+                matcher.move_driver(driver, (rng.uniform(0, 100), rng.uniform(0, 100)))
+            for ride in matcher.ride_requests[:10]:
+                matcher.remove_ride_request(ride)
+            check()
+            for ride in open_rides[:20]:
+                ride.complete_ride()
+            open_rides = open_rides[20:]
+            matcher.remove_driver(matcher.drivers[0])
+            check()
+
+    def test_multiplier_drifts_towards_the_demand_ratio(self):
+        clock = Clock()
+        engine = SurgeEngine(cell_size=10, window=60, sensitivity=0.5, max_multiplier=3.0, clock=clock)
+        recorder = Recorder()
+        engine.add_listener(recorder)
+        rides = [make_ride((5.0, 5.0), (6.0, 6.0)) for _ in range(6)]
+        for ride in rides:
+            engine.request_opened(ride)
+        engine.driver_available(make_driver("d", (4.0, 4.0)))
+        self.assertEqual(recorder.cells, [(0, 0)] * 7)
+        self.assertEqual(engine.multiplier((5.0, 5.0)), 1.0)
+        clock.now = 60.0
+        smoothed = 6 - 6 * math.exp(-1)
+        self.assertAlmostEqual(engine.multiplier("5 5"), 1 + 0.5 * (smoothed - 1))
+        clock.now = 6000.0
+        self.assertEqual(engine.multiplier((5.0, 5.0)), 3.0)
+        self.assertEqual(engine.multiplier((50.0, 50.0)), 1.0)
+
+        pricing = SurgeCost(engine=engine)
+        ride = make_ride((5.0, 5.0), (6.0, 6.0), pricing=pricing)
+        self.assertAlmostEqual(ride.calculate_cost(), ride.base_cost() * 3.0)
+        self.assertEqual(price_rides([ride]), [ride.calculate_cost()])
+        self.assertAlmostEqual(pricing.cost(ride.to_record()), ride.calculate_cost())
+        engine.remove_listener(recorder)
+        self.assertEqual(engine.listeners, ())
+
+
+if __name__ == "__main__":
+    unittest.main()
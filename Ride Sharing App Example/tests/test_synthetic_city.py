@@ -0,0 +1,64 @@
+import unittest
+
+from LoadSuite import compare, run_scenario
+from Stats import percentile
+from SyntheticCity import CityConfig, SyntheticCity
+
+
+def driver_state(drivers):
+    return [(d.name, d.rating, d.location, type(d.vehicle).__name__) for d in drivers]
+
+
+class SyntheticCityTest(unittest.TestCase):
+
+    def test_same_seed_same_city(self):
+        config = CityConfig(num_drivers=50, num_riders=200, distribution="clustered", seed=3)
+        first, second = SyntheticCity(config), SyntheticCity(config)
+        self.assertEqual(driver_state(first.drivers()), driver_state(second.drivers()))
+        self.assertEqual(list(first.events()), list(second.events()))
+
+    def test_fleet_holds_the_same_drivers(self):
+        city = SyntheticCity(CityConfig(num_drivers=50, num_riders=0))
+        self.assertEqual(driver_state(city.drivers()), driver_state(city.fleet()[1]))
+
+    def test_requests_arrive_in_order_within_the_day(self):
+        city = SyntheticCity(CityConfig(num_drivers=1, num_riders=500))
+        times = [arrival for arrival, _ in city.timed_rides()]
+        self.assertEqual(len(times), 500)
+        self.assertEqual(times, sorted(times))
+        batches = list(city.ride_batches(128))
+        self.assertEqual([len(batch) for batch in batches], [128, 128, 128, 116])
+        points = [ride.from_place for batch in batches for ride in batch]
+        self.assertTrue(all(0 <= x <= 100 and 0 <= y <= 100 for x, y in points))
+
+    def test_bad_config_is_rejected(self):
+        with self.assertRaises(ValueError):
+            CityConfig(distribution="spiral")
+        with self.assertRaises(ValueError):
+            CityConfig(vehicle_mix={"zeppelin": 1.0})
+
+
+class LoadSuiteTest(unittest.TestCase):
+
+    def test_percentile(self):
+        values = [float(i) for i in range(1, 101)]
+        self.assertEqual((percentile(values, 0.5), percentile(values, 0.99)), (50.0, 99.0))
+        self.assertEqual(percentile([], 0.5), 0.0)
+
+    def test_only_matched_rides_are_priced(self):
+        result = run_scenario(CityConfig(num_drivers=20, num_riders=300), batch_size=100)
+        self.assertLess(result["matched"], 300)
+        self.assertEqual(result["phases"]["fare"]["items"], result["matched"])
+
+    def test_scenario_and_regression_check(self):
+        result = run_scenario(CityConfig(num_drivers=100, num_riders=300), batch_size=100)
+        self.assertEqual(result["phases"]["match"]["items"], 300)
+        scenario = {"name": "s", "phases": result["phases"]}
+        halved = {phase: dict(stats, throughput=stats["throughput"] / 2) for phase, stats in result["phases"].items()}
+        slower = {"name": "s", "phases": halved}
+        self.assertEqual(compare({"scenarios": [scenario]}, {"scenarios": [scenario]}, 0.1), [])
+        self.assertEqual(len(compare({"scenarios": [slower]}, {"scenarios": [scenario]}, 0.1)), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()